@@ -0,0 +1,5 @@
+"""
+Бенчмарки ключевых сценариев на синтетических порталах из bitrix_stub.
+
+Запуск: python -m benchmarks --sizes small medium --output bench.json --compare baseline.json
+"""
@@ -0,0 +1,81 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from bitrix_stub import SIZES, BitrixStub, generate_portal, run_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки сервисов на синтетических порталах')
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=['small'])
+    parser.add_argument('--cases', nargs='+', help='Кейсы для прогона (по умолчанию все)')
+    parser.add_argument('--output', default='bench_results.json', help='Куда сохранить JSON с результатами')
+    parser.add_argument('--compare', help='JSON предыдущего прогона для поиска регрессий')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Допустимый рост метрики, доля')
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка заглушки, секунды')
+    parser.add_argument('--rate', type=float, default=0.0, help='Лимит запросов заглушки в секунду, 0 - без лимита')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--no-alloc', action='store_true', help='Не замерять аллокации через tracemalloc')
+    args = parser.parse_args()
+
+    stub = BitrixStub(generate_portal('small'), latency=args.latency, rate=args.rate)
+    server = run_server(stub, port=args.port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{args.port}/rest/1/bench/"
+
+    # Сервисы читают вебхук из настроек, поэтому он должен быть задан до django.setup()
+    os.environ['BITRIX24_WEBHOOK_URL'] = stub_url
+    os.environ['BITRIX24_CALL_WEBHOOK_URL'] = stub_url
+    # Снимки индексов, карта, QR и выгрузки пишутся во временный каталог, а не в рабочий cache/
+    cache_dir = tempfile.mkdtemp(prefix='bench_cache_')
+    os.environ['CACHE_DIR'] = cache_dir
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    # Бенчмарк не должен трогать рабочую базу
+    settings.DATABASES['default']['NAME'] = ':memory:'
+
+    from benchmarks import cases  # noqa: F401 - регистрирует кейсы
+    from benchmarks.harness import CASES, compare_runs, load_results, run_suite, save_results
+
+    selected = args.cases or list(CASES)
+    unknown = set(selected) - set(CASES)
+    if unknown:
+        parser.error(f"Неизвестные кейсы: {', '.join(sorted(unknown))}")
+
+    def progress(result):
+        status = f"ERROR {result['error']}" if 'error' in result else 'ok'
+        print(
+            f"{result['case']:<16} {result['size']:<7} {result['wall_time']:>9.3f}s "
+            f"http={result['http_requests']:<6} calls={result['method_calls']:<7} "
+            f"rss={result['peak_rss_mb']:>8.1f}MB alloc={result.get('alloc_peak_mb', '-')}MB {status}"
+        )
+
+    try:
+        results = run_suite(args.sizes, selected, stub, stub_url, not args.no_alloc, progress)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    save_results(results, args.output)
+    print(f"Результаты сохранены в {args.output}")
+    server.shutdown()
+
+    if args.compare:
+        regressions = 0
+        for row in compare_runs(results, load_results(args.compare), args.threshold):
+            mark = 'REGRESSION' if row['regression'] else ''
+            regressions += row['regression']
+            print(f"{row['case']:<16} {row['size']:<7} {row['metric']:<14} "
+                  f"{row['baseline']:>10} -> {row['current']:<10} {row['change']:+.1%} {mark}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+import csv
+import os
+import shutil
+
+from benchmarks.harness import BenchContext, before_run, benchmark
+
+
+def _ensure_tables(*models):
+    """Создать таблицы моделей в in-memory базе бенчмарка"""
+    from django.db import connection
+
+    existing = connection.introspection.table_names()
+    with connection.schema_editor() as editor:
+        for model in models:
+            if model._meta.db_table not in existing:
+                editor.create_model(model)
+
+
+@before_run
+def reset_caches():
+    """
+    Каждый прогон начинается с холодных кэшей: индексы и снимки, построенные
+    по порталу прошлого прогона или другого размера, не должны попасть в замер
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    from companies_on_maps.utils import coord_store, dataset
+    from contact_import.services.company_index import company_index
+    from contact_import.services.dedup import invalidate_contact_index
+    from products.search_index import product_index
+
+    cache.clear()
+    # CACHE_DIR бенчмарка - временный каталог (см. __main__), рабочие снимки не затрагиваются
+    shutil.rmtree(settings.CACHE_DIR, ignore_errors=True)
+    os.makedirs(settings.CACHE_DIR, exist_ok=True)
+    company_index.clear()
+    product_index.clear()
+    invalidate_contact_index()
+    for module in (dataset, coord_store):
+        module._current = None
+        module._current_mtime = None
+    dataset._rebuild_attempted_at = None
+
+
+@benchmark('deal_list')
+def deal_list(ctx: BenchContext):
+    """То же, что делает get_deal_list: справочники и страницы локальной копии сделок"""
+    from contact_import.services.company_index import company_index
+    from deals.deal_query import filter_deals, paginate_deals
+    from deals.models import DealRecord, DealRollup, SyncState
+    from deals.services import Bitrix24Service
+    from deals.sync import ensure_deals_fresh
+
+    _ensure_tables(DealRecord, SyncState, DealRollup)
+    if 'deals_synced' not in ctx.data:
+        # Копия от портала другого размера не годится: первая загрузка идет заново
+        for model in (DealRecord, SyncState, DealRollup):
+            model.objects.all().delete()
+        ctx.data['deals_synced'] = True
+
+    service = Bitrix24Service()
+    service.get_deal_stages()
+    service.get_deal_types()
+    ensure_deals_fresh()
+
+    cursor = None
+    for _ in range(10):
+        page = paginate_deals(filter_deals({}), after=cursor)
+        for deal in page.deals:
+            if deal.company_id:
+                company_index.get_title(deal.company_id)
+        cursor = page.next_cursor
+        if not cursor:
+            break
+
+
+@benchmark('deal_view')
+def deal_view(ctx: BenchContext):
+    """
+    То же, что делает get_deal_view для первых сделок портала, плюс разделы,
+    которые страница догружает отдельно: контакты, компания и задачи
+    """
+    from django.core.cache import cache
+    from deals.services import Bitrix24Service
+
+    # Разделы кэшируются по ID сделки: меряем загрузку без прогретого кэша
+    cache.clear()
+    service = Bitrix24Service()
+    for deal_id in range(1, 11):
+        deal = service.get_deal_details(deal_id)
+        service.get_deal_contacts(deal_id)
+        if deal.get('COMPANY_ID'):
+            service.get_company(int(deal['COMPANY_ID']))
+        service.get_deal_tasks(deal_id)
+
+
+@benchmark('hierarchy')
+def hierarchy(ctx: BenchContext):
+    """Построение отделов и руководителей для сотрудников"""
+    from employees.services import Bitrix24CompanyService
+
+    service = Bitrix24CompanyService()
+    users = service.get_all_users()
+    for user in users[:20]:
+        service.get_user_departments_and_managers(users, user['ID'])
+
+
+@benchmark('contact_import')
+def contact_import(ctx: BenchContext):
+    """Импорт CSV-файла на ctx.rows строк"""
+    from contact_import.models import ImportBatchResult, ImportCheckpoint
+    from contact_import.services.importers import CSVImporter
+
+    _ensure_tables(ImportCheckpoint, ImportBatchResult)
+    path = os.path.join(ctx.workdir, f"import_{ctx.size}.csv")
+    if not os.path.exists(path):
+        companies = [company['TITLE'] for company in ctx.stub.data['company']]
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['имя', 'фамилия', 'номер телефона', 'почта', 'компания'])
+            for i in range(ctx.rows):
+                writer.writerow([
+                    f"Имя{i}", f"Фамилия{i}", f"+7900{i:07d}", f"bench{i}@mail.example",
+                    companies[i % len(companies)],
+                ])
+
+    result = CSVImporter().import_contacts(path)
+    if not result['success']:
+        raise RuntimeError(result['error'])
+
+
+@benchmark('contact_export')
+def contact_export(ctx: BenchContext):
+    """Экспорт всех контактов портала в CSV"""
+    from contact_import.services.exporters import CSVExporter
+
+    result = CSVExporter().export_contacts(os.path.join(ctx.workdir, f"export_{ctx.size}.csv"))
+    if not result['success']:
+        raise RuntimeError(result['error'])
+
+
+@benchmark('map_build')
+def map_build(ctx: BenchContext):
+    """
+    Сборка набора точек карты так, как ее запускает планировщик: полная сборка
+    с нуля и следом инкрементальная по ее состоянию
+    """
+    from companies_on_maps.utils.geocoder import YandexGeocoder
+    from companies_on_maps.utils.pipeline import rebuild_map_dataset
+
+    geocoder = YandexGeocoder()
+    geocoder.base_url = ctx.stub_url.split('/rest/')[0] + '/1.x/'
+
+    dataset, _ = rebuild_map_dataset(full=True, geocoder=geocoder)
+    if dataset is None:
+        raise RuntimeError("Сборка карты не выполнена")
+    rebuild_map_dataset(geocoder=geocoder)
+
+
+@benchmark('qr_scan')
+def qr_scan(ctx: BenchContext):
+    """Проверка токена QR-кода и загрузка товара, как при сканировании"""
+    from products.models import ProductQRCode
+    from products.services import Bitrix24ProductService
+
+    _ensure_tables(ProductQRCode)
+
+    if 'qr_tokens' not in ctx.data:
+        qr_codes = [ProductQRCode(product_id=i, product_name=f"Товар {i}") for i in range(1, 101)]
+        ProductQRCode.objects.bulk_create(qr_codes)
+        ctx.data['qr_tokens'] = [qr_code.get_signed_token() for qr_code in qr_codes]
+
+    service = Bitrix24ProductService()
+    for token in ctx.data['qr_tokens'] * 5:
+        qr_code = ProductQRCode.verify_token(token)
+        if qr_code is None:
+            raise RuntimeError('QR token verification failed')
+        service.get_product_by_id(qr_code.product_id)
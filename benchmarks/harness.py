@@ -0,0 +1,195 @@
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from bitrix_stub import BitrixStub, generate_portal
+
+# Кейсы бенчмарка регистрируются декоратором @benchmark
+CASES: Dict[str, Callable] = {}
+
+# Размер импортируемого/экспортируемого файла для каждого размера портала
+ROWS_BY_SIZE = {
+    'small': 1000,
+    'medium': 10000,
+    'large': 100000,
+}
+
+
+# Сброс состояния процесса перед каждым прогоном кейса (кэши модулей, файлы снимков)
+RESETS: List[Callable[[], None]] = []
+
+
+def before_run(func):
+    """Зарегистрировать сброс состояния, выполняемый перед каждым прогоном кейса"""
+    RESETS.append(func)
+    return func
+
+
+def reset_state():
+    for reset in RESETS:
+        reset()
+
+
+def benchmark(name: str):
+    """Зарегистрировать функцию как кейс бенчмарка"""
+
+    def decorator(func):
+        CASES[name] = func
+        return func
+
+    return decorator
+
+
+@dataclass
+class BenchContext:
+    """Окружение одного прогона кейса"""
+    size: str
+    rows: int
+    stub: BitrixStub
+    stub_url: str
+    workdir: str
+    data: Dict = field(default_factory=dict)
+
+
+class RSSSampler(threading.Thread):
+    """Фоновый замер пикового RSS процесса по /proc/self/statm"""
+
+    def __init__(self, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, self._current())
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, self._current())
+        return self.peak
+
+    def _current(self) -> int:
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * self._page_size
+        except OSError:
+            # Вне Linux доступен только максимум за все время жизни процесса
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_case(name: str, ctx: BenchContext, measure_allocations: bool = True) -> Dict:
+    """Прогнать кейс на свежих данных и собрать метрики"""
+    result = {'case': name, 'size': ctx.size, 'rows': ctx.rows}
+
+    ctx.stub.load(generate_portal(ctx.size))
+    ctx.stub.reset_stats()
+    reset_state()
+    sampler = RSSSampler()
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        CASES[name](ctx)
+    except Exception as e:
+        result['error'] = repr(e)
+    result['wall_time'] = round(time.perf_counter() - started, 4)
+    result['peak_rss_mb'] = round(sampler.stop() / 2 ** 20, 2)
+
+    stats = ctx.stub.get_stats()
+    result['http_requests'] = stats['totals'].get('requests', 0)
+    result['rate_limited'] = stats['totals'].get('rate_limited', 0)
+    result['method_calls'] = sum(stats['methods'].values())
+    result['methods'] = stats['methods']
+
+    if measure_allocations and 'error' not in result:
+        # Трассировка аллокаций сильно замедляет код, поэтому идет отдельным прогоном
+        ctx.stub.load(generate_portal(ctx.size))
+        reset_state()
+        tracemalloc.start()
+        try:
+            CASES[name](ctx)
+            current, peak = tracemalloc.get_traced_memory()
+            result['alloc_peak_mb'] = round(peak / 2 ** 20, 2)
+            result['alloc_blocks'] = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def run_suite(sizes: List[str], cases: List[str], stub: BitrixStub, stub_url: str,
+              measure_allocations: bool = True, progress: Callable[[Dict], None] = None) -> Dict:
+    """Прогнать выбранные кейсы на всех размерах портала"""
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bench_') as workdir:
+        for size in sizes:
+            for name in cases:
+                ctx = BenchContext(size=size, rows=ROWS_BY_SIZE[size], stub=stub, stub_url=stub_url, workdir=workdir)
+                result = run_case(name, ctx, measure_allocations)
+                results.append(result)
+                if progress:
+                    progress(result)
+
+    return {'meta': _run_meta(sizes, cases), 'results': results}
+
+
+def compare_runs(current: Dict, baseline: Dict, threshold: float = 0.2) -> List[Dict]:
+    """Сравнить прогоны; регрессия - рост метрики больше чем на threshold"""
+    previous = {(item['case'], item['size']): item for item in baseline.get('results', [])}
+    rows = []
+    for item in current.get('results', []):
+        base = previous.get((item['case'], item['size']))
+        if not base:
+            continue
+        for metric in ('wall_time', 'http_requests', 'method_calls', 'peak_rss_mb', 'alloc_peak_mb'):
+            old, new = base.get(metric), item.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            rows.append({
+                'case': item['case'],
+                'size': item['size'],
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change': round(change, 4),
+                'regression': change > threshold,
+            })
+    return rows
+
+
+def save_results(results: Dict, path: str):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+def load_results(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _run_meta(sizes: List[str], cases: List[str]) -> Dict:
+    return {
+        'started_at': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'sizes': sizes,
+        'cases': cases,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,9 @@
+"""
+Локальная заглушка REST API Bitrix24 для нагрузочного тестирования и бенчмарков.
+
+Запуск: python -m bitrix_stub --size medium --latency 0.05
+и BITRIX24_WEBHOOK_URL=http://127.0.0.1:8765/rest/1/stub/
+Геокодер Яндекса отвечает по адресу http://127.0.0.1:8765/1.x/
+"""
+from bitrix_stub.datasets import SIZES, generate_portal
+from bitrix_stub.server import BitrixStub, run_server
@@ -0,0 +1,40 @@
+import argparse
+import logging
+
+from bitrix_stub.datasets import SIZES, generate_portal
+from bitrix_stub.server import BitrixStub, run_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальная заглушка REST API Bitrix24')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--size', choices=sorted(SIZES), default='small', help='Размер синтетического портала')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа, секунды')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Случайная добавка к задержке, секунды')
+    parser.add_argument('--rate', type=float, default=2.0, help='Запросов в секунду, 0 - без ограничения')
+    parser.add_argument('--burst', type=int, default=50, help='Объем ведра запросов')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stub = BitrixStub(
+        generate_portal(args.size, args.seed),
+        latency=args.latency,
+        jitter=args.jitter,
+        rate=args.rate,
+        burst=args.burst,
+        seed=args.seed,
+    )
+    server = run_server(stub, args.host, args.port)
+    print(f"Bitrix24 stub: http://{args.host}:{args.port}/rest/1/stub/ (size={args.size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+# Размеры синтетических порталов
+SIZES = {
+    'small': {
+        'users': 20, 'departments': 5, 'companies': 200, 'contacts': 1000,
+        'deals': 1000, 'products': 300, 'calls': 500, 'tasks': 300,
+    },
+    'medium': {
+        'users': 200, 'departments': 30, 'companies': 5000, 'contacts': 20000,
+        'deals': 20000, 'products': 5000, 'calls': 10000, 'tasks': 5000,
+    },
+    'large': {
+        'users': 1000, 'departments': 120, 'companies': 50000, 'contacts': 100000,
+        'deals': 100000, 'products': 20000, 'calls': 50000, 'tasks': 20000,
+    },
+}
+
+DEAL_STAGES = [
+    ('NEW', 'Новая'),
+    ('PREPARATION', 'Подготовка документов'),
+    ('PREPAYMENT_INVOICE', 'Счёт на предоплату'),
+    ('EXECUTING', 'В работе'),
+    ('FINAL_INVOICE', 'Финальный счёт'),
+    ('WON', 'Сделка успешна'),
+    ('LOSE', 'Сделка провалена'),
+]
+DEAL_TYPES = ['SALE', 'SERVICE', 'GOODS', 'PROJECT']
+CURRENCIES = ['RUB', 'RUB', 'RUB', 'USD', 'EUR']
+
+FIRST_NAMES = ['Иван', 'Пётр', 'Анна', 'Мария', 'Олег', 'Елена', 'Сергей', 'Ольга', 'Дмитрий', 'Наталья']
+LAST_NAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков']
+COMPANY_WORDS = ['Альфа', 'Вектор', 'Гранит', 'Север', 'Техно', 'Строй', 'Торг', 'Логистик', 'Сервис', 'Групп']
+PRODUCT_WORDS = ['Кабель', 'Адаптер', 'Модуль', 'Датчик', 'Блок питания', 'Хаб', 'Контроллер', 'Панель']
+CITIES = [
+    ('Москва', 'Московская область', 55.75, 37.62),
+    ('Санкт-Петербург', 'Ленинградская область', 59.93, 30.33),
+    ('Казань', 'Республика Татарстан', 55.79, 49.12),
+    ('Екатеринбург', 'Свердловская область', 56.84, 60.61),
+    ('Новосибирск', 'Новосибирская область', 55.03, 82.92),
+]
+
+
+def _date(rng: random.Random, now: datetime, max_days: int) -> str:
+    return (now - timedelta(days=rng.randint(0, max_days), seconds=rng.randint(0, 86399))).strftime(
+        '%Y-%m-%dT%H:%M:%S+03:00'
+    )
+
+
+def generate_portal(size: str = 'small', seed: int = 42) -> Dict[str, List[Dict]]:
+    """Сгенерировать воспроизводимый набор сущностей портала"""
+    counts = SIZES[size]
+    rng = random.Random(seed)
+    now = datetime(2025, 10, 1, 12, 0, 0)
+    data = {}
+
+    data['department'] = [{'ID': '1', 'NAME': 'Компания', 'UF_HEAD': '1'}]
+    for i in range(2, counts['departments'] + 1):
+        data['department'].append({
+            'ID': str(i),
+            'NAME': f"Отдел {i}",
+            'PARENT': str(rng.randint(1, i - 1)),
+            'UF_HEAD': str(rng.randint(1, counts['users'])),
+        })
+
+    data['user'] = [
+        {
+            'ID': str(i),
+            'ACTIVE': True,
+            'NAME': rng.choice(FIRST_NAMES),
+            'LAST_NAME': rng.choice(LAST_NAMES),
+            'SECOND_NAME': '',
+            'EMAIL': f"user{i}@example.com",
+            'WORK_POSITION': 'Менеджер',
+            'WORK_PHONE': f"+7495{i:07d}",
+            'PERSONAL_PHOTO': '',
+            'UF_DEPARTMENT': [rng.randint(1, counts['departments'])],
+            'UF_PHONE_INNER': str(100 + i),
+            'UF_HEAD': '',
+        }
+        for i in range(1, counts['users'] + 1)
+    ]
+
+    data['company'] = []
+    data['address'] = []
+    for i in range(1, counts['companies'] + 1):
+        city, region, lat, lon = rng.choice(CITIES)
+        data['company'].append({
+            'ID': str(i),
+            'TITLE': f"ООО {rng.choice(COMPANY_WORDS)}{rng.choice(COMPANY_WORDS).lower()} {i}",
+            'PHONE': [{'ID': str(i), 'VALUE': f"+7495{rng.randint(1000000, 9999999)}", 'VALUE_TYPE': 'WORK'}],
+            'EMAIL': [{'ID': str(i), 'VALUE': f"info{i}@company.example", 'VALUE_TYPE': 'WORK'}],
+            'LOGO': {'showUrl': ''},
+            'ASSIGNED_BY_ID': str(rng.randint(1, counts['users'])),
+            'DATE_CREATE': _date(rng, now, 900),
+            'DATE_MODIFY': _date(rng, now, 60),
+        })
+        data['address'].append({
+            'TYPE_ID': '1',
+            'ENTITY_TYPE_ID': '4',
+            'ENTITY_ID': str(i),
+            'ADDRESS_1': f"ул. {rng.choice(COMPANY_WORDS)}ская, д. {rng.randint(1, 150)}",
+            'CITY': rng.choice([city, f"г. {city}", city.upper()]),
+            'REGION': region,
+            'PROVINCE': region,
+            'COUNTRY': 'Россия',
+            '_LAT': lat + rng.uniform(-0.2, 0.2),
+            '_LON': lon + rng.uniform(-0.3, 0.3),
+        })
+
+    data['contact'] = []
+    for i in range(1, counts['contacts'] + 1):
+        data['contact'].append({
+            'ID': str(i),
+            'NAME': rng.choice(FIRST_NAMES),
+            'LAST_NAME': rng.choice(LAST_NAMES),
+            'PHONE': [{'ID': str(i), 'VALUE': f"+79{rng.randint(100000000, 999999999)}", 'VALUE_TYPE': 'WORK'}],
+            'EMAIL': [{'ID': str(i), 'VALUE': f"contact{i}@mail.example", 'VALUE_TYPE': 'WORK'}],
+            'COMPANY_ID': str(rng.randint(1, counts['companies'])) if rng.random() < 0.8 else None,
+            'ASSIGNED_BY_ID': str(rng.randint(1, counts['users'])),
+            'SOURCE_ID': rng.choice(['CALL', 'EMAIL', 'WEB', 'PARTNER']),
+            'DATE_CREATE': _date(rng, now, 900),
+            'DATE_MODIFY': _date(rng, now, 60),
+        })
+
+    data['deal'] = []
+    for i in range(1, counts['deals'] + 1):
+        data['deal'].append({
+            'ID': str(i),
+            'TITLE': f"Сделка #{i}",
+            'OPPORTUNITY': f"{rng.randint(1, 5000) * 100:.2f}",
+            'CURRENCY_ID': rng.choice(CURRENCIES),
+            'STAGE_ID': rng.choice(DEAL_STAGES)[0],
+            'TYPE_ID': rng.choice(DEAL_TYPES),
+            'ASSIGNED_BY_ID': str(rng.randint(1, counts['users'])),
+            'COMPANY_ID': str(rng.randint(1, counts['companies'])),
+            'CONTACT_ID': str(rng.randint(1, counts['contacts'])),
+            'COMMENTS': '',
+            'DATE_CREATE': _date(rng, now, 365),
+            'DATE_MODIFY': _date(rng, now, 30),
+        })
+
+    data['status'] = [
+        {'ID': str(i), 'ENTITY_ID': 'DEAL_STAGE', 'STATUS_ID': status_id, 'NAME': name, 'SORT': str(i * 10)}
+        for i, (status_id, name) in enumerate(DEAL_STAGES, start=1)
+    ]
+    data['type'] = [{'ID': deal_type, 'NAME': deal_type.title()} for deal_type in DEAL_TYPES]
+
+    data['product'] = []
+    data['productImage'] = []
+    for i in range(1, counts['products'] + 1):
+        data['product'].append({
+            'ID': str(i),
+            'NAME': f"{rng.choice(PRODUCT_WORDS)} {rng.choice(COMPANY_WORDS)} {i}",
+            'PRICE': f"{rng.randint(100, 100000)}.00",
+            'CURRENCY_ID': 'RUB',
+            'SECTION_ID': str(rng.randint(1, 20)),
+            'DESCRIPTION': '',
+            'TIMESTAMP_X': _date(rng, now, 60),
+        })
+        data['productImage'].append({
+            'id': str(i),
+            'productId': str(i),
+            'detailUrl': f"https://cdn.example/products/{i}.jpg",
+        })
+
+    data['call'] = [
+        {
+            'ID': str(i),
+            'PORTAL_USER_ID': str(rng.randint(1, counts['users'])),
+            'CALL_START_DATE': _date(rng, now, 30),
+            'CALL_DURATION': str(rng.randint(5, 1800)),
+            'CALL_TYPE': str(rng.choice([1, 2])),
+            'COST': '0.00',
+            'PHONE_NUMBER': f"+79{rng.randint(100000000, 999999999)}",
+            'CALL_RECORD_URL': '',
+        }
+        for i in range(1, counts['calls'] + 1)
+    ]
+
+    data['task'] = [
+        {
+            'ID': str(i),
+            'TITLE': f"Задача #{i}",
+            'STATUS': str(rng.randint(1, 5)),
+            'CREATED_DATE': _date(rng, now, 90),
+            'RESPONSIBLE_ID': str(rng.randint(1, counts['users'])),
+            'UF_CRM_TASK': [f"D_{rng.randint(1, counts['deals'])}"],
+        }
+        for i in range(1, counts['tasks'] + 1)
+    ]
+
+    return data
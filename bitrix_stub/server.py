@@ -0,0 +1,439 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+BATCH_LIMIT = 50
+FILTER_OPERATORS = ('!@', '>=', '<=', '!=', '>', '<', '=', '%', '!', '@')
+
+# Методы списков: сущность набора данных и ключ-обертка результата, если она есть
+LIST_METHODS = {
+    'crm.deal.list': ('deal', None),
+    'crm.contact.list': ('contact', None),
+    'crm.company.list': ('company', None),
+    'crm.address.list': ('address', None),
+    'crm.product.list': ('product', None),
+    'crm.status.list': ('status', None),
+    'crm.type.list': ('type', 'types'),
+    'user.get': ('user', None),
+    'department.get': ('department', None),
+    'voximplant.statistic.get': ('call', None),
+    'tasks.task.list': ('task', 'tasks'),
+    'catalog.productImage.list': ('productImage', 'productImages'),
+}
+GET_METHODS = {
+    'crm.deal.get': 'deal',
+    'crm.contact.get': 'contact',
+    'crm.company.get': 'company',
+    'crm.product.get': 'product',
+}
+ADD_METHODS = {
+    'crm.deal.add': 'deal',
+    'crm.contact.add': 'contact',
+    'crm.company.add': 'company',
+}
+UPDATE_METHODS = {
+    'crm.deal.update': 'deal',
+    'crm.contact.update': 'contact',
+    'crm.company.update': 'company',
+}
+
+
+class BitrixError(Exception):
+    """Ошибка REST в формате Bitrix24"""
+
+    def __init__(self, status: int, code: str, description: str):
+        super().__init__(description)
+        self.status = status
+        self.code = code
+        self.description = description
+
+
+def parse_php_query(query: str) -> Dict:
+    """Разобрать строку запроса в стиле PHP (filter[>ID]=1&select[0]=ID) во вложенные структуры"""
+    result = {}
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        match = re.match(r'^([^\[]+)((?:\[[^\]]*\])*)$', key)
+        if not match:
+            continue
+        path = [match.group(1)] + re.findall(r'\[([^\]]*)\]', match.group(2))
+        container = result
+        for index, part in enumerate(path):
+            if part == '':
+                part = str(len(container))
+            if index == len(path) - 1:
+                container[part] = value
+            else:
+                container = container.setdefault(part, {})
+    return _lists_from_dicts(result)
+
+
+def _lists_from_dicts(value):
+    if isinstance(value, dict):
+        value = {key: _lists_from_dicts(item) for key, item in value.items()}
+        if value and all(key.isdigit() for key in value):
+            return [value[key] for key in sorted(value, key=int)]
+    return value
+
+
+def _get_param(params: Dict, name: str, default=None):
+    """Параметры Bitrix нечувствительны к регистру: filter/FILTER, select/SELECT"""
+    for key in (name, name.upper(), name.lower()):
+        if key in params:
+            return params[key]
+    return default
+
+
+def _comparable(value):
+    try:
+        return 0, float(value)
+    except (TypeError, ValueError):
+        return 1, str(value if value is not None else '').lower()
+
+
+def _value_matches(record_value, operator: str, expected) -> bool:
+    if isinstance(record_value, list):
+        values = [item.get('VALUE') if isinstance(item, dict) else item for item in record_value]
+        if operator.startswith('!'):
+            return all(_value_matches(value, operator, expected) for value in values) if values else True
+        return any(_value_matches(value, operator, expected) for value in values)
+
+    if operator in ('@', '!@') or isinstance(expected, list):
+        options = expected if isinstance(expected, list) else [expected]
+        found = any(_value_matches(record_value, '=', option) for option in options)
+        return not found if operator.startswith('!') else found
+
+    if isinstance(record_value, bool):
+        equal = record_value == (str(expected).lower() in ('true', '1', 'y'))
+        return not equal if operator in ('!', '!=') else equal
+
+    if operator == '%':
+        return str(expected).lower() in str(record_value or '').lower()
+
+    left, right = _comparable(record_value), _comparable(expected)
+    if left[0] != right[0]:
+        left, right = (1, str(record_value or '').lower()), (1, str(expected).lower())
+    if operator in ('', '='):
+        return left == right
+    if operator in ('!', '!='):
+        return left != right
+    if operator == '>':
+        return left > right
+    if operator == '>=':
+        return left >= right
+    if operator == '<':
+        return left < right
+    if operator == '<=':
+        return left <= right
+    return False
+
+
+def matches_filter(record: Dict, filters: Dict) -> bool:
+    """Проверить запись на соответствие фильтру Bitrix24"""
+    for key, expected in (filters or {}).items():
+        operator = next((op for op in FILTER_OPERATORS if key.startswith(op)), '')
+        field = key[len(operator):]
+        if not _value_matches(record.get(field), operator, expected):
+            return False
+    return True
+
+
+class LeakyBucket:
+    """Ограничение частоты запросов, как в Bitrix24: ведро объема burst вытекает со скоростью rate"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.level = 0.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.level = max(0.0, self.level - (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.level + 1 > self.burst:
+                return False
+            self.level += 1
+            return True
+
+
+class BitrixStub:
+    """Поведение REST API портала поверх наборов данных в памяти"""
+
+    def __init__(self, data: Dict[str, List[Dict]], latency: float = 0.0, jitter: float = 0.0,
+                 rate: float = 2.0, burst: int = 50, seed: int = 42):
+        self.latency = latency
+        self.jitter = jitter
+        self.bucket = LeakyBucket(rate, burst)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.method_stats = Counter()
+        self.load(data)
+
+    def load(self, data: Dict[str, List[Dict]]):
+        """Подменить набор данных портала, например между прогонами бенчмарка"""
+        with self.lock:
+            self.data = data
+            self.next_ids = {
+                entity: max((int(record['ID']) for record in records if str(record.get('ID', '')).isdigit()), default=0)
+                for entity, records in data.items()
+            }
+
+    def handle(self, method: str, params: Dict) -> Tuple[int, Dict]:
+        """Обработать HTTP-запрос к методу и вернуть статус и тело ответа"""
+        started = time.time()
+        with self.lock:
+            self.stats['requests'] += 1
+
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+        if not self.bucket.acquire():
+            with self.lock:
+                self.stats['rate_limited'] += 1
+            return 503, {'error': 'QUERY_LIMIT_EXCEEDED', 'error_description': 'Too many requests'}
+
+        try:
+            if method == 'batch':
+                payload = self._batch(params)
+            else:
+                payload = self._call(method, params)
+        except BitrixError as e:
+            return e.status, {'error': e.code, 'error_description': e.description}
+
+        payload['time'] = self._time_block(started)
+        return 200, payload
+
+    def geocode(self, address: str) -> Dict:
+        """Ответ в формате Yandex Geocoder с детерминированными координатами около Москвы"""
+        with self.lock:
+            self.stats['requests'] += 1
+            self.method_stats['geocode'] += 1
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+        digest = hashlib.md5(address.encode('utf-8')).digest()
+        lat = 55.75 + (digest[0] - 128) / 256
+        lon = 37.62 + (digest[1] - 128) / 128
+        member = {'GeoObject': {'name': address, 'Point': {'pos': f"{lon:.6f} {lat:.6f}"}}}
+        return {'response': {'GeoObjectCollection': {'featureMember': [member] if address else []}}}
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats.clear()
+            self.method_stats.clear()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {'totals': dict(self.stats), 'methods': dict(self.method_stats)}
+
+    def _time_block(self, started: float) -> Dict:
+        finished = time.time()
+        return {
+            'start': started,
+            'finish': finished,
+            'duration': finished - started,
+            'processing': finished - started,
+            'date_start': datetime.fromtimestamp(started).isoformat(),
+            'date_finish': datetime.fromtimestamp(finished).isoformat(),
+            'operating': 0,
+            'operating_reset_at': int(finished) + 600,
+        }
+
+    def _batch(self, params: Dict) -> Dict:
+        commands = _get_param(params, 'cmd', {})
+        if len(commands) > BATCH_LIMIT:
+            raise BitrixError(400, 'ERROR_BATCH_LENGTH_EXCEEDED', 'Max batch length exceeded')
+
+        halt = str(_get_param(params, 'halt', 0)) not in ('0', '', 'false', 'False')
+        result = {'result': {}, 'result_error': {}, 'result_total': {}, 'result_next': {}, 'result_time': {}}
+        for key, command in commands.items():
+            started = time.time()
+            method, _, query = command.partition('?')
+            try:
+                payload = self._call(method, parse_php_query(query))
+            except BitrixError as e:
+                result['result_error'][key] = {'error': e.code, 'error_description': e.description}
+                if halt:
+                    break
+                continue
+            result['result'][key] = payload['result']
+            if 'total' in payload:
+                result['result_total'][key] = payload['total']
+            if 'next' in payload:
+                result['result_next'][key] = payload['next']
+            result['result_time'][key] = self._time_block(started)
+
+        # PHP сериализует пустые массивы как [], клиенты к этому привыкли
+        return {'result': {key: value or [] for key, value in result.items()}}
+
+    def _call(self, method: str, params: Dict) -> Dict:
+        with self.lock:
+            self.method_stats[method] += 1
+
+        if method in LIST_METHODS:
+            entity, wrapper = LIST_METHODS[method]
+            return self._list(entity, params, wrapper, method)
+        if method in GET_METHODS:
+            return {'result': self._public(self._get(GET_METHODS[method], params))}
+        if method in ADD_METHODS:
+            return {'result': self._add(ADD_METHODS[method], params)}
+        if method in UPDATE_METHODS:
+            record = self._get(UPDATE_METHODS[method], params)
+            with self.lock:
+                record.update(_get_param(params, 'fields', {}))
+                record['DATE_MODIFY'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S+03:00')
+            return {'result': True}
+        if method == 'crm.deal.contact.items.get':
+            deal = self._get('deal', params)
+            contact_id = deal.get('CONTACT_ID')
+            return {'result': [{'CONTACT_ID': contact_id, 'IS_PRIMARY': 'Y', 'SORT': 10}] if contact_id else []}
+        if method == 'crm.duplicate.findbycomm':
+            return {'result': self._find_duplicates(params)}
+        if method == 'telephony.externalcall.register':
+            return {'result': {'CALL_ID': f"externalCall.{self.random.getrandbits(64):x}"}}
+        if method == 'telephony.externalcall.finish':
+            return {'result': {'CALL_ID': _get_param(params, 'CALL_ID'), 'CALL_FAILED_CODE': '200'}}
+
+        raise BitrixError(404, 'ERROR_METHOD_NOT_FOUND', 'Method not found!')
+
+    def _list(self, entity: str, params: Dict, wrapper: Optional[str], method: str) -> Dict:
+        filters = dict(_get_param(params, 'filter', {}) or {})
+        if entity == 'productImage' and _get_param(params, 'productId'):
+            filters['productId'] = _get_param(params, 'productId')
+
+        records = [record for record in self.data.get(entity, []) if matches_filter(record, filters)]
+
+        order = _get_param(params, 'order', {}) or {}
+        for field, direction in reversed(list(order.items())):
+            records.sort(key=lambda record: _comparable(record.get(field)), reverse=str(direction).upper() == 'DESC')
+
+        select = _get_param(params, 'select', []) or []
+        start = int(_get_param(params, 'start', 0) or 0)
+
+        if start == -1:
+            # Быстрый режим без подсчета total: клиент листает по >ID сам
+            page = records[:PAGE_SIZE]
+            payload = {}
+        else:
+            page = records[start:start + PAGE_SIZE]
+            payload = {'total': len(records)}
+            if start + PAGE_SIZE < len(records):
+                payload['next'] = start + PAGE_SIZE
+
+        items = [self._public(record, select) for record in page]
+        payload['result'] = {wrapper: items} if wrapper else items
+        return payload
+
+    def _get(self, entity: str, params: Dict) -> Dict:
+        record_id = str(_get_param(params, 'id', '') or '')
+        for record in self.data.get(entity, []):
+            if record.get('ID') == record_id:
+                return record
+        raise BitrixError(400, 'NOT_FOUND', 'Not found')
+
+    def _add(self, entity: str, params: Dict) -> int:
+        fields = dict(_get_param(params, 'fields', {}) or {})
+        now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S+03:00')
+        with self.lock:
+            self.next_ids[entity] = self.next_ids.get(entity, 0) + 1
+            new_id = self.next_ids[entity]
+            fields.update({'ID': str(new_id), 'DATE_CREATE': now, 'DATE_MODIFY': now})
+            self.data.setdefault(entity, []).append(fields)
+        return new_id
+
+    def _find_duplicates(self, params: Dict) -> Dict:
+        comm_type = str(_get_param(params, 'type', 'PHONE')).upper()
+        values = set(_get_param(params, 'values', []) or [])
+        entity_type = str(_get_param(params, 'entity_type', 'CONTACT')).upper()
+        entity = entity_type.lower()
+
+        found = [
+            int(record['ID']) for record in self.data.get(entity, [])
+            if any(item.get('VALUE') in values for item in record.get(comm_type) or [])
+        ]
+        return {entity_type: found} if found else []
+
+    @staticmethod
+    def _public(record: Dict, select: List[str] = None) -> Dict:
+        """Убрать служебные поля и оставить только выбранные"""
+        if not select or '*' in select:
+            return {key: value for key, value in record.items() if not key.startswith('_')}
+        fields = set(select) | {'ID'}
+        return {key: value for key, value in record.items() if key in fields}
+
+
+def make_handler(stub: BitrixStub):
+    """Класс обработчика HTTP, привязанный к экземпляру заглушки"""
+
+    class BitrixStubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self._dispatch()
+
+        def do_POST(self):
+            self._dispatch()
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _dispatch(self):
+            url = urlsplit(self.path)
+            method = url.path.rstrip('/').rsplit('/', 1)[-1]
+            if method.endswith('.json'):
+                method = method[:-len('.json')]
+
+            if method == '_stats':
+                return self._respond(200, stub.get_stats())
+            if method == '_reset':
+                stub.reset_stats()
+                return self._respond(200, {'result': True})
+
+            params = parse_php_query(url.query)
+            if method == '1.x':
+                return self._respond(200, stub.geocode(params.get('geocode', '')))
+
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                body = self.rfile.read(length).decode('utf-8')
+                if 'json' in (self.headers.get('Content-Type') or ''):
+                    params.update(json.loads(body or '{}'))
+                else:
+                    params.update(parse_php_query(body))
+
+            status, payload = stub.handle(method, params)
+            self._respond(status, payload)
+
+        def _respond(self, status: int, payload: Any):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return BitrixStubHandler
+
+
+def run_server(stub: BitrixStub, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    """Создать HTTP-сервер заглушки; запуск через serve_forever()"""
+    server = ThreadingHTTPServer((host, port), make_handler(stub))
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повтором первой загрузки индекса после ошибки
+BOOTSTRAP_RETRY_SECONDS = 60
+
+
+def normalize_name(name: str) -> str:
+    """Привести название к виду для поиска: нижний регистр, ё -> е, одиночные пробелы"""
+    return ' '.join(str(name or '').lower().replace('ё', 'е').split())
+
+
+def name_trigrams(normalized: str) -> Set[str]:
+    """Триграммы названия с отступами, плюс начала слов для коротких запросов"""
+    padded = f"  {normalized} "
+    trigrams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    for word in normalized.split():
+        trigrams.add(f"  {word[0]}")
+    return trigrams
+
+
+def query_trigrams(normalized: str) -> Set[str]:
+    """Триграммы запроса: короткий запрос ищется по началу слов, длинный - как подстрока"""
+    if len(normalized) < 3:
+        padded = f"  {normalized}"
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+
+
+class TrigramNameIndex:
+    """
+    Локальный триграммный индекс названий сущностей Bitrix24 с инкрементальным
+    обновлением по отметке изменения. Подклассы задают выгрузку (fetch), поля
+    сущности и то, что возвращает поиск
+    """
+    title_field = 'NAME'
+    modified_field = 'DATE_MODIFY'
+    label = 'Индекс названий'
+
+    def __init__(self, refresh_interval: int, rebuild_interval: int):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._reset()
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        self._failed_at = -BOOTSTRAP_RETRY_SECONDS
+        self._ready = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._bootstrap_lock = threading.Lock()
+
+    def _reset(self):
+        """Создать пустое содержимое индекса; подклассы добавляют свои словари"""
+        self._names: Dict[int, str] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._last_modified: Optional[str] = None
+
+    def _state_fields(self) -> List[str]:
+        return ['_names', '_trigrams', '_last_modified']
+
+    def fetch(self, since: Optional[str]) -> List[Dict]:
+        """Сущности, измененные начиная с since (все при None). Ошибка выгрузки - исключение"""
+        raise NotImplementedError
+
+    def _store(self, item_id: int, item: Dict, name: str):
+        """Сохранить поля сущности, нужные для результатов поиска"""
+
+    def _discard(self, item_id: int, old_name: str):
+        """Убрать данные сущности, привязанные к прежнему названию"""
+
+    def _result(self, item_id: int):
+        raise NotImplementedError
+
+    def _after_refresh(self, full: bool):
+        """Действия после успешного обновления, например сохранение на диск"""
+
+    def clear(self):
+        """Забыть содержимое и отметки обновления: следующее обращение загрузит индекс заново"""
+        with self._refresh_lock, self._lock:
+            self._reset()
+            self._refreshed_at = 0.0
+            self._rebuilt_at = 0.0
+            self._failed_at = -BOOTSTRAP_RETRY_SECONDS
+            self._ready = False
+
+    def search(self, query: str, limit: int = 10) -> List:
+        """Найти по подстроке названия: начало названия, затем начало слова, затем остальное"""
+        self._ensure_fresh()
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+
+        with self._lock:
+            candidates = None
+            for trigram in query_trigrams(normalized):
+                postings = self._trigrams.get(trigram, set())
+                candidates = postings if candidates is None else candidates & postings
+                if not candidates:
+                    return []
+
+            matches = []
+            for item_id in candidates or ():
+                name = self._names[item_id]
+                position = name.find(normalized)
+                if position < 0:
+                    continue
+                if position == 0:
+                    rank = 0
+                elif name[position - 1] == ' ':
+                    rank = 1
+                else:
+                    rank = 2
+                matches.append((rank, name, item_id))
+
+            matches.sort()
+            return [self._result(item_id) for _, _, item_id in matches[:limit]]
+
+    def refresh(self, full: bool = False):
+        """
+        Подтянуть изменения; full=True перестраивает индекс целиком. Новый индекс
+        собирается в стороне и подменяет текущий только после успешной выгрузки:
+        при ошибке исключение пробрасывается, а индекс и отметка остаются прежними
+        """
+        with self._refresh_lock:
+            since = None if full else self._last_modified
+            items = self.fetch(since)
+
+            if full:
+                fresh = object.__new__(type(self))
+                fresh._reset()
+                fresh._apply(items)
+                with self._lock:
+                    for field in self._state_fields():
+                        setattr(self, field, getattr(fresh, field))
+            else:
+                with self._lock:
+                    self._apply(items)
+
+            now = time.monotonic()
+            self._refreshed_at = now
+            if full:
+                self._rebuilt_at = now
+            self._after_refresh(full)
+            logger.info(f"{self.label}: {len(items)} изменений, всего {len(self._names)}")
+
+    def _apply(self, items: List[Dict]):
+        for item in items:
+            self._upsert(int(item['ID']), item)
+            modified = item.get(self.modified_field)
+            if modified and (self._last_modified is None or modified > self._last_modified):
+                self._last_modified = modified
+
+    def _upsert(self, item_id: int, item: Dict):
+        """Добавить или обновить сущность в индексе"""
+        old_name = self._names.get(item_id)
+        if old_name is not None:
+            for trigram in name_trigrams(old_name):
+                postings = self._trigrams.get(trigram)
+                if postings:
+                    postings.discard(item_id)
+            self._discard(item_id, old_name)
+
+        name = normalize_name(item.get(self.title_field))
+        self._names[item_id] = name
+        self._store(item_id, item, name)
+        for trigram in name_trigrams(name):
+            self._trigrams.setdefault(trigram, set()).add(item_id)
+
+    def _bootstrap(self):
+        """Первая загрузка индекса"""
+        self.refresh(full=True)
+
+    def _ensure_fresh(self):
+        """Первая загрузка синхронная, дальнейшие обновления идут в фоне"""
+        now = time.monotonic()
+        if not self._ready:
+            with self._bootstrap_lock:
+                # После неудачной первой загрузки не дергаем Bitrix24 на каждый запрос
+                if not self._ready and now - self._failed_at >= BOOTSTRAP_RETRY_SECONDS:
+                    try:
+                        self._bootstrap()
+                        self._ready = True
+                    except Exception as e:
+                        self._failed_at = now
+                        logger.error(f"{self.label}: ошибка первой загрузки: {e}")
+            return
+
+        if now - self._rebuilt_at > self.rebuild_interval:
+            full = True
+        elif now - self._refreshed_at > self.refresh_interval:
+            full = False
+        else:
+            return
+
+        if not self._refresh_lock.locked():
+            # Отметку сдвигаем сразу, чтобы параллельные запросы не плодили потоки
+            self._refreshed_at = now
+            threading.Thread(target=self._refresh_safely, args=(full,), daemon=True).start()
+
+    def _refresh_safely(self, full: bool):
+        try:
+            self.refresh(full=full)
+        except Exception as e:
+            logger.error(f"{self.label}: ошибка обновления: {e}")
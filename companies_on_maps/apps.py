@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class CompaniesOnMapsConfig(AppConfig):
+    name = 'companies_on_maps'
+
+    def ready(self):
+        if getattr(settings, 'MAP_SCHEDULER_ENABLED', False):
+            from companies_on_maps.utils.pipeline import start_scheduler
+            start_scheduler()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from companies_on_maps.utils.pipeline import rebuild_map_dataset
+
+
+class Command(BaseCommand):
+    help = 'Обновить набор точек карты компаний: только измененные компании и адреса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Собрать заново с повторным геокодированием')
+
+    def handle(self, *args, **options):
+        dataset, stats = rebuild_map_dataset(full=options['full'])
+        if dataset is None:
+            self.stdout.write('Сборка уже выполняется другим процессом')
+            return
+
+        self.stdout.write(
+            f"Версия {dataset.version}: {len(dataset.features)} точек, "
+            f"изменено компаний {stats['companies_changed']}, уникальных адресов {stats['unique_addresses']}, "
+            f"геокодировано {stats['geocoded']}"
+            + ('' if stats['changed'] else ', точки не изменились')
+        )
@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+import settings
+from companies_on_maps.utils.addresses import address_key, group_addresses
+from companies_on_maps.utils.clustering import build_clusters
+from companies_on_maps.utils.coord_store import CoordinateStore
+from companies_on_maps.utils.dataset import load_dataset, make_feature
+from companies_on_maps.utils.pipeline import rebuild_map_dataset
+
+# Красная площадь, Тверская улица и Санкт-Петербург
+MOSCOW = (55.7539, 37.6208)
+TVERSKAYA = (55.7601, 37.6186)
+SPB = (59.9386, 30.3141)
+
+
+def feature(company_id, lat, lon):
+    return make_feature({'ID': company_id, 'TITLE': f"Компания {company_id}"},
+                        {'ENTITY_ID': company_id, 'CITY': 'Москва'}, lat, lon)
+
+
+class AddressKeyTests(SimpleTestCase):
+    def test_spelling_variants_share_key(self):
+        first = {'COUNTRY': 'Россия', 'CITY': 'г. Москва', 'ADDRESS_1': 'улица Ленина, дом 5'}
+        second = {'CITY': 'Москва', 'ADDRESS_1': 'Москва, ул. Ленина, д.5'}
+        self.assertEqual(address_key(first), address_key(second))
+        self.assertEqual(address_key(second), 'москва|ул ленина д 5')
+
+    def test_province_and_foreign_country(self):
+        address = {'COUNTRY': 'Казахстан', 'PROVINCE': 'Алматинская область', 'CITY': 'Алматы'}
+        self.assertEqual(address_key(address), 'казахстан|алматинская обл|алматы')
+
+    def test_group_addresses(self):
+        groups = group_addresses([
+            {'ENTITY_ID': 1, 'CITY': 'Москва', 'ADDRESS_1': 'ул. Ленина, 5'},
+            {'ENTITY_ID': 2, 'CITY': 'москва', 'ADDRESS_1': 'улица Ленина, 5'},
+            {'ENTITY_ID': 3, 'CITY': 'Тверь'},
+            {'ENTITY_ID': 4},
+        ])
+        # Пустой адрес не образует группу
+        self.assertEqual([[a['ENTITY_ID'] for a in members] for members in groups.values()], [[1, 2], [3]])
+
+
+class BuildClustersTests(SimpleTestCase):
+    def test_close_points_merge_on_small_zoom(self):
+        points = [MOSCOW, TVERSKAYA, SPB]
+        feature_json = [json.dumps(feature(i + 1, *point)) for i, point in enumerate(points)]
+        clusters = build_clusters(points, feature_json, max_zoom=15, radius=60)
+
+        self.assertEqual(sorted(clusters), list(range(16)))
+        # На крупном масштабе все точки отдельно и отдаются как есть
+        self.assertEqual(sorted(clusters[15].json), sorted(feature_json))
+
+        city_level = [json.loads(item) for item in clusters[8].json]
+        merged = [item for item in city_level if item['properties'].get('cluster')]
+        self.assertEqual(len(city_level), 2)
+        self.assertEqual(merged[0]['properties']['count'], 2)
+        west, south, east, north = merged[0]['properties']['bbox']
+        self.assertEqual((south, north), (MOSCOW[0], TVERSKAYA[0]))
+
+        world = [json.loads(item) for item in clusters[0].json]
+        self.assertEqual([item['properties']['count'] for item in world], [3])
+
+
+class CoordinateStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = CoordinateStore.from_features([
+            feature(1, *SPB), feature(2, *TVERSKAYA), feature(3, *MOSCOW),
+        ])
+
+    def test_within_radius_nearest_first(self):
+        found = self.store.within_radius(*MOSCOW, radius_km=5)
+        self.assertEqual([company_id for company_id, _ in found], [3, 2])
+        self.assertAlmostEqual(found[0][1], 0.0, places=3)
+        self.assertAlmostEqual(found[1][1], 0.7, places=1)
+
+    def test_nearest(self):
+        self.assertEqual([company_id for company_id, _ in self.store.nearest(*SPB, k=2)], [1, 2])
+        self.assertEqual(self.store.nearest(*SPB, k=0), [])
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, 'coords.npy')
+        self.store.save(path)
+        loaded = CoordinateStore.load(path)
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(loaded.within_radius(*SPB, radius_km=1)[0][0], 1)
+        self.assertIsNone(CoordinateStore.load(os.path.join(directory, 'missing.npy')))
+
+
+class FakeMapClient:
+    def __init__(self):
+        self.companies = {
+            '1': {'ID': '1', 'TITLE': 'Ромашка', 'DATE_MODIFY': '2024-03-01T10:00:00+03:00'},
+            '2': {'ID': '2', 'TITLE': 'Лютик', 'DATE_MODIFY': '2024-03-02T10:00:00+03:00'},
+        }
+        self.addresses = [
+            {'ENTITY_ID': '1', 'TYPE_ID': '1', 'CITY': 'Москва', 'ADDRESS_1': 'ул. Тверская, 1'},
+            {'ENTITY_ID': '2', 'TYPE_ID': '1', 'CITY': 'г. Москва', 'ADDRESS_1': 'улица Тверская, 1'},
+        ]
+
+    def get_companies_modified_since(self, since=None):
+        return [company for company in self.companies.values() if not since or company['DATE_MODIFY'] > since]
+
+    def get_addresses(self):
+        return list(self.addresses)
+
+    def get_companies_by_ids(self, company_ids):
+        return [self.companies[company_id] for company_id in company_ids if company_id in self.companies]
+
+
+class FakeGeocoder:
+    def __init__(self):
+        self.requests = []
+
+    def geocode_address(self, address):
+        self.requests.append(address)
+        return TVERSKAYA
+
+
+class RebuildMapDatasetTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        patcher = mock.patch.multiple(
+            settings,
+            MAP_DATASET_PATH=os.path.join(directory, 'dataset.json'),
+            MAP_COORDS_PATH=os.path.join(directory, 'coords.npy'),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = FakeMapClient()
+        self.geocoder = FakeGeocoder()
+
+    def rebuild(self, full=False):
+        return rebuild_map_dataset(full=full, client=self.client, geocoder=self.geocoder)
+
+    def test_full_build_geocodes_each_address_once(self):
+        dataset, stats = self.rebuild(full=True)
+        self.assertEqual(stats['unique_addresses'], 1)
+        self.assertEqual(len(self.geocoder.requests), 1)
+        self.assertEqual(len(dataset.features), 2)
+        self.assertEqual(dataset.version, 1)
+        self.assertEqual(load_dataset().version, 1)
+        self.assertEqual(len(CoordinateStore.load()), 2)
+
+    def test_incremental_run_reuses_state(self):
+        self.rebuild(full=True)
+        dataset, stats = self.rebuild()
+        self.assertEqual(stats['companies_changed'], 0)
+        self.assertEqual(stats['geocoded'], 0)
+        self.assertFalse(stats['changed'])
+        self.assertEqual(dataset.version, 1)
+
+    def test_new_address_is_geocoded_alone(self):
+        self.rebuild(full=True)
+        self.client.addresses.append({'ENTITY_ID': '2', 'TYPE_ID': '9', 'CITY': 'Тверь'})
+        dataset, stats = self.rebuild()
+        self.assertEqual(self.geocoder.requests[-1], 'Тверь')
+        self.assertEqual(stats['geocoded'], 1)
+        self.assertEqual(dataset.version, 2)
+        self.assertEqual(len(dataset.features), 3)
@@ -3,6 +3,7 @@ from companies_on_maps.views import views
 
 urlpatterns = [
     path('', views.company_map, name='company_map'),
+    path('api/features/', views.map_data, name='map_data'),
+    path('api/nearby/', views.nearby_companies, name='nearby_companies'),
     # path('sync/', views.sync_companies, name='sync_companies'),
-    # path('api/companies/', views.get_companies_json, name='companies_json'),
-]
\ No newline at end of file
+]
@@ -0,0 +1,71 @@
+import re
+from collections import OrderedDict
+from typing import Dict, List
+
+# Сокращения приводятся к одной форме, чтобы "улица Ленина" и "ул. Ленина" совпадали
+ABBREVIATIONS = {
+    'улица': 'ул', 'ул': 'ул',
+    'проспект': 'пр-т', 'пр-кт': 'пр-т', 'просп': 'пр-т', 'пр-т': 'пр-т',
+    'переулок': 'пер', 'пер': 'пер',
+    'шоссе': 'ш', 'ш': 'ш',
+    'бульвар': 'б-р', 'бул': 'б-р', 'б-р': 'б-р',
+    'площадь': 'пл', 'пл': 'пл',
+    'набережная': 'наб', 'наб': 'наб',
+    'дом': 'д', 'д': 'д',
+    'корпус': 'к', 'корп': 'к', 'к': 'к',
+    'строение': 'стр', 'стр': 'стр',
+    'квартира': 'кв', 'кв': 'кв',
+    'офис': 'оф', 'оф': 'оф',
+    'область': 'обл', 'обл': 'обл',
+    'республика': 'респ', 'респ': 'респ',
+    'край': 'край',
+}
+# Слова, которые ничего не добавляют к адресу в своем поле
+CITY_PREFIXES = {'г', 'город', 'гор'}
+DEFAULT_COUNTRIES = {'россия', 'российская федерация', 'рф'}
+
+_PUNCTUATION = re.compile(r'[.,;:"«»()]+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_part(value: str, drop_words=frozenset()) -> str:
+    """Часть адреса в каноническом виде: регистр, ё, пунктуация, пробелы и сокращения"""
+    if not value:
+        return ''
+    value = _PUNCTUATION.sub(' ', str(value).casefold().replace('ё', 'е'))
+    words = [ABBREVIATIONS.get(word, word) for word in _SPACES.split(value.strip()) if word]
+    return ' '.join(word for word in words if word not in drop_words)
+
+
+def address_key(address: Dict) -> str:
+    """
+    Канонический ключ адреса: страна, регион, город и улица в фиксированном порядке.
+    Повторы между полями (PROVINCE = REGION, город внутри ADDRESS_1) и страна
+    по умолчанию не учитываются
+    """
+    country = normalize_part(address.get('COUNTRY'))
+    parts = [] if country in DEFAULT_COUNTRIES else [country]
+    parts.append(normalize_part(address.get('REGION')) or normalize_part(address.get('PROVINCE')))
+    parts.append(normalize_part(address.get('CITY'), CITY_PREFIXES))
+
+    # ADDRESS_1 часто повторяет город или регион через запятую: такие части отбрасываем
+    known = {part for part in parts if part}
+    street = []
+    for component in str(address.get('ADDRESS_1') or '').split(','):
+        component = normalize_part(component, CITY_PREFIXES)
+        if component and component not in known:
+            street.append(component)
+            known.add(component)
+    parts.append(' '.join(street))
+
+    return '|'.join(part for part in parts if part)
+
+
+def group_addresses(addresses: List[Dict]) -> Dict[str, List[Dict]]:
+    """Сгруппировать адреса по каноническому ключу в порядке первого появления"""
+    groups = OrderedDict()
+    for address in addresses:
+        key = address_key(address)
+        if key:
+            groups.setdefault(key, []).append(address)
+    return groups
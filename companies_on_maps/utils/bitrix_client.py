@@ -1,19 +1,24 @@
 from typing import List, Dict, Optional
-from fast_bitrix24 import Bitrix
+from monitoring.bitrix import InstrumentedBitrix
 
 import settings
 
+# Поля компании, нужные для балуна на карте и инкрементального обновления
+COMPANY_FIELDS = ['ID', 'TITLE', 'PHONE', 'EMAIL', 'LOGO', 'DATE_MODIFY']
+
 
 class BitrixClient:
     def __init__(self):
         self.webhook_url = settings.BITRIX24_WEBHOOK_URL
-        self.bitrix = Bitrix(self.webhook_url)
+        self.bitrix = InstrumentedBitrix(self.webhook_url)
 
     def get_addresses(self) -> List[Dict]:
         """Получение списка адресов из Битрикс24"""
         try:
+            # Только адреса компаний: у контактов и лидов свои ENTITY_ID, которые совпадают с ID компаний
             addresses = self.bitrix.get_all('crm.address.list', {
-                'select': ['ENTITY_ID', 'ADDRESS_1', 'CITY', 'REGION', 'PROVINCE', 'COUNTRY', ]
+                'filter': {'ENTITY_TYPE_ID': 4},
+                'select': ['TYPE_ID', 'ENTITY_ID', 'ADDRESS_1', 'CITY', 'REGION', 'PROVINCE', 'COUNTRY', ]
             })
             return addresses
         except Exception as e:
@@ -21,16 +26,41 @@ class BitrixClient:
             return []
 
     def get_companies(self) -> List[Dict]:
-        """Получение списка компаний из Битрикс24"""
+        """Получение списка компаний из Битрикс24 вместе с контактами и логотипом для балуна"""
         try:
             companies = self.bitrix.get_all('crm.company.list', {
-                'select': ['ID', 'TITLE']
+                'select': ['ID', 'TITLE', 'PHONE', 'EMAIL', 'LOGO']
             })
             return companies
         except Exception as e:
             print(f"Ошибка при получении компаний: {e}")
             return []
 
+    def get_companies_modified_since(self, since: str = None) -> List[Dict]:
+        """Компании, измененные начиная с отметки DATE_MODIFY (все, если отметки нет)"""
+        params = {'select': COMPANY_FIELDS}
+        if since:
+            params['filter'] = {'>=DATE_MODIFY': since}
+        try:
+            return self.bitrix.get_all('crm.company.list', params)
+        except Exception as e:
+            print(f"Ошибка при получении измененных компаний: {e}")
+            return []
+
+    def get_companies_by_ids(self, company_ids) -> List[Dict]:
+        """Компании по списку ID, пачками по 500 ID в фильтре"""
+        company_ids = list(company_ids)
+        companies = []
+        try:
+            for start in range(0, len(company_ids), 500):
+                companies.extend(self.bitrix.get_all('crm.company.list', {
+                    'filter': {'ID': company_ids[start:start + 500]},
+                    'select': COMPANY_FIELDS,
+                }))
+        except Exception as e:
+            print(f"Ошибка при получении компаний по ID: {e}")
+        return companies
+
     def get_company_contacts(self, company_id: int) -> Optional[str]:
         """Получение контактов и логотипа компании"""
         try:
@@ -0,0 +1,100 @@
+import json
+import math
+from typing import Dict, List, Sequence, Tuple
+
+from .spatial import GridIndex
+
+TILE_SIZE = 256
+
+
+def project(lat: float, lon: float) -> Tuple[float, float]:
+    """Координаты точки в проекции Меркатора, нормированные на [0, 1]"""
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = (lon + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+class ZoomClusters:
+    """Кластеры одного уровня масштаба: JSON каждого кластера и индекс по их центрам"""
+
+    def __init__(self, zoom: int, clusters: List[Dict], feature_json: Sequence[str]):
+        self.zoom = zoom
+        self.json = []
+        centers = []
+        for cluster in clusters:
+            lat = cluster['lat_sum'] / cluster['count']
+            lon = cluster['lon_sum'] / cluster['count']
+            centers.append((lat, lon))
+            if cluster['count'] == 1:
+                # Одиночная точка отдается как обычная метка компании
+                self.json.append(feature_json[cluster['point']])
+                continue
+            self.json.append(json.dumps({
+                'type': 'Feature',
+                'id': f"c{zoom}-{cluster['key'][0]}-{cluster['key'][1]}",
+                'geometry': {'type': 'Point', 'coordinates': [round(lon, 6), round(lat, 6)]},
+                'properties': {
+                    'cluster': True,
+                    'count': cluster['count'],
+                    'bbox': [cluster['west'], cluster['south'], cluster['east'], cluster['north']],
+                },
+            }, separators=(',', ':')))
+        self.index = GridIndex(centers)
+
+
+def build_clusters(points: Sequence[Tuple[float, float]], feature_json: Sequence[str],
+                   max_zoom: int, radius: int) -> Dict[int, ZoomClusters]:
+    """
+    Сеточная кластеризация для масштабов 0..max_zoom. Ячейка - квадрат radius пикселей;
+    на масштабе z-1 ячейка вдвое больше, поэтому кластеры строятся слиянием кластеров
+    уровня z по ключу ячейки, деленному на два
+    """
+    cell = radius / (TILE_SIZE * 2 ** max_zoom)
+    level = {}
+    for i, (lat, lon) in enumerate(points):
+        x, y = project(lat, lon)
+        key = (math.floor(x / cell), math.floor(y / cell))
+        cluster = level.get(key)
+        if cluster is None:
+            level[key] = {
+                'key': key, 'count': 1, 'point': i, 'lat_sum': lat, 'lon_sum': lon,
+                'south': lat, 'north': lat, 'west': lon, 'east': lon,
+            }
+        else:
+            _merge_point(cluster, lat, lon)
+
+    result = {}
+    for zoom in range(max_zoom, -1, -1):
+        result[zoom] = ZoomClusters(zoom, list(level.values()), feature_json)
+        parent_level = {}
+        for cluster in level.values():
+            key = (cluster['key'][0] // 2, cluster['key'][1] // 2)
+            parent = parent_level.get(key)
+            if parent is None:
+                parent_level[key] = dict(cluster, key=key)
+            else:
+                _merge_cluster(parent, cluster)
+        level = parent_level
+    return result
+
+
+def _merge_point(cluster: Dict, lat: float, lon: float):
+    cluster['count'] += 1
+    cluster['lat_sum'] += lat
+    cluster['lon_sum'] += lon
+    cluster['south'] = min(cluster['south'], lat)
+    cluster['north'] = max(cluster['north'], lat)
+    cluster['west'] = min(cluster['west'], lon)
+    cluster['east'] = max(cluster['east'], lon)
+
+
+def _merge_cluster(cluster: Dict, other: Dict):
+    cluster['count'] += other['count']
+    cluster['lat_sum'] += other['lat_sum']
+    cluster['lon_sum'] += other['lon_sum']
+    cluster['south'] = min(cluster['south'], other['south'])
+    cluster['north'] = max(cluster['north'], other['north'])
+    cluster['west'] = min(cluster['west'], other['west'])
+    cluster['east'] = max(cluster['east'], other['east'])
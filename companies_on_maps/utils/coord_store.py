@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import settings
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Одна запись на точку: координаты в радианах и ID компании
+POINT_DTYPE = np.dtype([('lat', '<f8'), ('lon', '<f8'), ('company_id', '<i8')])
+
+
+class CoordinateStore:
+    """
+    Компактное хранилище координат компаний для пространственных запросов.
+    Точки отсортированы по широте, поэтому запрос радиуса считает расстояния
+    только для полосы широт, в которую может попасть круг
+    """
+
+    def __init__(self, points: np.ndarray):
+        self.points = points
+
+    @classmethod
+    def from_features(cls, features: List[Dict]) -> 'CoordinateStore':
+        points = np.empty(len(features), dtype=POINT_DTYPE)
+        for i, feature in enumerate(features):
+            lon, lat = feature['geometry']['coordinates']
+            points[i] = (lat, lon, feature['properties']['company_id'])
+        points['lat'] = np.radians(points['lat'])
+        points['lon'] = np.radians(points['lon'])
+        points.sort(order='lat', kind='stable')
+        return cls(points)
+
+    def __len__(self):
+        return len(self.points)
+
+    def save(self, path: str = None):
+        """Атомарно записать хранилище в .npy, пригодный для отображения в память"""
+        path = path or settings.MAP_COORDS_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            np.save(file, self.points)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = None) -> Optional['CoordinateStore']:
+        """Открыть хранилище без чтения в память: страницы файла подгружает ОС"""
+        try:
+            return cls(np.load(path or settings.MAP_COORDS_PATH, mmap_mode='r'))
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _distances(points: np.ndarray, lat: float, lon: float) -> np.ndarray:
+        """Расстояния по формуле гаверсинусов, км"""
+        lat, lon = np.radians(lat), np.radians(lon)
+        sin_dlat = np.sin((points['lat'] - lat) / 2)
+        sin_dlon = np.sin((points['lon'] - lon) / 2)
+        a = sin_dlat ** 2 + np.cos(lat) * np.cos(points['lat']) * sin_dlon ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """Компании в радиусе radius_km от точки, ближайшие первыми: [(company_id, км)]"""
+        delta = radius_km / EARTH_RADIUS_KM
+        low, high = np.searchsorted(self.points['lat'], [np.radians(lat) - delta, np.radians(lat) + delta])
+        band = self.points[low:high]
+        distances = self._distances(band, lat, lon)
+        inside = np.flatnonzero(distances <= radius_km)
+        inside = inside[np.argsort(distances[inside], kind='stable')]
+        return [(int(band['company_id'][i]), float(distances[i])) for i in inside]
+
+    def nearest(self, lat: float, lon: float, k: int = 10) -> List[Tuple[int, float]]:
+        """k ближайших точек: [(company_id, км)]"""
+        if not len(self.points) or k <= 0:
+            return []
+        distances = self._distances(self.points, lat, lon)
+        k = min(k, len(distances))
+        candidates = np.argpartition(distances, k - 1)[:k]
+        candidates = candidates[np.argsort(distances[candidates], kind='stable')]
+        return [(int(self.points['company_id'][i]), float(distances[i])) for i in candidates]
+
+
+_current = None
+_current_mtime = None
+_lock = threading.Lock()
+
+
+def get_coordinate_store() -> Optional[CoordinateStore]:
+    """Хранилище текущей версии карты; перечитывается после публикации новой версии"""
+    global _current, _current_mtime
+    path = settings.MAP_COORDS_PATH
+    with _lock:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return _current
+        if _current is None or mtime != _current_mtime:
+            store = CoordinateStore.load(path)
+            if store is not None:
+                _current, _current_mtime = store, mtime
+        return _current
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import settings
+from .clustering import build_clusters
+from .spatial import GridIndex
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_FIELDS = ('COUNTRY', 'REGION', 'CITY', 'ADDRESS_1')
+
+
+def format_address(address: Dict) -> str:
+    """Строка адреса для геокодера"""
+    return ', '.join(address[key] for key in ADDRESS_FIELDS if address.get(key))
+
+
+def _first_value(items) -> str:
+    return items[0].get('VALUE', '') if items else ''
+
+
+def make_feature(company: Dict, address: Dict, lat: float, lon: float) -> Dict:
+    """Точка компании в формате GeoJSON (координаты в порядке [долгота, широта])"""
+    return {
+        'type': 'Feature',
+        'id': f"{address['ENTITY_ID']}-{address.get('TYPE_ID') or 1}",
+        'geometry': {'type': 'Point', 'coordinates': [round(lon, 6), round(lat, 6)]},
+        'properties': {
+            'company_id': int(company['ID']),
+            'name': company.get('TITLE', ''),
+            'address': format_address(address),
+            'phone': _first_value(company.get('PHONE')),
+            'email': _first_value(company.get('EMAIL')),
+            'logo': (company.get('LOGO') or {}).get('showUrl', ''),
+        },
+    }
+
+
+class MapDataset:
+    """
+    Предрасчитанные точки карты с пространственным индексом.
+    В state конвейер обновления хранит все, что нужно для следующего инкрементального прогона
+    """
+
+    def __init__(self, features: List[Dict], version: int = 0, built_at: str = None, state: Dict = None):
+        self.features = features
+        self.version = version
+        self.built_at = built_at or datetime.now().isoformat()
+        self.state = state or {}
+        # Сериализуем каждую точку один раз, ответы API собираются склейкой строк
+        self.feature_json = [json.dumps(feature, ensure_ascii=False, separators=(',', ':')) for feature in features]
+        self.index = GridIndex([
+            (feature['geometry']['coordinates'][1], feature['geometry']['coordinates'][0]) for feature in features
+        ])
+        self.company_names = {feature['properties']['company_id']: feature['properties']['name'] for feature in features}
+        # Кластеры всех масштабов считаются один раз при смене набора точек
+        self.cluster_max_zoom = getattr(settings, 'MAP_CLUSTER_MAX_ZOOM', 15)
+        self.clusters = build_clusters(
+            self.index.points, self.feature_json,
+            self.cluster_max_zoom, getattr(settings, 'MAP_CLUSTER_RADIUS', 60),
+        )
+
+    @property
+    def bounds(self) -> Optional[List[List[float]]]:
+        """Границы всех точек [[юг, запад], [север, восток]] для начального положения карты"""
+        if not self.features:
+            return None
+        lats = [lat for lat, _ in self.index.points]
+        lons = [lon for _, lon in self.index.points]
+        return [[min(lats), min(lons)], [max(lats), max(lons)]]
+
+    def query(self, bbox=None) -> List[int]:
+        """Номера точек внутри bbox (запад, юг, восток, север) или всех точек"""
+        if bbox is None:
+            return list(range(len(self.features)))
+        west, south, east, north = bbox
+        return self.index.query(south, west, north, east)
+
+    def render(self, bbox=None, zoom: int = None) -> List[str]:
+        """JSON точек и кластеров для видимой области; без zoom или крупнее MAP_CLUSTER_MAX_ZOOM - только точки"""
+        if zoom is None or zoom > self.cluster_max_zoom:
+            return [self.feature_json[i] for i in self.query(bbox)]
+
+        level = self.clusters[max(zoom, 0)]
+        if bbox is None:
+            return list(level.json)
+        west, south, east, north = bbox
+        return [level.json[i] for i in level.index.query(south, west, north, east)]
+
+    def to_dict(self) -> Dict:
+        return {'version': self.version, 'built_at': self.built_at, 'features': self.features, 'state': self.state}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'MapDataset':
+        return cls(data.get('features', []), data.get('version', 0), data.get('built_at'), data.get('state'))
+
+
+def save_dataset(dataset: MapDataset, path: str = None):
+    """Атомарно записать набор точек на диск"""
+    path = path or settings.MAP_DATASET_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        json.dump(dataset.to_dict(), file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_dataset(path: str = None) -> Optional[MapDataset]:
+    path = path or settings.MAP_DATASET_PATH
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return MapDataset.from_dict(json.load(file))
+    except (OSError, ValueError):
+        return None
+
+
+_current = None
+_current_mtime = None
+_rebuild_attempted_at = None
+_lock = threading.Lock()
+
+
+def get_dataset() -> MapDataset:
+    """
+    Последняя опубликованная версия точек. Перечитывается, когда файл обновил конвейер
+    (manage.py rebuild_map или планировщик); страница карты Bitrix24 не опрашивает
+    """
+    global _current, _current_mtime, _rebuild_attempted_at
+    path = settings.MAP_DATASET_PATH
+    with _lock:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+
+        if _current is not None and mtime == _current_mtime:
+            return _current
+
+        dataset = load_dataset(path) if mtime is not None else None
+        if dataset is None:
+            # Набор еще не собран: отдаем пустую карту и запускаем сборку в фоне не чаще
+            # MAP_REBUILD_RETRY_SECONDS, чтобы упавшая сборка не повторялась на каждый запрос
+            retry = getattr(settings, 'MAP_REBUILD_RETRY_SECONDS', 60)
+            now = time.monotonic()
+            if _rebuild_attempted_at is None or now - _rebuild_attempted_at >= retry:
+                _rebuild_attempted_at = now
+                from .pipeline import rebuild_in_background
+                rebuild_in_background()
+            return _current or MapDataset([])
+
+        _current, _current_mtime = dataset, mtime
+        return _current
@@ -0,0 +1,151 @@
+import fcntl
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import settings
+from .addresses import group_addresses
+from .bitrix_client import COMPANY_FIELDS, BitrixClient
+from .coord_store import CoordinateStore
+from .dataset import MapDataset, format_address, load_dataset, make_feature, save_dataset
+from .geocoder import YandexGeocoder
+
+logger = logging.getLogger(__name__)
+
+
+def _compact_company(company: Dict) -> Dict:
+    return {field: company.get(field) for field in COMPANY_FIELDS}
+
+
+def rebuild_map_dataset(full: bool = False, client: BitrixClient = None,
+                        geocoder: YandexGeocoder = None) -> Tuple[Optional[MapDataset], Dict]:
+    """
+    Обновить набор точек карты. Компании подтягиваются по DATE_MODIFY с прошлого прогона,
+    адреса (у crm.address.list нет даты изменения) сводятся к каноническим ключам,
+    и геокодируются только ключи, которых еще нет в состоянии. Если точки изменились,
+    версия набора увеличивается и файл публикуется атомарно.
+    """
+    client = client or BitrixClient()
+    geocoder = geocoder or YandexGeocoder()
+    stats = {'companies_changed': 0, 'unique_addresses': 0, 'geocoded': 0, 'changed': False}
+
+    lock_path = f"{settings.MAP_DATASET_PATH}.lock"
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'w') as lock_file:
+        try:
+            # Планировщик и cron могут запустить сборку одновременно
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            logger.info("Сборка карты уже выполняется другим процессом")
+            return None, stats
+
+        previous = load_dataset()
+        # Полная сборка игнорирует состояние, но продолжает нумерацию версий
+        state = previous.state if previous and not full else {}
+        companies = dict(state.get('companies', {}))
+        geocoded = dict(state.get('geocoded', {}))
+        last_modified = state.get('last_modified') if companies else None
+
+        for company in client.get_companies_modified_since(last_modified):
+            companies[str(company['ID'])] = _compact_company(company)
+            stats['companies_changed'] += 1
+            modified = company.get('DATE_MODIFY')
+            if modified and (last_modified is None or modified > last_modified):
+                last_modified = modified
+
+        addresses = client.get_addresses()
+        if not addresses and previous and previous.features:
+            logger.error("Bitrix24 не вернул адреса, предыдущая версия карты сохранена")
+            return previous, stats
+
+        # Адреса компаний, которых еще нет в состоянии (например, адрес добавили без правки компании)
+        missing = {str(address.get('ENTITY_ID')) for address in addresses} - companies.keys()
+        for company in client.get_companies_by_ids(missing) if missing else []:
+            companies[str(company['ID'])] = _compact_company(company)
+
+        # Одинаковые по смыслу адреса геокодируются один раз, координаты расходятся по всем компаниям
+        groups = group_addresses([address for address in addresses if str(address.get('ENTITY_ID')) in companies])
+        stats['unique_addresses'] = len(groups)
+        for key, members in groups.items():
+            if key in geocoded:
+                continue
+            coordinates = geocoder.geocode_address(format_address(members[0]))
+            stats['geocoded'] += 1
+            if coordinates:
+                geocoded[key] = list(coordinates)
+            # Неудачное геокодирование повторится при следующем прогоне
+
+        features = []
+        for key, members in groups.items():
+            if key not in geocoded:
+                continue
+            for address in members:
+                features.append(make_feature(companies[str(address['ENTITY_ID'])], address, *geocoded[key]))
+
+        with_address = {str(address.get('ENTITY_ID')) for address in addresses}
+        new_state = {
+            'last_modified': last_modified,
+            'companies': {company_id: company for company_id, company in companies.items()
+                          if company_id in with_address},
+            'geocoded': {key: point for key, point in geocoded.items() if key in groups},
+        }
+
+        if previous and not full and features == previous.features:
+            if new_state != previous.state:
+                # Точки те же, но отметка DATE_MODIFY сдвинулась: версию не меняем
+                previous.state = new_state
+                save_dataset(previous)
+            if not os.path.exists(settings.MAP_COORDS_PATH):
+                CoordinateStore.from_features(previous.features).save()
+            return previous, stats
+
+        dataset = MapDataset(features, version=(previous.version + 1) if previous else 1, state=new_state)
+        CoordinateStore.from_features(features).save()
+        save_dataset(dataset)
+        stats['changed'] = True
+        logger.info(f"Карта обновлена до версии {dataset.version}: {len(features)} точек, {stats}")
+        return dataset, stats
+
+
+_background_lock = threading.Lock()
+_background_thread = None
+
+
+def rebuild_in_background(full: bool = False):
+    """Запустить сборку в фоновом потоке, если она еще не идет в этом процессе"""
+    global _background_thread
+    with _background_lock:
+        if _background_thread is not None and _background_thread.is_alive():
+            return
+        _background_thread = threading.Thread(target=_rebuild_safely, args=(full,), daemon=True)
+        _background_thread.start()
+
+
+def _rebuild_safely(full: bool = False):
+    try:
+        rebuild_map_dataset(full=full)
+    except Exception as e:
+        logger.error(f"Ошибка сборки карты: {e}")
+
+
+_scheduler = None
+
+
+def start_scheduler():
+    """Периодическое обновление карты внутри процесса (MAP_SCHEDULER_ENABLED)"""
+    global _scheduler
+    if _scheduler is not None:
+        return
+    from datetime import datetime
+
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    _scheduler = BackgroundScheduler(daemon=True)
+    _scheduler.add_job(
+        _rebuild_safely, 'interval',
+        seconds=getattr(settings, 'MAP_REBUILD_INTERVAL', 600),
+        next_run_time=datetime.now(),
+        max_instances=1, coalesce=True,
+    )
+    _scheduler.start()
@@ -0,0 +1,47 @@
+import math
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+
+class GridIndex:
+    """
+    Равномерная сетка по широте/долготе: каждая ячейка хранит номера точек,
+    запрос прямоугольника просматривает только пересекающиеся с ним ячейки
+    """
+
+    def __init__(self, points: Sequence[Tuple[float, float]], cell_size: float = 0.25):
+        self.cell_size = cell_size
+        self.points = list(points)
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, (lat, lon) in enumerate(self.points):
+            self.cells[self._cell(lat, lon)].append(i)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def query(self, south: float, west: float, north: float, east: float) -> List[int]:
+        """Номера точек внутри прямоугольника; west > east - прямоугольник пересекает 180-й меридиан"""
+        if west > east:
+            return self.query(south, west, north, 180.0) + self.query(south, -180.0, north, east)
+
+        row_from, col_from = self._cell(south, west)
+        row_to, col_to = self._cell(north, east)
+
+        if (row_to - row_from + 1) * (col_to - col_from + 1) > len(self.cells):
+            # Большой прямоугольник: дешевле пройти по занятым ячейкам, чем по всем в диапазоне
+            cells = [cell for cell in self.cells if row_from <= cell[0] <= row_to and col_from <= cell[1] <= col_to]
+        else:
+            cells = [
+                (row, col)
+                for row in range(row_from, row_to + 1)
+                for col in range(col_from, col_to + 1)
+                if (row, col) in self.cells
+            ]
+
+        result = []
+        for cell in cells:
+            for i in self.cells[cell]:
+                lat, lon = self.points[i]
+                if south <= lat <= north and west <= lon <= east:
+                    result.append(i)
+        return result
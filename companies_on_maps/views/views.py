@@ -0,0 +1,82 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotModified, JsonResponse
+from django.shortcuts import render
+from django.urls import reverse
+from django.views.decorators.gzip import gzip_page
+
+from integration_utils.bitrix24.bitrix_user_auth.main_auth import main_auth
+from companies_on_maps.utils.coord_store import get_coordinate_store
+from companies_on_maps.utils.dataset import get_dataset
+
+
+def _parse_bbox(value: str):
+    """bbox в порядке запад,юг,восток,север (как в GeoJSON)"""
+    west, south, east, north = (float(part) for part in value.split(','))
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError(value)
+    return west, south, east, north
+
+
+@main_auth(on_cookies=True)
+def company_map(request):
+    """Страница карты: точки подгружаются отдельно, по видимой области"""
+    dataset = get_dataset()
+    return render(request, 'map.html', {
+        'yandex_maps_api_key': settings.YANDEX_MAPS_API_KEY,
+        'map_data_url': reverse('map_data'),
+        'initial_bounds': json.dumps(dataset.bounds),
+    })
+
+
+@gzip_page
+@main_auth(on_cookies=True)
+def map_data(request):
+    """
+    Точки компаний в видимой области карты в формате GeoJSON FeatureCollection.
+    С параметром zoom близкие точки объединяются в кластеры (properties.cluster)
+    """
+    try:
+        bbox = _parse_bbox(request.GET['bbox']) if request.GET.get('bbox') else None
+        zoom = int(request.GET['zoom']) if request.GET.get('zoom') else None
+    except ValueError:
+        return HttpResponseBadRequest('Некорректный bbox или zoom')
+
+    dataset = get_dataset()
+    etag = '"{}"'.format(hashlib.md5(f"{dataset.version}:{bbox}:{zoom}".encode()).hexdigest())
+    # GZip помечает ETag сжатого ответа как слабый, сравниваем без префикса W/
+    if request.headers.get('If-None-Match', '').replace('W/', '') == etag:
+        response = HttpResponseNotModified()
+    else:
+        body = '{{"type":"FeatureCollection","version":{},"features":[{}]}}'.format(
+            dataset.version, ','.join(dataset.render(bbox, zoom))
+        )
+        response = HttpResponse(body, content_type='application/geo+json; charset=utf-8')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
+@main_auth(on_cookies=True)
+def nearby_companies(request):
+    """Компании рядом с точкой: ?lat=&lon=&radius=км или ?lat=&lon=&k=количество"""
+    try:
+        lat = float(request.GET['lat'])
+        lon = float(request.GET['lon'])
+        radius = float(request.GET['radius']) if request.GET.get('radius') else None
+        k = min(int(request.GET.get('k', 10)), 1000)
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Нужны числовые lat, lon и radius или k')
+
+    store = get_coordinate_store()
+    if store is None:
+        return JsonResponse({'companies': []})
+
+    matches = store.within_radius(lat, lon, radius)[:1000] if radius is not None else store.nearest(lat, lon, k)
+    names = get_dataset().company_names
+    return JsonResponse({'companies': [
+        {'company_id': company_id, 'name': names.get(company_id, ''), 'distance_km': round(distance, 3)}
+        for company_id, distance in matches
+    ]})
@@ -0,0 +1,58 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64, unique=True, verbose_name='Отпечаток файла (sha256)')),
+                ('file_name', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('total_rows', models.IntegerField(default=0, verbose_name='Строк после нормализации')),
+                ('committed_rows', models.IntegerField(default=0, verbose_name='Отправлено строк')),
+                ('status', models.CharField(choices=[('running', 'Выполняется'), ('completed', 'Завершен'),
+                                                     ('failed', 'Прерван')],
+                                            default='running', max_length=16, verbose_name='Статус')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка импорта',
+                'verbose_name_plural': 'Контрольные точки импорта',
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportBatchResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_number', models.IntegerField(verbose_name='Номер пачки')),
+                ('first_row', models.IntegerField(verbose_name='Первая строка')),
+                ('row_count', models.IntegerField(verbose_name='Строк в пачке')),
+                ('created', models.IntegerField(default=0, verbose_name='Создано')),
+                ('updated', models.IntegerField(default=0, verbose_name='Обновлено')),
+                ('skipped', models.IntegerField(default=0, verbose_name='Пропущено')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches',
+                                                 to='contact_import.importcheckpoint',
+                                                 verbose_name='Контрольная точка')),
+            ],
+            options={
+                'verbose_name': 'Пачка импорта',
+                'verbose_name_plural': 'Пачки импорта',
+                'ordering': ['checkpoint', 'batch_number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importbatchresult',
+            constraint=models.UniqueConstraint(fields=('checkpoint', 'batch_number'), name='import_batch_unique'),
+        ),
+    ]
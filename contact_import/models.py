@@ -0,0 +1,55 @@
+from django.db import models
+
+
+class ImportCheckpoint(models.Model):
+    """Контрольная точка импорта файла: до какой строки данные уже отправлены в Bitrix24"""
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_COMPLETED, 'Завершен'),
+        (STATUS_FAILED, 'Прерван'),
+    ]
+
+    fingerprint = models.CharField(max_length=64, unique=True, verbose_name="Отпечаток файла (sha256)")
+    file_name = models.CharField(max_length=255, verbose_name="Имя файла")
+    total_rows = models.IntegerField(default=0, verbose_name="Строк после нормализации")
+    committed_rows = models.IntegerField(default=0, verbose_name="Отправлено строк")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_RUNNING,
+                              verbose_name="Статус")
+    error = models.TextField(blank=True, default='', verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Контрольная точка импорта"
+        verbose_name_plural = "Контрольные точки импорта"
+        ordering = ['-updated_at']
+
+    def __str__(self):
+        return f"{self.file_name}: {self.committed_rows}/{self.total_rows}"
+
+
+class ImportBatchResult(models.Model):
+    """Результат одной отправленной пачки строк импорта"""
+    checkpoint = models.ForeignKey(ImportCheckpoint, on_delete=models.CASCADE, related_name='batches',
+                                   verbose_name="Контрольная точка")
+    batch_number = models.IntegerField(verbose_name="Номер пачки")
+    first_row = models.IntegerField(verbose_name="Первая строка")
+    row_count = models.IntegerField(verbose_name="Строк в пачке")
+    created = models.IntegerField(default=0, verbose_name="Создано")
+    updated = models.IntegerField(default=0, verbose_name="Обновлено")
+    skipped = models.IntegerField(default=0, verbose_name="Пропущено")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Пачка импорта"
+        verbose_name_plural = "Пачки импорта"
+        ordering = ['checkpoint', 'batch_number']
+        constraints = [
+            models.UniqueConstraint(fields=['checkpoint', 'batch_number'], name='import_batch_unique'),
+        ]
+
+    def __str__(self):
+        return f"Пачка {self.batch_number} ({self.first_row}+{self.row_count})"
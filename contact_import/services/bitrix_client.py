@@ -1,4 +1,4 @@
-from fast_bitrix24 import Bitrix
+from monitoring.bitrix import InstrumentedBitrix
 import logging
 
 import settings
@@ -8,35 +8,31 @@ logger = logging.getLogger(__name__)
 
 class BitrixClient:
     def __init__(self):
-        self.bitrix = Bitrix(settings.BITRIX24_WEBHOOK_URL)
+        self.bitrix = InstrumentedBitrix(settings.BITRIX24_WEBHOOK_URL)
         self.batch_size = settings.BITRIX_BATCH_SIZE
+        # Размер страницы списочных методов REST API
+        self.page_size = 50
 
     def search_companies(self, query: str, limit: int = 10):
-        """Быстрый поиск компаний через Bitrix API"""
-        try:
-            # Используем поиск Bitrix для больших объемов данных
-            companies = self.b.get_all('crm.company.list', {
-                'select': ['ID', 'TITLE'],
-                'filter': {'%TITLE': query},
-                'order': {'TITLE': 'ASC'},
-                'start': 0
-            })
-
-            # Сортируем по релевантности (сначала те, что начинаются с запроса)
-            companies_sorted = sorted(
-                companies,
-                key=lambda x: (
-                    0 if x['TITLE'].lower().startswith(query.lower()) else 1,
-                    x['TITLE']
-                )
-            )
-
-            return [company['TITLE'] for company in companies_sorted[:limit]]
+        """Быстрый поиск компаний по локальному индексу названий"""
+        from .company_index import company_index
 
+        try:
+            return company_index.search(query, limit)
         except Exception as e:
             logger.error(f"Error searching companies: {e}")
             return []
 
+    def get_companies_modified_since(self, since: str = None):
+        """
+        Получить компании, измененные начиная с отметки DATE_MODIFY (все, если отметки нет).
+        Ошибка не превращается в пустой список: иначе индекс компаний принял бы ее за "компаний нет"
+        """
+        params = {'select': ['ID', 'TITLE', 'DATE_MODIFY']}
+        if since:
+            params['filter'] = {'>=DATE_MODIFY': since}
+        return self.bitrix.get_all('crm.company.list', params)
+
     def get_companies(self):
         """Получить все компании для матчинга по названию"""
         try:
@@ -59,11 +55,28 @@ class BitrixClient:
             logger.error(f"Error creating contacts batch: {e}")
             return None
 
-    def get_contacts(self, filter_params=None):
+    def update_contacts_batch(self, updates):
+        """Обновление контактов пачками: список {'id': ..., 'fields': {...}}"""
+        try:
+            return self.bitrix.call('crm.contact.update', updates)
+        except Exception as e:
+            logger.error(f"Error updating contacts batch: {e}")
+            return None
+
+    def get_contacts_communications(self):
+        """
+        Телефоны, почты и обновляемые поля всех контактов для дедупликации.
+        Ошибка пробрасывается: пустой список означал бы, что в портале нет контактов
+        """
+        return self.bitrix.get_all('crm.contact.list', {
+            'select': ['ID', 'NAME', 'LAST_NAME', 'COMPANY_ID', 'PHONE', 'EMAIL']
+        })
+
+    def get_contacts(self, filter_params=None, select=None):
         """Получить контакты с фильтрацией"""
         params = {
-            'select': [
-                'NAME', 'LAST_NAME', 'PHONE', 'EMAIL', 'COMPANY_ID', 'DATE_CREATE'
+            'select': select or [
+                'ID', 'NAME', 'LAST_NAME', 'PHONE', 'EMAIL', 'COMPANY_ID'
             ]
         }
 
@@ -77,6 +90,48 @@ class BitrixClient:
             logger.error(f"Error fetching contacts: {e}")
             return []
 
+    def iter_by_id(self, method: str, filter_params=None, select=None):
+        """
+        Постраничный обход списка по возрастанию ID через >ID и start=-1:
+        портал не считает total, а каждая страница - индексная выборка по первичному ключу
+        """
+        last_id = 0
+        select = list(select or [])
+        if select and 'ID' not in select:
+            select.append('ID')
+
+        while True:
+            params = {
+                'order': {'ID': 'ASC'},
+                'filter': {**(filter_params or {}), '>ID': last_id},
+                'select': select,
+                'start': -1,
+            }
+            page = self.bitrix.call(method, params)
+            if isinstance(page, dict):
+                page = page.get('order0000000000', [])
+            if not page:
+                return
+            yield from page
+            if len(page) < self.page_size:
+                return
+            last_id = int(page[-1]['ID'])
+
+    def get_data_version(self):
+        """Последние DATE_MODIFY контактов и компаний: меняется при любой правке экспортируемых данных"""
+        params = {'order': {'DATE_MODIFY': 'DESC'}, 'select': ['ID', 'DATE_MODIFY'], 'start': -1}
+        versions = []
+        try:
+            for method in ('crm.contact.list', 'crm.company.list'):
+                result = self.bitrix.call(method, params)
+                if isinstance(result, dict):
+                    result = result.get('order0000000000', [])
+                versions.append(result[0].get('DATE_MODIFY', '') if result else '')
+        except Exception as e:
+            logger.error(f"Error fetching data version: {e}")
+            return None
+        return '|'.join(versions)
+
     def get_company_name(self, company_id):
         """Получить название компании по ID"""
         if not company_id:
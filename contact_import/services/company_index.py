@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import settings
+from common.trigram_index import TrigramNameIndex, normalize_name
+from .bitrix_client import BitrixClient
+
+logger = logging.getLogger(__name__)
+
+
+class CompanyNameIndex(TrigramNameIndex):
+    """Общий индекс названий компаний: автодополнение и сопоставление название -> ID"""
+    title_field = 'TITLE'
+    modified_field = 'DATE_MODIFY'
+    label = 'Company index'
+
+    def __init__(self, path: str = None, refresh_interval: int = None, rebuild_interval: int = None):
+        super().__init__(
+            refresh_interval or getattr(settings, 'COMPANY_INDEX_REFRESH_SECONDS', 300),
+            rebuild_interval or getattr(settings, 'COMPANY_INDEX_REBUILD_SECONDS', 24 * 3600),
+        )
+        self.path = path or settings.COMPANY_INDEX_PATH
+
+    def _reset(self):
+        super()._reset()
+        self._titles: Dict[int, str] = {}
+        self._ids_by_name: Dict[str, int] = {}
+
+    def _state_fields(self) -> List[str]:
+        return super()._state_fields() + ['_titles', '_ids_by_name']
+
+    def fetch(self, since: Optional[str]) -> List[Dict]:
+        return BitrixClient().get_companies_modified_since(since)
+
+    def _store(self, item_id: int, item: Dict, name: str):
+        self._titles[item_id] = item.get('TITLE') or ''
+        # При совпадающих названиях сохраняем первую найденную компанию, как и раньше
+        self._ids_by_name.setdefault(name, item_id)
+
+    def _discard(self, item_id: int, old_name: str):
+        if self._ids_by_name.get(old_name) == item_id:
+            del self._ids_by_name[old_name]
+
+    def _result(self, item_id: int) -> str:
+        return self._titles[item_id]
+
+    def get_id(self, title: str) -> Optional[int]:
+        """ID компании по названию без учета регистра и лишних пробелов"""
+        if not title:
+            return None
+        self._ensure_fresh()
+        return self._ids_by_name.get(normalize_name(title))
+
+    def get_title(self, company_id) -> Optional[str]:
+        """Название компании по ID"""
+        if not str(company_id).isdigit():
+            return None
+        self._ensure_fresh()
+        return self._titles.get(int(company_id))
+
+    def _after_refresh(self, full: bool):
+        # На диск попадает только успешно обновленный индекс
+        with self._lock:
+            snapshot = {'last_modified': self._last_modified, 'companies': self._titles.copy()}
+        self._save(snapshot)
+
+    def _bootstrap(self):
+        """Индекс с диска (от этого или другого воркера) и догрузка изменений; без файла - полная выгрузка"""
+        if self._load():
+            self._rebuilt_at = time.monotonic()
+            # Устаревший индекс с диска лучше пустого: ошибку догрузки повторит фоновое обновление
+            self._refresh_safely(full=False)
+        else:
+            self.refresh(full=True)
+
+    def _load(self) -> bool:
+        """Поднять индекс из файла, сохраненного этим или другим воркером"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        with self._lock:
+            for company_id, title in snapshot.get('companies', {}).items():
+                self._upsert(int(company_id), {'TITLE': title})
+            self._last_modified = snapshot.get('last_modified')
+        return True
+
+    def _save(self, snapshot: Dict):
+        """Атомарно записать индекс на диск"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(snapshot, file, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Error saving company index: {e}")
+
+
+company_index = CompanyNameIndex()
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+import pandas as pd
+
+import settings
+from .normalization import STRING, normalize_phones
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые импорт может обновить у существующего контакта
+TRACKED_FIELDS = ('NAME', 'LAST_NAME', 'COMPANY_ID')
+
+
+def add_key_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Колонки ключей дедупликации phone_key/email_key по уже нормализованным телефонам
+    (E.164, normalize_phones) и почтам (нижний регистр); пустое значение - пустой ключ
+    """
+    frame['phone_key'] = ('p:' + frame['phone']).where(frame['phone'] != '', '')
+    frame['email_key'] = ('e:' + frame['email']).where(frame['email'] != '', '')
+    return frame
+
+
+def _field_values(fields: Dict) -> Tuple[str, ...]:
+    return tuple(str(fields.get(name) or '') for name in TRACKED_FIELDS)
+
+
+class ContactDedupIndex:
+    """Компактный индекс телефон/почта -> ID контакта с отпечатком обновляемых полей"""
+
+    def __init__(self):
+        self.ids_by_key: Dict[str, int] = {}
+        self.values: Dict[int, Tuple[str, ...]] = {}
+
+    @classmethod
+    def build(cls, client) -> 'ContactDedupIndex':
+        """
+        Выгрузить телефоны и почты контактов портала одним постраничным проходом.
+        Ошибка выгрузки пробрасывается: пустой индекс превратил бы весь импорт в дубли
+        """
+        contacts = client.get_contacts_communications()
+        communications = pd.DataFrame(
+            [
+                (int(contact['ID']), kind, item.get('VALUE'))
+                for contact in contacts
+                for kind, field in (('p', 'PHONE'), ('e', 'EMAIL'))
+                for item in contact.get(field) or []
+            ],
+            columns=['contact_id', 'kind', 'value'],
+        )
+        values = communications['value'].astype(STRING).fillna('').str.strip()
+        is_phone = communications['kind'] == 'p'
+        # Телефоны нормализуются тем же кодом, что и строки импортируемого файла
+        normalized = values.str.lower().mask(is_phone, normalize_phones(values))
+        communications['key'] = communications['kind'] + ':' + normalized
+        communications = communications[normalized != '']
+
+        keys_by_contact: Dict[int, Set[str]] = {}
+        for contact_id, key in zip(communications['contact_id'].tolist(), communications['key'].tolist()):
+            keys_by_contact.setdefault(contact_id, set()).add(key)
+        index = cls()
+        for contact in contacts:
+            contact_id = int(contact['ID'])
+            index.add(contact_id, keys_by_contact.get(contact_id, set()), contact)
+        logger.info(f"Contact dedup index built: {len(index.values)} contacts, {len(index.ids_by_key)} keys")
+        return index
+
+    def match(self, phone_keys: pd.Series, email_keys: pd.Series) -> pd.Series:
+        """ID существующих контактов для колонок ключей; совпадение по почте приоритетнее телефона"""
+        by_email = email_keys.map(self.ids_by_key.get).astype('Int64')
+        return by_email.fillna(phone_keys.map(self.ids_by_key.get).astype('Int64'))
+
+    def add(self, contact_id: int, keys: Set[str], fields: Dict):
+        for key in keys:
+            self.ids_by_key.setdefault(key, contact_id)
+        self.values[contact_id] = _field_values(fields)
+
+    def apply_changes(self, contact_id: int, changes: Dict):
+        """Запомнить отправленные изменения, чтобы повторный импорт их не дублировал"""
+        current = dict(zip(TRACKED_FIELDS, self.values.get(contact_id, ('',) * len(TRACKED_FIELDS))))
+        current.update(changes)
+        self.values[contact_id] = _field_values(current)
+
+    def changed_fields(self, contact_ids: pd.Series, incoming: pd.DataFrame) -> pd.Series:
+        """
+        Изменения для найденных контактов: непустые поля incoming (колонки TRACKED_FIELDS),
+        отличающиеся от текущих значений. Сравнение идет колонками, словари собираются
+        только для строк с изменениями; строки без изменений в результат не попадают
+        """
+        blank = ('',) * len(TRACKED_FIELDS)
+        current = pd.DataFrame(
+            [self.values.get(contact_id, blank) for contact_id in contact_ids.tolist()],
+            columns=list(TRACKED_FIELDS), index=incoming.index,
+        )
+        changed = (incoming != '') & (incoming != current)
+        rows = changed.any(axis=1)
+        return pd.Series(
+            [
+                {name: value for name, value, flag in zip(TRACKED_FIELDS, values, flags) if flag}
+                for values, flags in zip(incoming[rows].to_numpy().tolist(), changed[rows].to_numpy(dtype=bool).tolist())
+            ],
+            index=incoming.index[rows], dtype=object,
+        )
+
+
+_index: Optional[ContactDedupIndex] = None
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def get_contact_index(client, force: bool = False) -> ContactDedupIndex:
+    """
+    Индекс дедупликации, переиспользуемый между импортами в пределах CONTACT_DEDUP_INDEX_TTL.
+    Если выгрузка не удалась, исключение уходит в импорт, а в кэш ничего не попадает
+    """
+    global _index, _built_at
+    ttl = getattr(settings, 'CONTACT_DEDUP_INDEX_TTL', 600)
+    with _lock:
+        if force or _index is None or time.monotonic() - _built_at > ttl:
+            index = ContactDedupIndex.build(client)
+            _index, _built_at = index, time.monotonic()
+        return _index
+
+
+def invalidate_contact_index():
+    """Сбросить индекс: следующий импорт выгрузит контакты портала заново"""
+    global _index
+    with _lock:
+        _index = None
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+
+def export_fingerprint(file_type: str, filters: Optional[Dict], data_version: str) -> str:
+    """Ключ кеша: тип файла, фильтры экспорта и версия данных портала"""
+    payload = json.dumps(
+        {'file_type': file_type, 'filters': filters or {}, 'version': data_version},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ExportCache:
+    """Готовые файлы экспорта на диске с вытеснением по возрасту и суммарному размеру"""
+
+    def __init__(self, directory: str = None, max_bytes: int = None, max_age: int = None):
+        self.directory = directory or settings.EXPORT_CACHE_DIR
+        self.max_bytes = max_bytes or getattr(settings, 'EXPORT_CACHE_MAX_BYTES', 500 * 2 ** 20)
+        self.max_age = max_age or getattr(settings, 'EXPORT_CACHE_MAX_AGE', 24 * 3600)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, file_type: str) -> str:
+        return os.path.join(self.directory, f"{key}.{file_type}")
+
+    def get(self, key: str, file_type: str) -> Optional[Dict]:
+        """Метаданные закешированного файла (с путем в 'path') или None, если его нет или он устарел"""
+        path = self._path(key, file_type)
+        try:
+            modified = os.path.getmtime(path)
+            with open(f"{path}.json", 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if time.time() - modified > self.max_age:
+            return None
+        # Отметка последнего использования для вытеснения давно не запрашиваемых файлов
+        os.utime(path, (time.time(), modified))
+        meta['path'] = path
+        return meta
+
+    def put(self, key: str, file_type: str, source_path: str, meta: Dict = None) -> Optional[str]:
+        """Атомарно положить копию готового файла в кеш"""
+        path = self._path(key, file_type)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(fd)
+            shutil.copyfile(source_path, tmp_path)
+            with open(f"{path}.json", 'w', encoding='utf-8') as file:
+                json.dump(meta or {}, file, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error caching export file: {e}")
+            return None
+        self.evict()
+        return path
+
+    def evict(self):
+        """Удалить просроченные файлы и самые давно использованные сверх лимита размера"""
+        with self._lock:
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+
+            now = time.time()
+            entries = []
+            for name in names:
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith('.json'):
+                    # Метаданные удаляются вместе со своим файлом
+                    if not os.path.exists(path[:-len('.json')]):
+                        self._remove(path)
+                    continue
+                if name.endswith('.tmp') or now - stat.st_mtime > self.max_age:
+                    # Недописанные временные файлы старше часа тоже считаем мусором
+                    if not name.endswith('.tmp') or now - stat.st_mtime > 3600:
+                        self._remove(path)
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        for file_path in (path, f"{path}.json"):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+
+export_cache = ExportCache()
@@ -0,0 +1,71 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from .company_index import company_index
+
+# Только поля, которые попадают в файл экспорта, и ID для постраничного обхода по >ID
+EXPORT_SELECT = ['ID', 'NAME', 'LAST_NAME', 'PHONE', 'EMAIL', 'COMPANY_ID']
+
+
+def _as_datetime(value, end_of_day: bool = False) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return datetime.combine(value, time.max if end_of_day else time.min)
+
+
+def build_contact_filter(filters: Dict = None) -> Optional[Dict]:
+    """
+    Перевести фильтры экспорта в серверный filter crm.contact.list.
+    None означает, что выборка заведомо пуста (например, компания не найдена),
+    и запрашивать портал не нужно.
+    """
+    filters = filters or {}
+    filter_params = {}
+
+    date_from = _as_datetime(filters.get('date_from'))
+    if filters.get('last_days'):
+        last_days_from = datetime.now() - timedelta(days=filters['last_days'])
+        date_from = max(date_from, last_days_from) if date_from else last_days_from
+    if date_from:
+        filter_params['>=DATE_CREATE'] = date_from.isoformat()
+
+    date_to = _as_datetime(filters.get('date_to'), end_of_day=True)
+    if date_to:
+        filter_params['<=DATE_CREATE'] = date_to.isoformat()
+
+    if filters.get('company'):
+        # Одно обращение к индексу названий вместо выгрузки всех компаний
+        company_id = company_index.get_id(filters['company'])
+        if not company_id:
+            return None
+        filter_params['COMPANY_ID'] = company_id
+
+    if filters.get('assigned_by_id'):
+        filter_params['ASSIGNED_BY_ID'] = filters['assigned_by_id']
+
+    if filters.get('source_id'):
+        filter_params['SOURCE_ID'] = filters['source_id']
+
+    return filter_params
+
+
+def plan_contact_query(filters: Dict = None) -> Optional[Dict]:
+    """Параметры выборки контактов для экспорта: filter и минимальный select"""
+    filter_params = build_contact_filter(filters)
+    if filter_params is None:
+        return None
+    return {'filter': filter_params, 'select': list(EXPORT_SELECT)}
+
+
+def company_names(company_ids: List) -> Dict[str, str]:
+    """Названия компаний из индекса; отсутствующие в нем ID в результат не попадают"""
+    names = {}
+    for company_id in {str(company_id) for company_id in company_ids if company_id}:
+        title = company_index.get_title(company_id)
+        if title is not None:
+            names[company_id] = title
+    return names
@@ -1,26 +1,33 @@
 import csv
+import shutil
 import pandas as pd
 from abc import ABC, abstractmethod
 from typing import List, Dict
-from datetime import datetime, timedelta
+from datetime import date
 from .bitrix_client import BitrixClient
+from .export_cache import export_cache, export_fingerprint
+from .export_query import company_names, plan_contact_query
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class BaseExporter(ABC):
+    file_type = None
+
     def __init__(self):
         self.bitrix = BitrixClient()
 
-    def _prepare_contact_row(self, contact: Dict) -> Dict:
+    def _prepare_contact_row(self, contact: Dict, company_names: Dict[str, str] = None) -> Dict:
         """Подготовить строку контакта для экспорта"""
         phone = contact.get('PHONE', [{}])[0].get('VALUE', '') if contact.get('PHONE') else ''
         email = contact.get('EMAIL', [{}])[0].get('VALUE', '') if contact.get('EMAIL') else ''
 
         company_name = ''
         if contact.get('COMPANY_ID'):
-            company_name = self.bitrix.get_company_name(contact['COMPANY_ID'])
+            company_name = (company_names or {}).get(str(contact['COMPANY_ID']))
+            if company_name is None:
+                company_name = self.bitrix.get_company_name(contact['COMPANY_ID'])
 
         return {
             'имя': contact.get('NAME', ''),
@@ -31,42 +38,46 @@ class BaseExporter(ABC):
         }
 
     def get_contacts_with_filters(self, filters: Dict = None) -> List[Dict]:
-        """Получить контакты с применением фильтров"""
-        filter_params = {}
-
-        if filters:
-            if filters.get('last_days'):
-                date_from = datetime.now() - timedelta(days=filters['last_days'])
-                filter_params['>DATE_CREATE'] = date_from.isoformat()
+        """Получить контакты с применением фильтров на стороне портала"""
+        query = plan_contact_query(filters)
+        if query is None:
+            return []
 
-            if filters.get('company'):
-                # Здесь нужно сначала найти ID компании по названию
-                companies = self.bitrix.get_companies()
-                company_id = companies.get(filters['company'])
-                if company_id:
-                    filter_params['COMPANY_ID'] = company_id
-
-        return self.bitrix.get_contacts(filter_params)
+        return list(self.bitrix.iter_by_id('crm.contact.list', query['filter'], query['select']))
 
     @abstractmethod
     def export_to_file(self, contacts: List[Dict], file_path: str):
         pass
 
-    def export_contacts(self, file_path: str, filters: Dict = None) -> Dict:
-        """Основной метод экспорта"""
+    def export_contacts(self, file_path: str, filters: Dict = None, use_cache: bool = True) -> Dict:
+        """Основной метод экспорта; одинаковые выгрузки по неизмененным данным берутся из кеша"""
         try:
-            contacts = self.get_contacts_with_filters(filters)
-            processed_contacts = []
+            cache_key = self._cache_key(filters) if use_cache else None
+            if cache_key:
+                cached = export_cache.get(cache_key, self.file_type)
+                if cached:
+                    shutil.copyfile(cached['path'], file_path)
+                    return {
+                        'success': True,
+                        'exported_count': cached.get('exported_count', 0),
+                        'file_path': file_path,
+                        'cached': True,
+                    }
 
-            for contact in contacts:
-                processed_contacts.append(self._prepare_contact_row(contact))
+            contacts = self.get_contacts_with_filters(filters)
+            names = company_names([contact.get('COMPANY_ID') for contact in contacts])
+            processed_contacts = [self._prepare_contact_row(contact, names) for contact in contacts]
 
             self.export_to_file(processed_contacts, file_path)
+            if cache_key and processed_contacts:
+                export_cache.put(cache_key, self.file_type, file_path,
+                                 {'exported_count': len(processed_contacts)})
 
             return {
                 'success': True,
                 'exported_count': len(processed_contacts),
-                'file_path': file_path
+                'file_path': file_path,
+                'cached': False,
             }
 
         except Exception as e:
@@ -76,8 +87,21 @@ class BaseExporter(ABC):
                 'error': str(e)
             }
 
+    def _cache_key(self, filters: Dict = None):
+        """Отпечаток фильтров и версии данных; None - кеш не используется"""
+        data_version = self.bitrix.get_data_version()
+        if data_version is None:
+            return None
+        filters = dict(filters or {})
+        if filters.get('last_days'):
+            # Окно "за последние N дней" сдвигается каждый день, даже если данные не менялись
+            filters['today'] = date.today().isoformat()
+        return export_fingerprint(self.file_type, filters, data_version)
+
 
 class CSVExporter(BaseExporter):
+    file_type = 'csv'
+
     def export_to_file(self, contacts: List[Dict], file_path: str):
         if not contacts:
             return
@@ -90,6 +114,8 @@ class CSVExporter(BaseExporter):
 
 
 class XLSXExporter(BaseExporter):
+    file_type = 'xlsx'
+
     def export_to_file(self, contacts: List[Dict], file_path: str):
         if not contacts:
             return
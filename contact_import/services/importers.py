@@ -1,114 +1,302 @@
-import csv
+import hashlib
+import os
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import List, Dict, Optional
+from django.db import transaction
+from django.db.models import Sum
+from contact_import.models import ImportBatchResult, ImportCheckpoint
 from .bitrix_client import BitrixClient
+from .company_index import company_index
+from .dedup import add_key_columns, get_contact_index, invalidate_contact_index
+from .normalization import STRING, normalize_contacts_frame
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Действие плана импорта для строки файла
+PLAN_SKIP, PLAN_CREATE, PLAN_UPDATE = 0, 1, 2
+
+
+@dataclass
+class ImportPlan:
+    """Решения по строкам файла и колонки, из которых по пачкам собираются данные для Bitrix24"""
+    actions: np.ndarray
+    columns: Dict[str, list]
+    # Позиция строки -> {'id': ID контакта, 'fields': изменившиеся поля}
+    updates: Dict[int, Dict]
+
+
+def file_fingerprint(file_path: str) -> str:
+    """sha256 содержимого файла: один и тот же файл узнается независимо от имени"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def batch_results(results) -> Optional[List]:
+    """
+    Ответ fast_bitrix24 на call() со списком в виде списка по одному элементу на команду:
+    для пачки из одной команды приходит сам результат или {'order0000000000': ...}.
+    None (ошибка запроса) остается None
+    """
+    if results is None:
+        return None
+    if isinstance(results, dict):
+        return [results[key] for key in sorted(results)]
+    if isinstance(results, (list, tuple)):
+        return list(results)
+    return [results]
+
+
 class BaseImporter(ABC):
     def __init__(self):
         self.bitrix = BitrixClient()
-        self.companies_cache = {}
+        self.rejected_count = 0
+        self.rejected_report = None
 
     def _get_company_id(self, company_name: str) -> int:
-        """Получить ID компании по названию (с кэшированием)"""
+        """Получить ID компании по названию из общего индекса компаний"""
         if not company_name:
             return None
 
-        if not self.companies_cache:
-            self.companies_cache = self.bitrix.get_companies()
+        return company_index.get_id(company_name)
 
-        return self.companies_cache.get(company_name.strip())
-
-    def _prepare_contact_data(self, row: Dict) -> Dict:
-        """Подготовить данные контакта для Bitrix24"""
-        phones = [{"VALUE": row['phone'], "VALUE_TYPE": "WORK"}] if row.get('phone') else []
-        emails = [{"VALUE": row['email'], "VALUE_TYPE": "WORK"}] if row.get('email') else []
-
-        company_id = self._get_company_id(row.get('company', '').lower())
-
-        return {
-            'fields': {
-                'NAME': row.get('first_name', ''),
-                'LAST_NAME': row.get('last_name', ''),
-                'PHONE': phones,
-                'EMAIL': emails,
-                'COMPANY_ID': company_id,
+    @staticmethod
+    def _prepare_contacts(plan: 'ImportPlan', positions: List[int]) -> List[Dict]:
+        """Подготовить данные контактов для Bitrix24 из колонок плана по позициям строк"""
+        columns = plan.columns
+        return [
+            {
+                'fields': {
+                    'NAME': columns['first_name'][position],
+                    'LAST_NAME': columns['last_name'][position],
+                    'PHONE': [{"VALUE": columns['phone'][position], "VALUE_TYPE": "WORK"}]
+                    if columns['phone'][position] else [],
+                    'EMAIL': [{"VALUE": columns['email'][position], "VALUE_TYPE": "WORK"}]
+                    if columns['email'][position] else [],
+                    'COMPANY_ID': columns['company_id'][position],
+                }
             }
-        }
+            for position in positions
+        ]
 
     @abstractmethod
-    def read_file(self, file_path: str) -> List[Dict]:
+    def read_frame(self, file_path: str) -> pd.DataFrame:
         pass
 
+    def read_file(self, file_path: str) -> pd.DataFrame:
+        """
+        Прочитать и нормализовать файл; отклоненные строки сохраняются отчетом рядом с файлом.
+        Ключи дедупликации и повторы внутри файла считаются колонками целиком
+        """
+        clean, rejected = normalize_contacts_frame(self.read_frame(file_path))
+
+        # ID компании ищем один раз на уникальное название, а не на каждую строку
+        company_ids = {key: self._get_company_id(key) for key in clean['company_key'].unique() if key}
+        # Раскладываем по кодам уникальных названий; dtype=object, иначе pandas превратит ID с пропусками во float
+        codes, keys = pd.factorize(clean['company_key'])
+        clean['company_id'] = np.array([company_ids.get(key) for key in keys], dtype=object)[codes]
+
+        self.rejected_count = len(rejected)
+        self.rejected_report = None
+        if len(rejected):
+            self.rejected_report = f"{file_path}.rejected.csv"
+            rejected.to_csv(self.rejected_report, index=False, encoding='utf-8')
+            logger.warning(f"Rejected {len(rejected)} rows, report: {self.rejected_report}")
+
+        add_key_columns(clean)
+        # Повтор - строка, чей телефон или почта уже встречались выше по файлу
+        clean['duplicate'] = (
+            ((clean['phone'] != '') & clean['phone'].duplicated())
+            | ((clean['email'] != '') & clean['email'].duplicated())
+        )
+        return clean
+
     def import_contacts(self, file_path: str) -> Dict:
-        """Основной метод импорта"""
+        """
+        Основной метод импорта: новые контакты создаются, найденные по телефону/почте обновляются.
+        Строки отправляются пачками, после каждой пачки сохраняется контрольная точка,
+        поэтому повторный запуск того же файла продолжает работу с места сбоя.
+        """
+        checkpoint = None
         try:
             contacts_data = self.read_file(file_path)
-            batch_data = []
+            checkpoint = self._get_checkpoint(file_path, len(contacts_data))
+            dedup_index = get_contact_index(self.bitrix)
+            batch_size = self.bitrix.batch_size
+            resumed_from = checkpoint.committed_rows
+            plan = self._plan_rows(contacts_data, resumed_from, dedup_index)
 
-            for row in contacts_data:
-                contact_data = self._prepare_contact_data(row)
-                batch_data.append(contact_data)
+            for first_row in range(resumed_from, len(contacts_data), batch_size):
+                last_row = min(first_row + batch_size, len(contacts_data))
+                stats = self._import_batch(plan, first_row, last_row, dedup_index)
+                self._commit_batch(checkpoint, first_row // batch_size, first_row, last_row - first_row, stats)
 
-                # Отправляем пачками
-                if len(batch_data) >= self.bitrix.batch_size:
-                    results = self.bitrix.create_contacts_batch(batch_data)
-                    batch_data = []
-                    logger.info(f"Imported batch: {results}")
-
-            # Отправляем оставшиеся
-            if batch_data:
-                results = self.bitrix.create_contacts_batch(batch_data)
-                logger.info(f"Imported final batch: {results}")
+            checkpoint.status = ImportCheckpoint.STATUS_COMPLETED
+            checkpoint.save(update_fields=['status', 'updated_at'])
 
+            totals = checkpoint.batches.aggregate(created=Sum('created'), updated=Sum('updated'), skipped=Sum('skipped'))
             return {
                 'success': True,
-                'processed': len(contacts_data)
+                'processed': len(contacts_data),
+                'resumed_from': resumed_from,
+                'rejected': self.rejected_count,
+                'rejected_report': self.rejected_report,
+                **{key: value or 0 for key, value in totals.items()},
             }
 
         except Exception as e:
             logger.error(f"Import error: {e}")
+            # Упавшая пачка могла частично выполниться: возобновление сверится с порталом заново
+            invalidate_contact_index()
+            if checkpoint is not None:
+                checkpoint.status = ImportCheckpoint.STATUS_FAILED
+                checkpoint.error = str(e)
+                checkpoint.save(update_fields=['status', 'error', 'updated_at'])
             return {
                 'success': False,
                 'error': str(e)
             }
 
+    def _get_checkpoint(self, file_path: str, total_rows: int) -> ImportCheckpoint:
+        """Контрольная точка файла; завершенный ранее импорт того же файла начинается заново"""
+        checkpoint, created = ImportCheckpoint.objects.get_or_create(
+            fingerprint=file_fingerprint(file_path),
+            defaults={'file_name': os.path.basename(file_path), 'total_rows': total_rows},
+        )
+        if created:
+            return checkpoint
+
+        if checkpoint.status == ImportCheckpoint.STATUS_COMPLETED or checkpoint.total_rows != total_rows:
+            # Повторный импорт после успешного завершения или с другими правилами нормализации
+            checkpoint.batches.all().delete()
+            checkpoint.committed_rows = 0
+            checkpoint.total_rows = total_rows
+        else:
+            logger.info(f"Resuming import of {checkpoint.file_name} from row {checkpoint.committed_rows}")
+        checkpoint.status = ImportCheckpoint.STATUS_RUNNING
+        checkpoint.error = ''
+        checkpoint.save()
+        return checkpoint
+
+    def _plan_rows(self, rows: pd.DataFrame, start: int, dedup_index) -> 'ImportPlan':
+        """
+        Решение по каждой строке начиная со start, принятое колонками по всему файлу сразу:
+        создать, обновить или пропустить. Данные для Bitrix24 собираются уже по пачкам.
+        Повторы внутри файла отмечены в read_file, поэтому возобновление их тоже узнает
+        """
+        pending = rows.iloc[start:]
+        fresh = ~pending['duplicate']
+        contact_ids = dedup_index.match(pending['phone_key'], pending['email_key'])
+        found = fresh & contact_ids.notna()
+
+        actions = np.full(len(rows), PLAN_SKIP, dtype=np.int8)
+        actions[start:][(fresh & contact_ids.isna()).to_numpy()] = PLAN_CREATE
+
+        incoming = pd.DataFrame({
+            'NAME': pending['first_name'],
+            'LAST_NAME': pending['last_name'],
+            'COMPANY_ID': pending['company_id'].map(lambda company_id: str(company_id) if company_id else ''),
+        }).loc[found]
+        changes = dedup_index.changed_fields(contact_ids[found], incoming)
+        updates = {
+            position: {'id': int(contact_id), 'fields': fields}
+            for position, contact_id, fields in zip(
+                changes.index.tolist(), contact_ids[changes.index].tolist(), changes.tolist())
+        }
+        actions[list(updates)] = PLAN_UPDATE
+
+        columns = {
+            column: rows[column].tolist()
+            for column in ('first_name', 'last_name', 'phone', 'email', 'company_id', 'phone_key', 'email_key')
+        }
+        return ImportPlan(actions=actions, columns=columns, updates=updates)
+
+    def _import_batch(self, plan: 'ImportPlan', first_row: int, last_row: int, dedup_index) -> Dict:
+        """Собрать и отправить в Bitrix24 строки пачки по уже принятым решениям плана"""
+        actions = plan.actions[first_row:last_row]
+        creates = (np.flatnonzero(actions == PLAN_CREATE) + first_row).tolist()
+        updates = [plan.updates[position] for position in (np.flatnonzero(actions == PLAN_UPDATE) + first_row).tolist()]
+        stats = {'created': 0, 'updated': 0, 'skipped': len(actions) - len(creates) - len(updates)}
+
+        if creates:
+            stats['created'] += self._send_creates(plan, creates, dedup_index)
+        if updates:
+            stats['updated'] += self._send_updates(updates, dedup_index)
+        return stats
+
+    @staticmethod
+    def _commit_batch(checkpoint: ImportCheckpoint, batch_number: int, first_row: int, row_count: int, stats: Dict):
+        """Сохранить результат пачки и сдвинуть контрольную точку одной транзакцией"""
+        with transaction.atomic():
+            ImportBatchResult.objects.create(
+                checkpoint=checkpoint,
+                batch_number=batch_number,
+                first_row=first_row,
+                row_count=row_count,
+                **stats,
+            )
+            checkpoint.committed_rows = first_row + row_count
+            checkpoint.save(update_fields=['committed_rows', 'updated_at'])
+
+    def _send_creates(self, plan: 'ImportPlan', positions: List[int], dedup_index) -> int:
+        """
+        Создать пачку контактов и занести их ID в индекс дедупликации. Неполный ответ -
+        ошибка: контрольная точка не сдвигается, и возобновление повторит пачку
+        """
+        batch = self._prepare_contacts(plan, positions)
+        results = batch_results(self.bitrix.create_contacts_batch(batch))
+        logger.info(f"Imported batch: {results}")
+        if results is None or len(results) != len(batch):
+            raise RuntimeError(f"Contacts batch was not created: {results}")
+
+        failed = 0
+        phone_keys, email_keys = plan.columns['phone_key'], plan.columns['email_key']
+        for contact_id, contact_data, position in zip(results, batch, positions):
+            if str(contact_id).isdigit():
+                # Созданные контакты попадают в индекс, и повтор пачки их обновит, а не задублирует
+                keys = {key for key in (phone_keys[position], email_keys[position]) if key}
+                dedup_index.add(int(contact_id), keys, contact_data['fields'])
+            else:
+                failed += 1
+        if failed:
+            raise RuntimeError(f"{failed} of {len(batch)} contacts in the batch were not created")
+        return len(batch)
+
+    def _send_updates(self, batch: List[Dict], dedup_index) -> int:
+        """Обновить пачку найденных контактов; неполный ответ - ошибка, как и при создании"""
+        results = batch_results(self.bitrix.update_contacts_batch(batch))
+        logger.info(f"Updated batch: {results}")
+        if results is None or len(results) != len(batch):
+            raise RuntimeError(f"Contacts batch was not updated: {results}")
+
+        failed = 0
+        for update, result in zip(batch, results):
+            if result:
+                dedup_index.apply_changes(update['id'], update['fields'])
+            else:
+                failed += 1
+        if failed:
+            raise RuntimeError(f"{failed} of {len(batch)} contacts in the batch were not updated")
+        return len(batch)
+
 
 class CSVImporter(BaseImporter):
-    def read_file(self, file_path: str) -> List[Dict]:
-        contacts = []
-        with open(file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                contacts.append({
-                    'first_name': row.get('имя', ''),
-                    'last_name': row.get('фамилия', ''),
-                    'phone': row.get('номер телефона', ''),
-                    'email': row.get('почта', ''),
-                    'company': row.get('компания', '')
-                })
-        return contacts
+    def read_frame(self, file_path: str) -> pd.DataFrame:
+        # Все колонки как текст, чтобы телефоны не превращались в числа
+        return pd.read_csv(file_path, dtype=STRING, keep_default_na=False, encoding='utf-8', engine='pyarrow')
 
 
 class XLSXImporter(BaseImporter):
-    def read_file(self, file_path: str) -> List[Dict]:
-        df = pd.read_excel(file_path)
-        contacts = []
-
-        for _, row in df.iterrows():
-            contacts.append({
-                'first_name': row.get('имя', ''),
-                'last_name': row.get('фамилия', ''),
-                'phone': str(row.get('номер телефона', '')),
-                'email': row.get('почта', ''),
-                'company': row.get('компания', '')
-            })
-
-        return contacts
+    def read_frame(self, file_path: str) -> pd.DataFrame:
+        return pd.read_excel(file_path)
 
 
 class ImporterFactory:
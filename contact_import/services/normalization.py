@@ -0,0 +1,73 @@
+from typing import Tuple
+
+import pandas as pd
+
+# Соответствие колонок файла внутренним именам полей
+COLUMN_MAP = {
+    'имя': 'first_name',
+    'фамилия': 'last_name',
+    'номер телефона': 'phone',
+    'почта': 'email',
+    'компания': 'company',
+}
+FIELDS = list(COLUMN_MAP.values())
+
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+# Строки в Arrow: методы .str выполняются в C++ над всей колонкой, а не вызовом Python на каждое значение
+STRING = pd.StringDtype('pyarrow')
+
+
+def _text_column(series: pd.Series, collapse: bool = True) -> pd.Series:
+    """Привести колонку к строкам: NaN -> '', числа без хвоста '.0', пробелы схлопнуты (collapse)"""
+    if pd.api.types.is_float_dtype(series) or pd.api.types.is_integer_dtype(series):
+        # Excel отдает телефоны числами: 79001234567.0 -> '79001234567'
+        series = series.round().astype('Int64')
+    text = series.astype(STRING).fillna('')
+    if collapse:
+        text = text.str.replace(r'\s+', ' ', regex=True)
+    return text.str.strip()
+
+
+def normalize_phones(phones: pd.Series) -> pd.Series:
+    """Телефоны в E.164: только цифры, 8XXXXXXXXXX и 10-значные номера приводятся к +7"""
+    # Одним проходом: хвост '.0' от чисел Excel и все нецифровые символы
+    digits = phones.str.replace(r'\.0$|\D', '', regex=True)
+    digits = digits.mask((digits.str.len() == 11) & digits.str.startswith('8'), '7' + digits.str[1:])
+    digits = digits.mask(digits.str.len() == 10, '7' + digits)
+    valid = digits.str.len().between(11, 15)
+    return ('+' + digits).where(valid, '')
+
+
+def normalize_contacts_frame(frame: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Нормализовать строки импорта колонками целиком. Возвращает чистые строки и
+    отклоненные строки с причиной и номером строки исходного файла.
+    """
+    frame = frame.rename(columns=COLUMN_MAP)
+    result = pd.DataFrame(index=frame.index)
+    for field in FIELDS:
+        # Внутренние пробелы телефона уберет normalize_phones, а почту с пробелами отклонит проверка
+        result[field] = _text_column(frame[field], collapse=field not in ('phone', 'email')) if field in frame else ''
+
+    raw_phone = result['phone']
+    raw_email = result['email'].str.lower()
+    result['phone'] = normalize_phones(raw_phone)
+    result['email'] = raw_email.where(raw_email.str.match(EMAIL_PATTERN), '')
+    # Ключ только группирует одинаковые названия: сопоставление с компанией нормализует его само
+    result['company_key'] = result['company'].str.lower()
+
+    reason = pd.Series('', index=result.index, dtype=STRING)
+    reason = reason.mask((raw_email != '') & (result['email'] == ''), 'invalid_email')
+    reason = reason.mask((raw_phone != '') & (result['phone'] == ''), 'invalid_phone')
+    empty = (result[['first_name', 'last_name', 'phone', 'email']] == '').all(axis=1)
+    reason = reason.mask(empty, 'empty_row')
+
+    rejected_mask = reason != ''
+    rejected = frame.loc[rejected_mask].copy()
+    # allow_duplicates: в самом файле тоже могут быть колонки row/reason
+    rejected.insert(0, 'reason', reason[rejected_mask], allow_duplicates=True)
+    # +2: заголовок и нумерация строк с единицы, как в табличном редакторе
+    rejected.insert(0, 'row', rejected.index + 2, allow_duplicates=True)
+
+    return result.loc[~rejected_mask].reset_index(drop=True), rejected
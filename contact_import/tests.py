@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+from datetime import date
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from contact_import.services.dedup import ContactDedupIndex, add_key_columns
+from contact_import.services.export_cache import ExportCache, export_fingerprint
+from contact_import.services.exporters import CSVExporter
+from contact_import.services.importers import batch_results
+from contact_import.services.normalization import normalize_contacts_frame
+
+
+def import_frame(*rows):
+    return pd.DataFrame(list(rows), columns=['имя', 'фамилия', 'номер телефона', 'почта', 'компания'])
+
+
+class NormalizeContactsFrameTests(SimpleTestCase):
+    def test_phone_formats(self):
+        clean, rejected = normalize_contacts_frame(import_frame(
+            ['Иван', 'Петров', '8 (900) 123-45-67', '', ''],
+            ['Анна', 'Смирнова', '9001234568', '', ''],
+            ['Олег', 'Иванов', '+7 900 123 45 69', '', ''],
+        ))
+        self.assertEqual(clean['phone'].tolist(), ['+79001234567', '+79001234568', '+79001234569'])
+        self.assertTrue(rejected.empty)
+
+    def test_excel_numbers(self):
+        frame = import_frame(['Иван', 'Петров', None, '', ''])
+        frame['номер телефона'] = [79001234567.0]
+        clean, _ = normalize_contacts_frame(frame)
+        self.assertEqual(clean.loc[0, 'phone'], '+79001234567')
+
+    def test_text_and_email(self):
+        clean, _ = normalize_contacts_frame(import_frame(
+            ['  Иван  Иванович ', 'Петров', '', ' Ivan@Mail.Example ', ' ООО  Ромашка '],
+        ))
+        row = clean.iloc[0]
+        self.assertEqual(row['first_name'], 'Иван Иванович')
+        self.assertEqual(row['email'], 'ivan@mail.example')
+        self.assertEqual(row['company'], 'ООО Ромашка')
+        self.assertEqual(row['company_key'], 'ооо ромашка')
+
+    def test_rejected_rows_keep_file_row_numbers(self):
+        clean, rejected = normalize_contacts_frame(import_frame(
+            ['Иван', 'Петров', '+79001234567', '', ''],
+            ['Анна', '', '123', '', ''],
+            ['Олег', '', '', 'not-an-email', ''],
+            ['', '', '', '', 'Ромашка'],
+        ))
+        self.assertEqual(len(clean), 1)
+        self.assertEqual(rejected['row'].tolist(), [3, 4, 5])
+        self.assertEqual(rejected['reason'].tolist(), ['invalid_phone', 'invalid_email', 'empty_row'])
+
+
+class FakeExportBitrix:
+    def __init__(self, version):
+        self.version = version
+
+    def get_data_version(self):
+        return self.version
+
+
+class ExportCacheKeyTests(SimpleTestCase):
+    def exporter(self, version='v1'):
+        exporter = CSVExporter.__new__(CSVExporter)
+        exporter.bitrix = FakeExportBitrix(version)
+        return exporter
+
+    def test_same_filters_same_key(self):
+        first = self.exporter()._cache_key({'company': 'Ромашка', 'source_id': 'WEB'})
+        second = self.exporter()._cache_key({'source_id': 'WEB', 'company': 'Ромашка'})
+        self.assertEqual(first, second)
+
+    def test_key_depends_on_data_version_and_filters(self):
+        key = self.exporter('v1')._cache_key({'company': 'Ромашка'})
+        self.assertNotEqual(key, self.exporter('v2')._cache_key({'company': 'Ромашка'}))
+        self.assertNotEqual(key, self.exporter('v1')._cache_key({'company': 'Лютик'}))
+        self.assertNotEqual(key, export_fingerprint('xlsx', {'company': 'Ромашка'}, 'v1'))
+
+    def test_no_version_no_cache(self):
+        self.assertIsNone(self.exporter(None)._cache_key({}))
+
+    def test_last_days_key_changes_daily(self):
+        filters = {'last_days': 7}
+        key = self.exporter()._cache_key(filters)
+        expected = export_fingerprint('csv', {**filters, 'today': date.today().isoformat()}, 'v1')
+        self.assertEqual(key, expected)
+        self.assertEqual(filters, {'last_days': 7})
+
+    def test_cache_round_trip(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        source = os.path.join(directory, 'source.csv')
+        with open(source, 'w', encoding='utf-8') as file:
+            file.write('имя\nИван\n')
+        cache = ExportCache(directory=os.path.join(directory, 'cache'))
+
+        self.assertIsNone(cache.get('key', 'csv'))
+        cache.put('key', 'csv', source, {'exported_count': 1})
+        cached = cache.get('key', 'csv')
+        self.assertEqual(cached['exported_count'], 1)
+        with open(cached['path'], encoding='utf-8') as file:
+            self.assertEqual(file.read(), 'имя\nИван\n')
+
+
+class ContactDedupTests(SimpleTestCase):
+    def test_batch_results_shapes(self):
+        self.assertEqual(batch_results([1, 2]), [1, 2])
+        # fast_bitrix24 разворачивает ответ пачки из одной команды
+        self.assertEqual(batch_results(5), [5])
+        self.assertEqual(batch_results({'order0000000001': 2, 'order0000000000': 1}), [1, 2])
+        self.assertIsNone(batch_results(None))
+
+    def test_match_prefers_email(self):
+        index = ContactDedupIndex()
+        index.add(1, {'p:+79001234567'}, {'NAME': 'Иван'})
+        index.add(2, {'e:anna@mail.example'}, {'NAME': 'Анна'})
+        frame = add_key_columns(pd.DataFrame({
+            'phone': ['+79001234567', '+79001234567', ''],
+            'email': ['', 'anna@mail.example', 'new@mail.example'],
+        }))
+        matched = index.match(frame['phone_key'], frame['email_key'])
+        self.assertEqual(matched.tolist(), [1, 2, pd.NA])
+
+    def test_changed_fields_skip_blank_and_equal(self):
+        index = ContactDedupIndex()
+        index.add(1, set(), {'NAME': 'Иван', 'LAST_NAME': 'Петров', 'COMPANY_ID': 3})
+        index.add(2, set(), {'NAME': 'Анна', 'LAST_NAME': '', 'COMPANY_ID': ''})
+        incoming = pd.DataFrame({
+            'NAME': ['Иван', 'Анна'],
+            'LAST_NAME': ['', 'Смирнова'],
+            'COMPANY_ID': ['3', ''],
+        })
+        changes = index.changed_fields(pd.Series([1, 2]), incoming)
+        # Первая строка ничего не меняет и в результат не попадает; индекс - номер строки incoming
+        self.assertEqual(changes.to_dict(), {1: {'LAST_NAME': 'Смирнова'}})
@@ -0,0 +1,129 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from deals.models import DealRecord, DealRollup
+
+# Стадии провала не входят в воронку (в направлениях они с префиксом, например C1:LOSE)
+FAILURE_STAGES = ('LOSE', 'APOLOGY')
+WEEKS_ON_DASHBOARD = 12
+
+RollupKey = Tuple[str, str, date]
+
+
+def week_start(value) -> date:
+    """Понедельник недели, в которую создана сделка, в часовом поясе проекта"""
+    local_date = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return local_date - timedelta(days=local_date.weekday())
+
+
+def rollup_key(stage_id: str, currency_id: str, date_create) -> RollupKey:
+    return stage_id or '', currency_id or '', week_start(date_create)
+
+
+def contributions(rows: Iterable[Tuple[str, str, object, Decimal]], sign: int = 1) -> Dict[RollupKey, List]:
+    """Вклад сделок (stage, currency, date_create, opportunity) в агрегаты"""
+    delta = defaultdict(lambda: [0, Decimal('0')])
+    for stage_id, currency_id, date_create, opportunity in rows:
+        key = rollup_key(stage_id, currency_id, date_create)
+        delta[key][0] += sign
+        delta[key][1] += sign * Decimal(opportunity or 0)
+    return delta
+
+
+def apply_delta(delta: Dict[RollupKey, List]):
+    """Прибавить изменения к агрегатам; опустевшие строки удаляются"""
+    for (stage_id, currency_id, week), (count, amount) in delta.items():
+        if not count and not amount:
+            continue
+        rollup, created = DealRollup.objects.get_or_create(
+            stage_id=stage_id, currency_id=currency_id, week=week,
+            defaults={'deal_count': count, 'amount': amount},
+        )
+        if not created:
+            DealRollup.objects.filter(pk=rollup.pk).update(
+                deal_count=F('deal_count') + count, amount=F('amount') + amount,
+            )
+    DealRollup.objects.filter(deal_count__lte=0).delete()
+
+
+def merge_deltas(*deltas: Dict[RollupKey, List]) -> Dict[RollupKey, List]:
+    merged = defaultdict(lambda: [0, Decimal('0')])
+    for delta in deltas:
+        for key, (count, amount) in delta.items():
+            merged[key][0] += count
+            merged[key][1] += amount
+    return merged
+
+
+def rebuild_rollups():
+    """Пересчитать агрегаты с нуля по локальной копии сделок"""
+    rows = DealRecord.objects.values_list('stage_id', 'currency_id', 'date_create', 'opportunity').iterator()
+    delta = contributions(rows)
+    with transaction.atomic():
+        DealRollup.objects.all().delete()
+        DealRollup.objects.bulk_create([
+            DealRollup(stage_id=stage_id, currency_id=currency_id, week=week, deal_count=count, amount=amount)
+            for (stage_id, currency_id, week), (count, amount) in delta.items() if count
+        ], batch_size=500)
+
+
+def _is_failure(stage_id: str) -> bool:
+    return stage_id.split(':')[-1] in FAILURE_STAGES
+
+
+def dashboard_widgets(stages: Dict[str, str]) -> Dict:
+    """
+    Данные виджетов дашборда. Читаются только агрегаты, поэтому время не зависит
+    от числа сделок: строк не больше, чем стадий x валют x недель
+    """
+    by_stage = {
+        row['stage_id']: row
+        for row in DealRollup.objects.values('stage_id').annotate(count=Sum('deal_count'), total=Sum('amount'))
+    }
+    by_currency = list(
+        DealRollup.objects.values('currency_id').annotate(count=Sum('deal_count'), total=Sum('amount'))
+        .order_by('currency_id')
+    )
+    since = week_start(timezone.now()) - timedelta(weeks=WEEKS_ON_DASHBOARD - 1)
+    weekly = list(
+        DealRollup.objects.filter(week__gte=since).values('week', 'currency_id')
+        .annotate(count=Sum('deal_count'), total=Sum('amount')).order_by('week', 'currency_id')
+    )
+
+    # Порядок стадий из справочника; стадии, которых нет в справочнике, - в конце
+    stage_ids = list(stages) + sorted(stage_id for stage_id in by_stage if stage_id not in stages)
+    stage_rows = [
+        {
+            'stage_id': stage_id,
+            'name': stages.get(stage_id, stage_id),
+            'count': by_stage.get(stage_id, {}).get('count') or 0,
+            'total': by_stage.get(stage_id, {}).get('total') or Decimal('0'),
+            'failure': _is_failure(stage_id),
+        }
+        for stage_id in stage_ids
+    ]
+
+    # Сделка на стадии N прошла все предыдущие стадии воронки
+    funnel = [row for row in stage_rows if not row['failure']]
+    reached = 0
+    for row in reversed(funnel):
+        reached += row['count']
+        row['reached'] = reached
+    for current, following in zip(funnel, funnel[1:]):
+        current['conversion'] = round(100 * following['reached'] / current['reached'], 1) if current['reached'] else None
+
+    won = sum(row['count'] for row in stage_rows if row['stage_id'].split(':')[-1] == 'WON')
+    lost = sum(row['count'] for row in stage_rows if row['failure'])
+    return {
+        'stages': stage_rows,
+        'funnel': funnel,
+        'currencies': by_currency,
+        'weekly': weekly,
+        'win_rate': round(100 * won / (won + lost), 1) if won + lost else None,
+    }
@@ -0,0 +1,111 @@
+import csv
+import io
+import logging
+import uuid
+from typing import Dict, Iterable, List, Tuple
+
+from deals.forms.forms import DealCreateForm
+from deals.services import Bitrix24Service
+
+logger = logging.getLogger(__name__)
+
+# Метка источника для сделок из пакетной загрузки (поле ORIGINATOR_ID)
+BULK_ORIGINATOR = 'django_bulk'
+
+# Строк на один вызов crm.deal.add списком: 10 batch-запросов по 50 команд
+BULK_CHUNK_SIZE = 500
+
+# Колонки CSV совпадают с полями формы создания сделки
+BULK_COLUMNS = [field for field in DealCreateForm.base_fields if field != 'idempotency_key']
+
+
+def read_deal_rows(file) -> List[Dict]:
+    """Прочитать строки CSV (файл или байтовый поток) в словари с именами полей формы"""
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    sample = content[:4096]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+
+    rows = []
+    for row in csv.DictReader(io.StringIO(content), dialect=dialect):
+        rows.append({
+            (key or '').strip().lower(): (value or '').strip()
+            for key, value in row.items()
+        })
+    return rows
+
+
+def validate_rows(rows: Iterable[Dict], service: Bitrix24Service) -> Tuple[List[Tuple[int, Dict]], List[Dict]]:
+    """Проверить строки формой создания сделки; вернуть данные для Bitrix24 и ошибки по строкам"""
+    valid, errors = [], []
+    for row_number, row in enumerate(rows, start=1):
+        form = DealCreateForm(data=row)
+        if form.is_valid():
+            valid.append((row_number, service.map_form_to_bitrix_data(form.cleaned_data)))
+        else:
+            message = '; '.join(f"{field}: {' '.join(field_errors)}" for field, field_errors in form.errors.items())
+            errors.append({'row': row_number, 'success': False, 'deal_id': None, 'error': message})
+    return valid, errors
+
+
+def create_deals_bulk(rows: Iterable[Dict], service: Bitrix24Service = None) -> Dict:
+    """
+    Создать сделки по строкам с полями DealCreateForm. Каждая строка получает
+    ORIGIN_ID, поэтому после сбоя пачки уже созданные сделки находятся по нему
+    и не дублируются, а остальные строки отправляются по одной
+    """
+    service = service or Bitrix24Service()
+    import_id = uuid.uuid4().hex[:12]
+    valid, results = validate_rows(rows, service)
+
+    for start in range(0, len(valid), BULK_CHUNK_SIZE):
+        chunk = valid[start:start + BULK_CHUNK_SIZE]
+        for row_number, bitrix_data in chunk:
+            bitrix_data['FIELDS']['ORIGINATOR_ID'] = BULK_ORIGINATOR
+            bitrix_data['FIELDS']['ORIGIN_ID'] = f"{import_id}:{row_number}"
+        results.extend(_create_chunk(chunk, service))
+
+    results.sort(key=lambda result: result['row'])
+    created = sum(1 for result in results if result['success'])
+    logger.info(f"Пакетное создание сделок {import_id}: создано {created} из {len(results)}")
+    return {
+        'success': True,
+        'import_id': import_id,
+        'total': len(results),
+        'created': created,
+        'failed': len(results) - created,
+        'results': results,
+    }
+
+
+def _create_chunk(chunk: List[Tuple[int, Dict]], service: Bitrix24Service) -> List[Dict]:
+    deal_ids = service.create_deals_batch([bitrix_data for _, bitrix_data in chunk])
+    if deal_ids is not None and len(deal_ids) == len(chunk):
+        return [
+            {'row': row_number, 'success': True, 'deal_id': int(deal_id), 'error': None}
+            for (row_number, _), deal_id in zip(chunk, deal_ids)
+        ]
+
+    # Часть команд пачки могла выполниться до ошибки: сверяемся по ORIGIN_ID
+    existing = service.find_deals_by_origin(
+        BULK_ORIGINATOR, [bitrix_data['FIELDS']['ORIGIN_ID'] for _, bitrix_data in chunk]
+    )
+    if existing is None:
+        # Без сверки повторная отправка по одной могла бы создать дубли
+        error = 'Пачка не подтверждена порталом, и проверить созданные сделки не удалось'
+        return [{'row': row_number, 'success': False, 'deal_id': None, 'error': error} for row_number, _ in chunk]
+    results = []
+    for row_number, bitrix_data in chunk:
+        deal_id = existing.get(bitrix_data['FIELDS']['ORIGIN_ID'])
+        if deal_id is None:
+            result = service.create_deal(bitrix_data)
+            if not result['success']:
+                results.append({'row': row_number, 'success': False, 'deal_id': None, 'error': result['error']})
+                continue
+            deal_id = result['deal_id']
+        results.append({'row': row_number, 'success': True, 'deal_id': deal_id, 'error': None})
+    return results
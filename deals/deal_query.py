@@ -0,0 +1,117 @@
+import base64
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from django.db.models import Q, QuerySet
+
+from deals.models import DealRecord
+
+# Колонки, по которым можно сортировать список: параметр sort -> поле модели
+SORT_FIELDS = {
+    'date': 'date_create',
+    'amount': 'opportunity',
+    'title': 'title',
+    'id': 'id',
+}
+PAGE_SIZE = 50
+# Точный подсчет дороже страницы; дальше этого порога показываем "N+"
+COUNT_LIMIT = 10000
+
+
+class InvalidCursor(ValueError):
+    """Курсор страницы испорчен или подделан"""
+
+
+@dataclass
+class DealPage:
+    deals: List[DealRecord]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+    count: int
+    count_exact: bool
+
+
+def filter_deals(filters: Dict) -> QuerySet:
+    """Применить фильтры формы к локальной копии сделок"""
+    queryset = DealRecord.objects.all()
+    if filters.get('stage_id'):
+        queryset = queryset.filter(stage_id=filters['stage_id'])
+    if filters.get('type_id'):
+        queryset = queryset.filter(type_id=filters['type_id'])
+    if filters.get('currency_id'):
+        queryset = queryset.filter(currency_id=filters['currency_id'])
+    if filters.get('assigned_by_id'):
+        queryset = queryset.filter(assigned_by_id=filters['assigned_by_id'])
+    if filters.get('min_amount') is not None:
+        queryset = queryset.filter(opportunity__gte=filters['min_amount'])
+    if filters.get('max_amount') is not None:
+        queryset = queryset.filter(opportunity__lte=filters['max_amount'])
+    if filters.get('date_from'):
+        queryset = queryset.filter(date_create__date__gte=filters['date_from'])
+    if filters.get('date_to'):
+        queryset = queryset.filter(date_create__date__lte=filters['date_to'])
+    if filters.get('q'):
+        queryset = queryset.filter(title__icontains=filters['q'])
+    return queryset
+
+
+def encode_cursor(record: DealRecord, field: str) -> str:
+    value = getattr(record, field)
+    payload = json.dumps([str(value) if field != 'id' else value, record.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, field: str):
+    """Значение колонки и ID из курсора; InvalidCursor, если курсор испорчен"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return DealRecord._meta.get_field(field).to_python(value), int(record_id)
+    except Exception as e:
+        raise InvalidCursor(f"Некорректный курсор: {e}")
+
+
+def paginate_deals(queryset: QuerySet, sort: str = 'date', descending: bool = True,
+                   after: str = None, before: str = None, page_size: int = PAGE_SIZE) -> DealPage:
+    """
+    Keyset-пагинация по (колонка сортировки, id): страница - один проход по индексу,
+    без OFFSET, поэтому далекие страницы открываются так же быстро, как первая
+    """
+    field = SORT_FIELDS.get(sort, 'date_create')
+    # Для страницы "назад" идем в обратном порядке и потом разворачиваем результат
+    backwards = bool(before) and not after
+    reverse = descending != backwards
+    cursor = after or before
+
+    page = queryset
+    if cursor:
+        value, record_id = decode_cursor(cursor, field)
+        if reverse:
+            condition = Q(**{f"{field}__lt": value}) | Q(**{field: value, 'id__lt': record_id})
+        else:
+            condition = Q(**{f"{field}__gt": value}) | Q(**{field: value, 'id__gt': record_id})
+        page = page.filter(condition)
+
+    prefix = '-' if reverse else ''
+    rows = list(page.order_by(f"{prefix}{field}", f"{prefix}id")[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor(rows[-1], field)
+        if cursor and (has_more or not backwards):
+            prev_cursor = encode_cursor(rows[0], field)
+
+    count = queryset.order_by()[:COUNT_LIMIT + 1].count()
+    return DealPage(
+        deals=rows,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        count=min(count, COUNT_LIMIT),
+        count_exact=count <= COUNT_LIMIT,
+    )
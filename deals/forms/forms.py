@@ -1,3 +1,5 @@
+import uuid
+
 from django import forms
 from django.core.validators import MinValueValidator
 
@@ -108,8 +110,87 @@ class DealCreateForm(forms.Form):
         widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
     )
 
+    # Ключ идемпотентности: выдается при показе формы, повторная отправка не создаст дубль
+    idempotency_key = forms.CharField(
+        required=False,
+        max_length=64,
+        widget=forms.HiddenInput()
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.is_bound:
+            self.initial.setdefault('idempotency_key', uuid.uuid4().hex)
+
     def clean_opportunity(self):
         opportunity = self.cleaned_data['opportunity']
         if opportunity <= 0:
             raise forms.ValidationError("Сумма сделки должна быть положительной")
-        return opportunity
\ No newline at end of file
+        return opportunity
+
+class DealFilterForm(forms.Form):
+    """Фильтры и сортировка списка сделок"""
+    SORT_CHOICES = [
+        ('date', 'Дата создания'),
+        ('amount', 'Сумма'),
+        ('title', 'Название'),
+        ('id', 'ID'),
+    ]
+
+    q = forms.CharField(
+        label='Название',
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Поиск по названию'})
+    )
+    stage_id = forms.ChoiceField(label='Стадия', required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+    type_id = forms.ChoiceField(label='Тип', required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+    currency_id = forms.ChoiceField(
+        label='Валюта',
+        required=False,
+        choices=[('', 'Любая')] + DealCreateForm.CURRENCY_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    assigned_by_id = forms.IntegerField(
+        label='ID ответственного',
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    min_amount = forms.DecimalField(
+        label='Сумма от',
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    max_amount = forms.DecimalField(
+        label='Сумма до',
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    date_from = forms.DateField(
+        label='Создана с',
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        label='Создана по',
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    sort = forms.ChoiceField(label='Сортировка', required=False, choices=SORT_CHOICES)
+    order = forms.ChoiceField(label='Порядок', required=False, choices=[('desc', 'По убыванию'), ('asc', 'По возрастанию')])
+    after = forms.CharField(required=False, widget=forms.HiddenInput)
+    before = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def __init__(self, *args, stages=None, types=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['stage_id'].choices = [('', 'Любая')] + list((stages or {}).items())
+        self.fields['type_id'].choices = [('', 'Любой')] + list((types or {}).items())
+
+
+class DealBulkUploadForm(forms.Form):
+    """Загрузка CSV-файла для пакетного создания сделок"""
+    file = forms.FileField(
+        label='CSV-файл со сделками',
+        help_text='Первая строка - заголовки с именами полей формы создания сделки',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'})
+    )
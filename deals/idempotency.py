@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+from typing import Dict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from deals.models import DealCreationRequest
+from deals.services import Bitrix24Service
+
+logger = logging.getLogger(__name__)
+
+# Метка источника для сделок из формы (поле ORIGINATOR_ID), ORIGIN_ID - ключ идемпотентности
+FORM_ORIGINATOR = 'django'
+
+
+def derive_key(form_data: Dict) -> str:
+    """
+    Ключ для запроса без ключа от клиента: хэш данных формы в пределах окна
+    DEAL_IDEMPOTENCY_WINDOW. Одинаковые отправки внутри окна считаются одной.
+    Окна нумеруются от эпохи, поэтому повтор сразу после границы окна получает
+    ключ предыдущего окна, если запрос с ним был меньше окна назад
+    """
+    window = getattr(settings, 'DEAL_IDEMPOTENCY_WINDOW', 600)
+    payload = json.dumps(
+        {key: value for key, value in form_data.items() if key != 'idempotency_key'},
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:40]
+    bucket = int(time.time() // window)
+
+    previous = f"form:{digest}:{bucket - 1}"
+    recent = timezone.now() - timedelta(seconds=window)
+    if DealCreationRequest.objects.filter(key=previous, created_at__gte=recent).exists():
+        return previous
+    return f"form:{digest}:{bucket}"
+
+
+def create_deal_once(bitrix_data: Dict, key: str, service: Bitrix24Service = None) -> Dict:
+    """
+    Создать сделку не больше одного раза на ключ. Для завершенного ключа возвращается
+    сохраненный результат (replayed), для ключа, который сейчас обрабатывает другой
+    запрос, - pending. Упавший или зависший запрос можно повторить с тем же ключом
+    """
+    service = service or Bitrix24Service()
+    record = _claim(key)
+    if record is None:
+        record = DealCreationRequest.objects.get(key=key)
+        if record.status == DealCreationRequest.STATUS_COMPLETED:
+            logger.info(f"Повторный запрос {key}: сделка {record.deal_id} уже создана")
+            return {'success': True, 'deal_id': record.deal_id, 'replayed': True}
+        return {'success': False, 'pending': True, 'error': 'Запрос на создание этой сделки уже обрабатывается'}
+
+    bitrix_data['FIELDS']['ORIGINATOR_ID'] = FORM_ORIGINATOR
+    bitrix_data['FIELDS']['ORIGIN_ID'] = key
+    if record.attempts > 1:
+        # Прошлая попытка могла создать сделку и не дождаться ответа
+        existing = service.find_deals_by_origin(FORM_ORIGINATOR, [key])
+        if existing is None:
+            result = {'success': False, 'error': 'Не удалось проверить, создана ли сделка; повторите отправку'}
+            _finish(record, result)
+            return result
+        if key in existing:
+            result = {'success': True, 'deal_id': existing[key]}
+            _finish(record, result)
+            return result
+
+    result = service.create_deal(bitrix_data)
+    _finish(record, result)
+    return result
+
+
+def _claim(key: str):
+    """Занять ключ: новый, упавший или зависший в pending. None - ключ занят или уже выполнен"""
+    try:
+        with transaction.atomic():
+            return DealCreationRequest.objects.create(key=key, attempts=1)
+    except IntegrityError:
+        pass
+
+    stale = timezone.now() - timedelta(seconds=getattr(settings, 'DEAL_IDEMPOTENCY_PENDING_TIMEOUT', 120))
+    claimable = DealCreationRequest.objects.filter(key=key).filter(
+        Q(status=DealCreationRequest.STATUS_FAILED)
+        | Q(status=DealCreationRequest.STATUS_PENDING, updated_at__lt=stale)
+    )
+    # Условное обновление: из параллельных запросов ключ займет только один
+    if claimable.update(status=DealCreationRequest.STATUS_PENDING, attempts=F('attempts') + 1,
+                        updated_at=timezone.now()):
+        return DealCreationRequest.objects.get(key=key)
+    return None
+
+
+def _finish(record: DealCreationRequest, result: Dict):
+    if result['success']:
+        record.status = DealCreationRequest.STATUS_COMPLETED
+        record.deal_id = result['deal_id']
+        record.error = ''
+    else:
+        record.status = DealCreationRequest.STATUS_FAILED
+        record.error = result.get('error', '')
+    record.save(update_fields=['status', 'deal_id', 'error', 'updated_at'])
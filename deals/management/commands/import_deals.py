@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from deals.bulk import create_deals_bulk, read_deal_rows
+
+
+class Command(BaseCommand):
+    help = 'Создать сделки в Bitrix24 по CSV-файлу с колонками формы создания сделки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV-файлу')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                rows = read_deal_rows(file)
+        except OSError as e:
+            raise CommandError(f"Не удалось прочитать файл: {e}")
+
+        result = create_deals_bulk(rows)
+        for row in result['results']:
+            if not row['success']:
+                self.stderr.write(f"Строка {row['row']}: {row['error']}")
+        self.stdout.write(f"Создано сделок: {result['created']} из {result['total']}, ошибок: {result['failed']}")
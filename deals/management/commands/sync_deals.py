@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from deals.analytics import rebuild_rollups
+from deals.sync import sync_deals
+
+
+class Command(BaseCommand):
+    help = 'Синхронизировать локальную копию сделок с Bitrix24 по DATE_MODIFY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Полная синхронизация с удалением исчезнувших сделок')
+        parser.add_argument('--rebuild-rollups', action='store_true',
+                            help='Пересчитать агрегаты аналитики по локальной копии без обращения к Bitrix24')
+
+    def handle(self, *args, **options):
+        if options['rebuild_rollups']:
+            rebuild_rollups()
+            self.stdout.write('Агрегаты аналитики пересчитаны')
+            return
+
+        result = sync_deals(full=options['full'])
+        self.stdout.write(f"Обновлено сделок: {result['synced']}, удалено: {result['deleted']}")
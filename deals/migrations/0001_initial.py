@@ -0,0 +1,70 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='DealRecord',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID сделки в Bitrix24')),
+                ('title', models.CharField(blank=True, default='', max_length=255, verbose_name='Название')),
+                ('opportunity', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Сумма')),
+                ('currency_id', models.CharField(blank=True, default='', max_length=8, verbose_name='Валюта')),
+                ('stage_id', models.CharField(blank=True, default='', max_length=50, verbose_name='Стадия')),
+                ('type_id', models.CharField(blank=True, default='', max_length=50, verbose_name='Тип')),
+                ('assigned_by_id', models.IntegerField(blank=True, null=True, verbose_name='Ответственный')),
+                ('company_id', models.IntegerField(blank=True, null=True, verbose_name='Компания')),
+                ('contact_id', models.IntegerField(blank=True, null=True, verbose_name='Контакт')),
+                ('comments', models.TextField(blank=True, default='', verbose_name='Комментарий')),
+                ('date_create', models.DateTimeField(verbose_name='Дата создания')),
+                ('date_modify', models.DateTimeField(verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Сделка (локальная копия)',
+                'verbose_name_plural': 'Сделки (локальная копия)',
+                'ordering': ['-date_create', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('value', models.CharField(blank=True, default='', max_length=255, verbose_name='Значение')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Отметка синхронизации',
+                'verbose_name_plural': 'Отметки синхронизации',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dealrecord',
+            index=models.Index(fields=['date_create', 'id'], name='deal_date_create_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealrecord',
+            index=models.Index(fields=['opportunity', 'id'], name='deal_opportunity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealrecord',
+            index=models.Index(fields=['title', 'id'], name='deal_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealrecord',
+            index=models.Index(fields=['stage_id', 'date_create'], name='deal_stage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealrecord',
+            index=models.Index(fields=['type_id', 'date_create'], name='deal_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealrecord',
+            index=models.Index(fields=['assigned_by_id', 'date_create'], name='deal_assigned_idx'),
+        ),
+    ]
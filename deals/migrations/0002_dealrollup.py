@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage_id', models.CharField(max_length=50, verbose_name='Стадия')),
+                ('currency_id', models.CharField(max_length=8, verbose_name='Валюта')),
+                ('week', models.DateField(verbose_name='Неделя (понедельник)')),
+                ('deal_count', models.IntegerField(default=0, verbose_name='Количество сделок')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Сумма')),
+            ],
+            options={
+                'verbose_name': 'Агрегат сделок',
+                'verbose_name_plural': 'Агрегаты сделок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dealrollup',
+            constraint=models.UniqueConstraint(fields=('stage_id', 'currency_id', 'week'), name='deal_rollup_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='dealrollup',
+            index=models.Index(fields=['week'], name='deal_rollup_week_idx'),
+        ),
+    ]
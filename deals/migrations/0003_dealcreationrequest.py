@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0002_dealrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealCreationRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=80, unique=True, verbose_name='Ключ идемпотентности')),
+                ('status', models.CharField(choices=[('pending', 'Выполняется'), ('completed', 'Создана'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('deal_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID сделки в Bitrix24')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('attempts', models.IntegerField(default=0, verbose_name='Попыток')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Запрос на создание сделки',
+                'verbose_name_plural': 'Запросы на создание сделок',
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+from django.db import models
+
+
+class DealRecord(models.Model):
+    """Локальная копия сделки Bitrix24: список, фильтры и сортировка без выгрузки всей таблицы"""
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID сделки в Bitrix24")
+    title = models.CharField(max_length=255, blank=True, default='', verbose_name="Название")
+    opportunity = models.DecimalField(max_digits=18, decimal_places=2, default=0, verbose_name="Сумма")
+    currency_id = models.CharField(max_length=8, blank=True, default='', verbose_name="Валюта")
+    stage_id = models.CharField(max_length=50, blank=True, default='', verbose_name="Стадия")
+    type_id = models.CharField(max_length=50, blank=True, default='', verbose_name="Тип")
+    assigned_by_id = models.IntegerField(null=True, blank=True, verbose_name="Ответственный")
+    company_id = models.IntegerField(null=True, blank=True, verbose_name="Компания")
+    contact_id = models.IntegerField(null=True, blank=True, verbose_name="Контакт")
+    comments = models.TextField(blank=True, default='', verbose_name="Комментарий")
+    date_create = models.DateTimeField(verbose_name="Дата создания")
+    date_modify = models.DateTimeField(verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Сделка (локальная копия)"
+        verbose_name_plural = "Сделки (локальная копия)"
+        ordering = ['-date_create', '-id']
+        indexes = [
+            # Ключи сортировки для keyset-пагинации: (колонка, id)
+            models.Index(fields=['date_create', 'id'], name='deal_date_create_idx'),
+            models.Index(fields=['opportunity', 'id'], name='deal_opportunity_idx'),
+            models.Index(fields=['title', 'id'], name='deal_title_idx'),
+            models.Index(fields=['stage_id', 'date_create'], name='deal_stage_idx'),
+            models.Index(fields=['type_id', 'date_create'], name='deal_type_idx'),
+            models.Index(fields=['assigned_by_id', 'date_create'], name='deal_assigned_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.title}"
+
+
+class SyncState(models.Model):
+    """Отметки синхронизации с Bitrix24 (например, последний DATE_MODIFY сделок)"""
+    name = models.CharField(max_length=50, unique=True, verbose_name="Название")
+    value = models.CharField(max_length=255, blank=True, default='', verbose_name="Значение")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Отметка синхронизации"
+        verbose_name_plural = "Отметки синхронизации"
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class DealRollup(models.Model):
+    """Предрасчитанные агрегаты сделок: количество и сумма по стадии, валюте и неделе создания"""
+    stage_id = models.CharField(max_length=50, verbose_name="Стадия")
+    currency_id = models.CharField(max_length=8, verbose_name="Валюта")
+    week = models.DateField(verbose_name="Неделя (понедельник)")
+    deal_count = models.IntegerField(default=0, verbose_name="Количество сделок")
+    amount = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Сумма")
+
+    class Meta:
+        verbose_name = "Агрегат сделок"
+        verbose_name_plural = "Агрегаты сделок"
+        constraints = [
+            models.UniqueConstraint(fields=['stage_id', 'currency_id', 'week'], name='deal_rollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['week'], name='deal_rollup_week_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.week} {self.stage_id} {self.currency_id}: {self.deal_count}"
+
+
+class DealCreationRequest(models.Model):
+    """Запрос на создание сделки по ключу идемпотентности: повтор с тем же ключом не создает дубль"""
+    STATUS_PENDING = 'pending'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Выполняется'),
+        (STATUS_COMPLETED, 'Создана'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    key = models.CharField(max_length=80, unique=True, verbose_name="Ключ идемпотентности")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    deal_id = models.BigIntegerField(null=True, blank=True, verbose_name="ID сделки в Bitrix24")
+    error = models.TextField(blank=True, default='', verbose_name="Ошибка")
+    attempts = models.IntegerField(default=0, verbose_name="Попыток")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Запрос на создание сделки"
+        verbose_name_plural = "Запросы на создание сделок"
+
+    def __str__(self):
+        return f"{self.key}: {self.status}"
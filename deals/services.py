@@ -1,28 +1,112 @@
-from typing import List, Dict
+import random
+import time
+from typing import List, Dict, Optional
 
 from django.conf import settings
-from fast_bitrix24 import Bitrix
+from django.core.cache import cache
+from monitoring.bitrix import InstrumentedBitrix, record_cache_event, record_retry
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Поля сделки, которые хранятся в локальной копии
+DEAL_SYNC_FIELDS = [
+    'ID', 'TITLE', 'OPPORTUNITY', 'CURRENCY_ID', 'STAGE_ID', 'TYPE_ID', 'ASSIGNED_BY_ID',
+    'COMPANY_ID', 'CONTACT_ID', 'COMMENTS', 'DATE_CREATE', 'DATE_MODIFY',
+]
+
+# Коды ошибок Bitrix24, после которых запрос можно повторить
+TRANSIENT_ERROR_CODES = ('QUERY_LIMIT_EXCEEDED', 'OPERATION_TIME_LIMIT', 'INTERNAL_SERVER_ERROR', 'SERVICE_UNAVAILABLE')
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Временная ошибка: лимит запросов, ответ 5xx, таймаут или обрыв соединения"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, 'status', None) or getattr(error, 'status_code', None)
+    if isinstance(status, int) and (status == 429 or status >= 500):
+        return True
+    text = f"{type(error).__name__} {error}"
+    return any(code in text for code in TRANSIENT_ERROR_CODES) or 'Disconnected' in text
+
+
 # webhook_url = settings.BITRIX24_WEBHOOK_URL
 # bx = Bitrix(webhook_url)
 
 class Bitrix24Service:
     def __init__(self):
         self.webhook_url = settings.BITRIX24_WEBHOOK_URL
-        self.bx = Bitrix(self.webhook_url)
+        self.bx = InstrumentedBitrix(self.webhook_url)
 
     def create_deal(self, deal_data):
-        """Создание сделки в Bitrix24"""
+        """
+        Создание сделки в Bitrix24. Превышение лимита запросов, ошибки 5xx и обрывы
+        связи повторяются с экспоненциальной задержкой; перед повтором сделка ищется
+        по ORIGIN_ID, чтобы запрос, дошедший до портала, не создал дубль.
+        Суммарное ожидание ограничено DEAL_CREATE_MAX_WAIT: запрос пользователя не висит
+        долго, а повторная отправка с тем же ключом идемпотентности сделку не задублирует
+        """
+        fields = deal_data.get('FIELDS', {})
+        retries = getattr(settings, 'DEAL_CREATE_RETRIES', 4)
+        backoff = getattr(settings, 'DEAL_CREATE_BACKOFF', 0.5)
+        max_wait = getattr(settings, 'DEAL_CREATE_MAX_WAIT', 3)
+        waited = 0.0
+
+        for attempt in range(retries + 1):
+            try:
+                result = self.bx.call('crm.deal.add', deal_data)
+                if isinstance(result, dict):
+                    result = next(iter(result.values()), None)
+                logger.info(f"Сделка создана успешно. ID: {result}")
+                return {'success': True, 'deal_id': int(result)}
+            except Exception as e:
+                delay = backoff * 2 ** attempt * random.uniform(1, 1.5)
+                if attempt == retries or not is_transient_error(e) or waited + delay > max_wait:
+                    logger.error(f"Ошибка при создании сделки: {e}")
+                    return {'success': False, 'error': str(e)}
+                logger.warning(f"Временная ошибка при создании сделки, повтор {attempt + 1}: {e}")
+
+            record_retry()
+            time.sleep(delay)
+            waited += delay
+            if fields.get('ORIGIN_ID'):
+                existing = self.find_deals_by_origin(fields.get('ORIGINATOR_ID', ''), [fields['ORIGIN_ID']])
+                if existing is None:
+                    # Без проверки повтор может создать дубль: ключ останется failed,
+                    # а повторная отправка сверится по ORIGIN_ID
+                    return {'success': False, 'error': 'Не удалось проверить, создана ли сделка; повторите отправку'}
+                if fields['ORIGIN_ID'] in existing:
+                    deal_id = existing[fields['ORIGIN_ID']]
+                    logger.info(f"Сделка уже создана предыдущей попыткой. ID: {deal_id}")
+                    return {'success': True, 'deal_id': deal_id}
+
+    def create_deals_batch(self, deals_data: List[Dict]):
+        """
+        Создание сделок пачкой: fast_bitrix24 упаковывает список в batch-запросы
+        по 50 команд и отправляет их параллельно в пределах лимита портала
+        """
         try:
-            result = self.bx.call('crm.deal.add', deal_data)
-            logger.info(f"Сделка создана успешно. ID: {result}")
-            return {'success': True, 'deal_id': result}
+            results = self.bx.call('crm.deal.add', deals_data)
+            if isinstance(results, dict):
+                results = [results[key] for key in sorted(results)]
+            elif not isinstance(results, (list, tuple)):
+                results = [results]
+            return list(results)
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном создании сделок: {e}")
+            return None
+
+    def find_deals_by_origin(self, originator_id: str, origin_ids: List[str]) -> Optional[Dict[str, int]]:
+        """ID сделок, уже созданных с указанными ORIGIN_ID; None - проверить не удалось"""
+        try:
+            deals = self.bx.get_all('crm.deal.list', {
+                'filter': {'ORIGINATOR_ID': originator_id, 'ORIGIN_ID': origin_ids},
+                'select': ['ID', 'ORIGIN_ID'],
+            })
+            return {deal['ORIGIN_ID']: int(deal['ID']) for deal in deals}
         except Exception as e:
-            logger.error(f"Ошибка при создании сделки: {e}")
-            return {'success': False, 'error': str(e)}
+            logger.error(f"Ошибка при поиске созданных сделок: {e}")
+            return None
 
     def map_form_to_bitrix_data(self, form_data):
         """Преобразование данных формы в формат Bitrix24"""
@@ -105,8 +189,33 @@ class Bitrix24Service:
             logger.error(f"Ошибка при получении сделок: {e}")
             return []
 
+    def get_deals_modified_since(self, since: str = None) -> List[Dict]:
+        """Сделки, измененные начиная с отметки DATE_MODIFY (все, если отметки нет)"""
+        params = {'select': DEAL_SYNC_FIELDS}
+        if since:
+            params['filter'] = {'>=DATE_MODIFY': since}
+        return self.bx.get_all('crm.deal.list', params)
+
+    def _cached_dictionary(self, name: str, loader) -> Dict:
+        """Справочники меняются редко: держим их в кэше DEAL_DICTIONARY_TTL секунд"""
+        key = f"deals:{name}"
+        value = cache.get(key)
+        record_cache_event(name, value is not None)
+        if value is None:
+            value = loader()
+            if value:
+                cache.set(key, value, getattr(settings, 'DEAL_DICTIONARY_TTL', 600))
+        return value
+
     def get_deal_stages(self) -> Dict:
         """Получить справочник стадий сделок"""
+        return self._cached_dictionary('deal_stages', self._load_deal_stages)
+
+    def get_deal_types(self) -> Dict:
+        """Получить справочник типов сделок"""
+        return self._cached_dictionary('deal_types', self._load_deal_types)
+
+    def _load_deal_stages(self) -> Dict:
         try:
             # Используем call вместо get_all для методов не заканчивающихся на .list
             result = self.bx.get_all('crm.status.list', {
@@ -129,8 +238,7 @@ class Bitrix24Service:
             logger.error(f"Ошибка при получении стадий: {e}")
             return {}
 
-    def get_deal_types(self) -> Dict:
-        """Получить справочник типов сделок"""
+    def _load_deal_types(self) -> Dict:
         try:
             # Используем call и передаем пустой словарь вместо None
             result = self.bx.call('crm.type.list', {})
@@ -154,6 +262,8 @@ class Bitrix24Service:
         """Получить сделку по ID"""
         try:
             result = self.bx.call('crm.deal.get', {'id': deal_id})
+            if isinstance(result, dict) and 'order0000000000' in result:
+                result = result['order0000000000']
 
             if result and isinstance(result, dict):
                 return result
@@ -166,89 +276,88 @@ class Bitrix24Service:
             return {}
 
     def get_deal_details(self, deal_id: int) -> Dict:
-        """Получить детальную информацию о сделке"""
-        try:
-            # Получаем основную информацию о сделке
-            deal = self.get_deal_by_id(deal_id)
-            if not deal:
-                return {}
-
-            # Получаем связанные контакты
-            contacts = self._get_deal_contacts(deal_id)
-
-            # Получаем связанные компании
-            companies = self._get_deal_companies(deal_id)
-
-            # Получаем задачи сделки
-            tasks = self._get_deal_tasks(deal_id)
-            #
-            # Обогащаем данные
-            stages = self.get_deal_stages()
-            types = self.get_deal_types()
-
-            deal['STAGE_NAME'] = stages.get(deal.get('STAGE_ID', ''), deal.get('STAGE_ID', ''))
-            deal['TYPE_NAME'] = types.get(deal.get('TYPE_ID', ''), deal.get('TYPE_ID', ''))
-
-            # Форматируем сумму
-            opportunity = deal.get('OPPORTUNITY')
-            currency = deal.get('CURRENCY_ID', 'RUB')
-            if opportunity:
-                try:
-                    deal['OPPORTUNITY_FORMATTED'] = f"{float(opportunity):,.2f} {currency}"
-                except (ValueError, TypeError):
-                    deal['OPPORTUNITY_FORMATTED'] = f"{opportunity} {currency}"
-            else:
-                deal['OPPORTUNITY_FORMATTED'] = 'Не указана'
-
-            return {
-                'deal': deal,
-                'contacts': contacts,
-                'companies': companies,
-                # 'tasks': tasks
-            }
-
-        except Exception as e:
-            logger.error(f"Ошибка при получении деталей сделки {deal_id}: {e}")
+        """
+        Основные поля сделки для первой отрисовки страницы: один вызов crm.deal.get,
+        справочники из кэша. Контакты, компания и задачи догружаются отдельно
+        """
+        deal = self.get_deal_by_id(deal_id)
+        if not deal:
             return {}
 
-    def _get_deal_contacts(self, deal_id: int) -> List[Dict]:
-        """Получить контакты связанные со сделкой"""
-        try:
-            result = self.bx.call('crm.deal.contact.items.get', {'id': deal_id})
-            if result and isinstance(result, dict) and 'result' in result:
-                return result['result']
-            return []
-        except Exception as e:
-            logger.error(f"Ошибка при получении контактов сделки {deal_id}: {e}")
-            return []
-
-    def _get_deal_companies(self, deal_id: int) -> List[Dict]:
-        """Получить компании связанные со сделкой"""
-        try:
-            # В Bitrix24 сделка обычно связана с одной компанией
-            deal = self.get_deal_by_id(deal_id)
-            company_id = deal.get('COMPANY_ID')
-            if company_id:
-                company = self.bx.call('crm.company.get', {'id': company_id})
-                return [company] if company else []
-            return []
-        except Exception as e:
-            logger.error(f"Ошибка при получении компаний сделки {deal_id}: {e}")
+        stages = self.get_deal_stages()
+        types = self.get_deal_types()
+        deal['STAGE_NAME'] = stages.get(deal.get('STAGE_ID', ''), deal.get('STAGE_ID', ''))
+        deal['TYPE_NAME'] = types.get(deal.get('TYPE_ID', ''), deal.get('TYPE_ID', ''))
+
+        # Форматируем сумму
+        opportunity = deal.get('OPPORTUNITY')
+        currency = deal.get('CURRENCY_ID', 'RUB')
+        if opportunity:
+            try:
+                deal['OPPORTUNITY_FORMATTED'] = f"{float(opportunity):,.2f} {currency}"
+            except (ValueError, TypeError):
+                deal['OPPORTUNITY_FORMATTED'] = f"{opportunity} {currency}"
+        else:
+            deal['OPPORTUNITY_FORMATTED'] = 'Не указана'
+
+        return deal
+
+    def _cached_section(self, name: str, loader) -> List[Dict]:
+        """
+        Разделы страницы сделки кэшируются на DEAL_SECTION_TTL секунд, в том числе
+        пустые. Ошибка загрузки не кэшируется и пробрасывается вызывающему
+        """
+        key = f"deals:{name}"
+        value = cache.get(key)
+        record_cache_event(name.split(':')[0], value is not None)
+        if value is None:
+            value = loader()
+            cache.set(key, value, getattr(settings, 'DEAL_SECTION_TTL', 120))
+        return value
+
+    def get_deal_contacts(self, deal_id: int) -> List[Dict]:
+        """Контакты сделки: привязки одним вызовом, карточки контактов - одним списком"""
+        return self._cached_section(f"deal_contacts:{deal_id}", lambda: self._load_deal_contacts(deal_id))
+
+    def get_company(self, company_id: int) -> Dict:
+        """Компания сделки; ID берется из уже загруженной сделки, повторного crm.deal.get нет"""
+        companies = self._cached_section(f"company:{company_id}", lambda: self._load_company(company_id))
+        return companies[0] if companies else {}
+
+    def get_deal_tasks(self, deal_id: int) -> List[Dict]:
+        """Задачи, привязанные к сделке"""
+        return self._cached_section(f"deal_tasks:{deal_id}", lambda: self._load_deal_tasks(deal_id))
+
+    def _load_deal_contacts(self, deal_id: int) -> List[Dict]:
+        items = self.bx.call('crm.deal.contact.items.get', {'id': deal_id})
+        if isinstance(items, dict):
+            items = items.get('order0000000000', items.get('result', []))
+        contact_ids = [item['CONTACT_ID'] for item in items or [] if item.get('CONTACT_ID')]
+        if not contact_ids:
             return []
 
-    def _get_deal_tasks(self, deal_id: int) -> List[Dict]:
-        """Получить задачи связанные со сделкой"""
-        try:
-            result = self.bx.get_all('tasks.task.list', {
-                'filter': {'UF_CRM_TASK': [f'D_{deal_id}']},
-                'select': ['ID', 'TITLE', 'STATUS', 'CREATED_DATE', 'RESPONSIBLE_ID']
-            })
-            if result and isinstance(result, dict) and 'tasks' in result:
-                return result['tasks']
-            return []
-        except Exception as e:
-            logger.error(f"Ошибка при получении задач сделки {deal_id}: {e}")
-            return []
+        contacts = self.bx.get_all('crm.contact.list', {
+            'filter': {'@ID': contact_ids},
+            'select': ['ID', 'NAME', 'LAST_NAME', 'PHONE', 'EMAIL'],
+        })
+        # Порядок привязок: основной контакт первым
+        position = {str(contact_id): index for index, contact_id in enumerate(contact_ids)}
+        return sorted(contacts, key=lambda contact: position.get(str(contact['ID']), len(position)))
+
+    def _load_company(self, company_id: int) -> List[Dict]:
+        company = self.bx.call('crm.company.get', {'id': company_id})
+        if isinstance(company, dict) and 'order0000000000' in company:
+            company = company['order0000000000']
+        return [company] if company else []
+
+    def _load_deal_tasks(self, deal_id: int) -> List[Dict]:
+        result = self.bx.get_all('tasks.task.list', {
+            'filter': {'UF_CRM_TASK': [f'D_{deal_id}']},
+            'select': ['ID', 'TITLE', 'STATUS', 'CREATED_DATE', 'RESPONSIBLE_ID']
+        })
+        if isinstance(result, dict):
+            return result.get('tasks', [])
+        return result or []
 
 
 # def _get_deal_tasks(request, deal_id: int) -> List[Dict]:
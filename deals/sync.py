@@ -0,0 +1,151 @@
+import logging
+import threading
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from deals.analytics import apply_delta, contributions, merge_deltas, rebuild_rollups
+from deals.models import DealRecord, SyncState
+from deals.services import Bitrix24Service
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = 'deals_modified'
+FULL_SYNC = 'deals_full_sync'
+
+UPDATE_FIELDS = [
+    'title', 'opportunity', 'currency_id', 'stage_id', 'type_id', 'assigned_by_id',
+    'company_id', 'contact_id', 'comments', 'date_create', 'date_modify',
+]
+
+
+def _int_or_none(value) -> Optional[int]:
+    return int(value) if str(value or '').isdigit() and int(value) else None
+
+
+def _decimal(value) -> Decimal:
+    try:
+        return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return Decimal('0.00')
+
+
+def to_record(deal: Dict) -> DealRecord:
+    """Сделка из crm.deal.list в виде строки локальной таблицы"""
+    date_modify = parse_datetime(deal.get('DATE_MODIFY') or '') or timezone.now()
+    return DealRecord(
+        id=int(deal['ID']),
+        title=(deal.get('TITLE') or '')[:255],
+        opportunity=_decimal(deal.get('OPPORTUNITY')),
+        currency_id=deal.get('CURRENCY_ID') or '',
+        stage_id=deal.get('STAGE_ID') or '',
+        type_id=deal.get('TYPE_ID') or '',
+        assigned_by_id=_int_or_none(deal.get('ASSIGNED_BY_ID')),
+        company_id=_int_or_none(deal.get('COMPANY_ID')),
+        contact_id=_int_or_none(deal.get('CONTACT_ID')),
+        comments=deal.get('COMMENTS') or '',
+        date_create=parse_datetime(deal.get('DATE_CREATE') or '') or date_modify,
+        date_modify=date_modify,
+    )
+
+
+def sync_deals(full: bool = False, service: Bitrix24Service = None) -> Dict:
+    """
+    Подтянуть в локальную таблицу сделки, измененные с прошлой синхронизации,
+    и обновить агрегаты аналитики на разницу старых и новых значений.
+    Полная синхронизация дополнительно удаляет сделки, которых больше нет в портале,
+    и пересчитывает агрегаты целиком
+    """
+    service = service or Bitrix24Service()
+    state, _ = SyncState.objects.get_or_create(name=WATERMARK)
+    since = None if full else (state.value or None)
+
+    deals = service.get_deals_modified_since(since)
+    records = [to_record(deal) for deal in deals]
+    watermark = max((deal.get('DATE_MODIFY') or '' for deal in deals), default='') or state.value
+
+    deleted = 0
+    with transaction.atomic():
+        # Строка отметки заблокирована до коммита: параллельные синхронизации применяют
+        # дельты агрегатов по очереди, и каждая читает прежние значения после предыдущей
+        state = SyncState.objects.select_for_update().get(pk=state.pk)
+        # Прежние значения измененных сделок нужны, чтобы вычесть их вклад из агрегатов
+        old_rows = []
+        if not full:
+            ids = [record.id for record in records]
+            for start in range(0, len(ids), 500):
+                old_rows.extend(DealRecord.objects.filter(id__in=ids[start:start + 500]).values_list(
+                    'stage_id', 'currency_id', 'date_create', 'opportunity'
+                ))
+
+        DealRecord.objects.bulk_create(
+            records, batch_size=500,
+            update_conflicts=True, unique_fields=['id'], update_fields=UPDATE_FIELDS,
+        )
+        if full:
+            portal_ids = {record.id for record in records}
+            stale_ids = [deal_id for deal_id in DealRecord.objects.values_list('id', flat=True)
+                         if deal_id not in portal_ids]
+            for start in range(0, len(stale_ids), 500):
+                deleted += DealRecord.objects.filter(id__in=stale_ids[start:start + 500]).delete()[0]
+            SyncState.objects.update_or_create(name=FULL_SYNC, defaults={'value': timezone.now().isoformat()})
+            rebuild_rollups()
+        else:
+            new_rows = [(record.stage_id, record.currency_id, record.date_create, record.opportunity)
+                        for record in records]
+            apply_delta(merge_deltas(contributions(old_rows, sign=-1), contributions(new_rows)))
+
+        # Отметка не откатывается назад, если параллельная синхронизация ушла дальше
+        state.value = max(watermark or '', state.value)
+        state.save()
+
+    logger.info(f"Синхронизация сделок: обновлено {len(records)}, удалено {deleted}")
+    return {'synced': len(records), 'deleted': deleted}
+
+
+_sync_lock = threading.Lock()
+
+
+def ensure_deals_fresh():
+    """
+    Локальная копия не старше DEAL_SYNC_INTERVAL: первая загрузка синхронная,
+    дальше инкрементальная синхронизация в фоне. Отметка в БД общая для всех воркеров
+    """
+    # Первая загрузка выполнена, если есть отметка полной синхронизации: у портала
+    # без сделок отметка DATE_MODIFY так и остается пустой
+    full_state = SyncState.objects.filter(name=FULL_SYNC).first()
+    state = SyncState.objects.filter(name=WATERMARK).first()
+    if full_state is None or state is None:
+        with _sync_lock:
+            if not SyncState.objects.filter(name=FULL_SYNC).exists():
+                sync_deals(full=True)
+        return
+
+    now = timezone.now()
+    if now - state.updated_at < timedelta(seconds=getattr(settings, 'DEAL_SYNC_INTERVAL', 60)):
+        return
+
+    full_interval = timedelta(seconds=getattr(settings, 'DEAL_FULL_SYNC_INTERVAL', 24 * 3600))
+    full = full_state is None or now - full_state.updated_at > full_interval
+
+    if not _sync_lock.acquire(blocking=False):
+        return
+    # Условное обновление: из воркеров, увидевших одну и ту же отметку, синхронизацию займет один
+    if not SyncState.objects.filter(name=WATERMARK, updated_at=state.updated_at).update(updated_at=now):
+        _sync_lock.release()
+        return
+    threading.Thread(target=_sync_in_background, args=(full,), daemon=True).start()
+
+
+def _sync_in_background(full: bool):
+    try:
+        sync_deals(full=full)
+    except Exception as e:
+        logger.error(f"Ошибка синхронизации сделок: {e}")
+    finally:
+        _sync_lock.release()
@@ -0,0 +1,221 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from deals.analytics import apply_delta, contributions, merge_deltas, rebuild_rollups, week_start
+from deals.deal_query import InvalidCursor, decode_cursor, encode_cursor, filter_deals, paginate_deals
+from deals.idempotency import create_deal_once, derive_key
+from deals.models import DealCreationRequest, DealRecord, DealRollup, SyncState
+from deals.sync import FULL_SYNC, WATERMARK, ensure_deals_fresh, sync_deals
+
+MONDAY = datetime(2024, 3, 4, 12, 0, tzinfo=dt_timezone.utc)
+
+
+def make_record(deal_id, **fields):
+    values = {
+        'title': f"Сделка {deal_id}",
+        'opportunity': Decimal('100.00'),
+        'currency_id': 'RUB',
+        'stage_id': 'NEW',
+        'date_create': MONDAY,
+        'date_modify': MONDAY,
+    }
+    values.update(fields)
+    return DealRecord(id=deal_id, **values)
+
+
+def portal_deal(deal_id, stage='NEW', amount='100', modified='2024-03-04T12:00:00+00:00'):
+    return {
+        'ID': str(deal_id), 'TITLE': f"Сделка {deal_id}", 'OPPORTUNITY': amount, 'CURRENCY_ID': 'RUB',
+        'STAGE_ID': stage, 'DATE_CREATE': '2024-03-04T12:00:00+00:00', 'DATE_MODIFY': modified,
+    }
+
+
+class FakeDealService:
+    """Портал со сделками в памяти вместо Bitrix24Service"""
+
+    def __init__(self, deals=None):
+        self.deals = {int(deal['ID']): deal for deal in deals or []}
+        self.created = []
+        self.origins = {}
+        self.lookup_fails = False
+        self.since = []
+
+    def get_deals_modified_since(self, since=None):
+        self.since.append(since)
+        return [deal for deal in self.deals.values() if not since or deal['DATE_MODIFY'] >= since]
+
+    def create_deal(self, bitrix_data):
+        deal_id = 1000 + len(self.created)
+        self.created.append(bitrix_data)
+        self.origins[bitrix_data['FIELDS']['ORIGIN_ID']] = deal_id
+        return {'success': True, 'deal_id': deal_id}
+
+    def find_deals_by_origin(self, originator_id, origin_ids):
+        if self.lookup_fails:
+            return None
+        return {key: self.origins[key] for key in origin_ids if key in self.origins}
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip_by_date(self):
+        record = make_record(7)
+        value, record_id = decode_cursor(encode_cursor(record, 'date_create'), 'date_create')
+        self.assertEqual(value, MONDAY)
+        self.assertEqual(record_id, 7)
+
+    def test_round_trip_by_amount(self):
+        record = make_record(8, opportunity=Decimal('12.50'))
+        self.assertEqual(decode_cursor(encode_cursor(record, 'opportunity'), 'opportunity'), (Decimal('12.50'), 8))
+
+    def test_broken_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('не-курсор', 'date_create')
+
+
+class PaginateDealsTests(TestCase):
+    def setUp(self):
+        # Две сделки с одинаковой датой: порядок внутри них задает id
+        DealRecord.objects.bulk_create([
+            make_record(deal_id, date_create=MONDAY + timedelta(hours=deal_id // 2))
+            for deal_id in range(1, 8)
+        ])
+
+    def test_pages_cover_all_deals_once(self):
+        seen, cursor = [], None
+        while True:
+            page = paginate_deals(filter_deals({}), after=cursor, page_size=3)
+            seen.extend(deal.id for deal in page.deals)
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        expected = list(DealRecord.objects.order_by('-date_create', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(page.count, 7)
+        self.assertTrue(page.count_exact)
+
+    def test_previous_page(self):
+        first = paginate_deals(filter_deals({}), page_size=3)
+        second = paginate_deals(filter_deals({}), after=first.next_cursor, page_size=3)
+        back = paginate_deals(filter_deals({}), before=second.prev_cursor, page_size=3)
+        self.assertEqual([deal.id for deal in back.deals], [deal.id for deal in first.deals])
+
+    def test_ascending_by_amount_with_filter(self):
+        DealRecord.objects.filter(id__in=[2, 5]).update(opportunity=Decimal('500.00'))
+        page = paginate_deals(filter_deals({'min_amount': 200}), sort='amount', descending=False)
+        self.assertEqual([deal.id for deal in page.deals], [2, 5])
+
+
+class EnsureDealsFreshTests(TestCase):
+    def test_first_load_runs_once_for_empty_portal(self):
+        service = FakeDealService()
+        with mock.patch('deals.sync.Bitrix24Service', return_value=service):
+            ensure_deals_fresh()
+            ensure_deals_fresh()
+        # У пустого портала отметка DATE_MODIFY пустая, но повторной полной загрузки нет
+        self.assertEqual(service.since, [None])
+        self.assertEqual(SyncState.objects.get(name=WATERMARK).value, '')
+
+
+class RollupTests(TestCase):
+    def test_week_start_is_monday(self):
+        self.assertEqual(week_start(MONDAY + timedelta(days=6)), MONDAY.date())
+
+    def test_stage_change_moves_deal_between_rollups(self):
+        apply_delta(contributions([('NEW', 'RUB', MONDAY, Decimal('100'))]))
+        apply_delta(merge_deltas(
+            contributions([('NEW', 'RUB', MONDAY, Decimal('100'))], sign=-1),
+            contributions([('WON', 'RUB', MONDAY, Decimal('150'))]),
+        ))
+        rollups = {row.stage_id: row for row in DealRollup.objects.all()}
+        # Опустевший агрегат удаляется, а не остается с нулями
+        self.assertEqual(set(rollups), {'WON'})
+        self.assertEqual(rollups['WON'].deal_count, 1)
+        self.assertEqual(rollups['WON'].amount, Decimal('150'))
+
+    def test_rebuild_matches_records(self):
+        DealRecord.objects.bulk_create([
+            make_record(1), make_record(2, opportunity=Decimal('50.00')), make_record(3, stage_id='WON'),
+        ])
+        DealRollup.objects.create(stage_id='LOSE', currency_id='RUB', week=MONDAY.date(), deal_count=5)
+        rebuild_rollups()
+        rows = {row.stage_id: (row.deal_count, row.amount) for row in DealRollup.objects.all()}
+        self.assertEqual(rows, {'NEW': (2, Decimal('150.00')), 'WON': (1, Decimal('100.00'))})
+
+
+class SyncTests(TestCase):
+    def test_full_then_incremental(self):
+        service = FakeDealService([portal_deal(1), portal_deal(2)])
+        self.assertEqual(sync_deals(full=True, service=service), {'synced': 2, 'deleted': 0})
+        self.assertTrue(SyncState.objects.filter(name=FULL_SYNC).exists())
+        self.assertEqual(DealRollup.objects.get(stage_id='NEW').deal_count, 2)
+
+        service.deals[2] = portal_deal(2, stage='WON', amount='300', modified='2024-03-05T09:00:00+00:00')
+        sync_deals(service=service)
+        # Инкрементальная синхронизация спрашивает только изменения с отметки
+        self.assertEqual(service.since[-1], '2024-03-04T12:00:00+00:00')
+        self.assertEqual(SyncState.objects.get(name=WATERMARK).value, '2024-03-05T09:00:00+00:00')
+        rows = {row.stage_id: (row.deal_count, row.amount) for row in DealRollup.objects.all()}
+        self.assertEqual(rows, {'NEW': (1, Decimal('100.00')), 'WON': (1, Decimal('300.00'))})
+
+    def test_full_sync_removes_deleted_deals(self):
+        service = FakeDealService([portal_deal(1), portal_deal(2)])
+        sync_deals(full=True, service=service)
+        del service.deals[2]
+        self.assertEqual(sync_deals(full=True, service=service)['deleted'], 1)
+        self.assertEqual(list(DealRecord.objects.values_list('id', flat=True)), [1])
+        self.assertEqual(DealRollup.objects.get(stage_id='NEW').deal_count, 1)
+
+    def test_watermark_does_not_move_back(self):
+        SyncState.objects.create(name=WATERMARK, value='2024-03-10T00:00:00+00:00')
+        sync_deals(service=FakeDealService([portal_deal(1, modified='2024-03-09T00:00:00+00:00')]))
+        self.assertEqual(SyncState.objects.get(name=WATERMARK).value, '2024-03-10T00:00:00+00:00')
+
+
+@override_settings(DEAL_IDEMPOTENCY_WINDOW=600)
+class IdempotencyTests(TestCase):
+    form_data = {'title': 'Заказ', 'opportunity': Decimal('10'), 'idempotency_key': ''}
+
+    def test_derive_key_ignores_client_key(self):
+        with mock.patch('deals.idempotency.time.time', return_value=6000.0):
+            key = derive_key(self.form_data)
+            self.assertEqual(key, derive_key({**self.form_data, 'idempotency_key': 'abc'}))
+            self.assertNotEqual(key, derive_key({**self.form_data, 'title': 'Другой заказ'}))
+
+    def test_derive_key_across_window_boundary(self):
+        with mock.patch('deals.idempotency.time.time', return_value=6599.0):
+            key = derive_key(self.form_data)
+        DealCreationRequest.objects.create(key=key, attempts=1)
+        with mock.patch('deals.idempotency.time.time', return_value=6601.0):
+            self.assertEqual(derive_key(self.form_data), key)
+
+    def test_repeat_is_replayed(self):
+        service = FakeDealService()
+        first = create_deal_once({'FIELDS': {'TITLE': 'Заказ'}}, 'key-1', service)
+        second = create_deal_once({'FIELDS': {'TITLE': 'Заказ'}}, 'key-1', service)
+        self.assertEqual(len(service.created), 1)
+        self.assertEqual(second, {'success': True, 'deal_id': first['deal_id'], 'replayed': True})
+
+    def test_pending_key_is_not_sent_again(self):
+        DealCreationRequest.objects.create(key='key-2', attempts=1)
+        result = create_deal_once({'FIELDS': {}}, 'key-2', FakeDealService())
+        self.assertTrue(result['pending'])
+
+    def test_retry_finds_deal_created_by_failed_attempt(self):
+        service = FakeDealService()
+        service.origins['key-3'] = 555
+        DealCreationRequest.objects.create(key='key-3', attempts=1, status=DealCreationRequest.STATUS_FAILED)
+        result = create_deal_once({'FIELDS': {}}, 'key-3', service)
+        self.assertEqual(result, {'success': True, 'deal_id': 555})
+        self.assertEqual(service.created, [])
+
+    def test_retry_without_origin_lookup_fails(self):
+        service = FakeDealService()
+        service.lookup_fails = True
+        DealCreationRequest.objects.create(key='key-4', attempts=1, status=DealCreationRequest.STATUS_FAILED)
+        result = create_deal_once({'FIELDS': {}}, 'key-4', service)
+        self.assertFalse(result['success'])
+        self.assertEqual(service.created, [])
+        self.assertEqual(DealCreationRequest.objects.get(key='key-4').status, DealCreationRequest.STATUS_FAILED)
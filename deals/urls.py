@@ -17,13 +17,18 @@ Including another URLconf
 from django.urls import path
 
 from deals.views.deals_views import create_deal_view, success_view, get_deal_list, \
-    get_dashboard, get_deal_view
+    get_dashboard, get_deal_view, bulk_create_deals_view, deal_contacts_section, deal_company_section, \
+    deal_tasks_section
 
 urlpatterns = [
     path('', get_dashboard, name='dashboard'),
     path('create/', create_deal_view, name='create_deal'),
+    path('create/bulk/', bulk_create_deals_view, name='bulk_create_deals'),
     path('success/', success_view, name='deal_success'),
     path('list/', get_deal_list, name='deal_list'),
 
     path('<int:pk>/', get_deal_view, name='deal_detail'),
+    path('<int:pk>/contacts/', deal_contacts_section, name='deal_contacts_section'),
+    path('<int:pk>/tasks/', deal_tasks_section, name='deal_tasks_section'),
+    path('company/<int:company_id>/', deal_company_section, name='deal_company_section'),
 ]
@@ -1,12 +1,20 @@
+import csv
 import logging
 
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.views.generic import TemplateView, DetailView
 
-from deals.forms.forms import DealCreateForm
+from contact_import.services.company_index import company_index
+from deals.analytics import dashboard_widgets
+from deals.bulk import BULK_COLUMNS, create_deals_bulk, read_deal_rows
+from deals.deal_query import InvalidCursor, filter_deals, paginate_deals
+from deals.forms.forms import DealBulkUploadForm, DealCreateForm, DealFilterForm
+from deals.idempotency import create_deal_once, derive_key
+from deals.models import DealRecord
 from deals.services import Bitrix24Service
+from deals.sync import ensure_deals_fresh
 from integration_utils.bitrix24.bitrix_user_auth.main_auth import main_auth
 
 
@@ -25,10 +33,14 @@ def create_deal_view(request):
         if form.is_valid():
             bitrix_service = Bitrix24Service()
             bitrix_data = bitrix_service.map_form_to_bitrix_data(form.cleaned_data)
-            result = bitrix_service.create_deal(bitrix_data)
+            # Повторная отправка формы или повтор после таймаута приходят с тем же ключом
+            key = form.cleaned_data.get('idempotency_key') or derive_key(form.cleaned_data)
+            result = create_deal_once(bitrix_data, key, bitrix_service)
 
             if result['success']:
                 return redirect('deal_success')
+            elif result.get('pending'):
+                messages.info(request, result['error'])
             else:
                 messages.error(request, f'Ошибка: {result["error"]}')
     else:
@@ -36,42 +48,90 @@ def create_deal_view(request):
 
     return render(request, 'create_deal.html', {'form': form})
 
+
+@main_auth(on_cookies=True)
+def bulk_create_deals_view(request):
+    """Пакетное создание сделок из CSV-файла"""
+    result = None
+    if request.method == 'POST':
+        form = DealBulkUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                rows = read_deal_rows(form.cleaned_data['file'])
+            except (UnicodeDecodeError, csv.Error) as e:
+                messages.error(request, f'Не удалось прочитать файл: {e}')
+                rows = None
+            if rows is not None:
+                result = create_deals_bulk(rows)
+                messages.success(request, f"Создано сделок: {result['created']} из {result['total']}")
+    else:
+        form = DealBulkUploadForm()
+
+    return render(request, 'bulk_create.html', {'form': form, 'result': result, 'columns': BULK_COLUMNS})
+
 @main_auth(on_cookies=True)
 def get_deal_list(request):
         bitrix_service = Bitrix24Service()
 
-        # Получаем последние 10 сделок
-        deals = bitrix_service.get_recent_deals(limit=10)
-
-        # Получаем справочники для человеко-читаемых названий
+        # Справочники для человеко-читаемых названий (из кэша)
         stages = bitrix_service.get_deal_stages()
         types = bitrix_service.get_deal_types()
 
-        # Обогащаем данные сделок
-        enriched_deals = []
-        for deal in deals:
-            enriched_deal = deal.copy()
-
-            # Добавляем человеко-читаемые названия
-            enriched_deal['STAGE_NAME'] = stages.get(deal.get('STAGE_ID', ''), deal.get('STAGE_ID', ''))
-            enriched_deal['TYPE_NAME'] = types.get(deal.get('TYPE_ID', ''), deal.get('TYPE_ID', ''))
-
-            # Форматируем дату
-            if deal.get('DATE_CREATE'):
-                enriched_deal['DATE_CREATE_FORMATTED'] = deal['DATE_CREATE'][:10]  # Берем только дату
-
-            # Форматируем сумму
-            opportunity = deal.get('OPPORTUNITY')
-            currency = deal.get('CURRENCY_ID', 'RUB')
-            if opportunity:
-                enriched_deal['OPPORTUNITY_FORMATTED'] = f"{float(opportunity):,.2f} {currency}"
-            else:
-                enriched_deal['OPPORTUNITY_FORMATTED'] = 'Не указана'
+        form = DealFilterForm(request.GET, stages=stages, types=types)
+        filters = form.cleaned_data if form.is_valid() else {}
 
-            enriched_deals.append(enriched_deal)
+        try:
+            # Список строится по локальной копии сделок, синхронизируемой по DATE_MODIFY
+            ensure_deals_fresh()
+        except Exception as e:
+            # Ошибка синхронизации не мешает показать уже загруженную копию
+            logger.error(f"Ошибка синхронизации сделок: {e}")
+            messages.warning(request, 'Не удалось обновить сделки из Bitrix24, список может быть неактуален')
 
+        try:
+            page = paginate_deals(
+                filter_deals(filters),
+                sort=filters.get('sort') or 'date',
+                descending=filters.get('order') != 'asc',
+                after=filters.get('after'),
+                before=filters.get('before'),
+            )
+        except InvalidCursor:
+            return redirect('deal_list')
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке списка сделок: {e}")
+            messages.error(request, 'Не удалось загрузить список сделок')
+            page = None
 
-        return render(request, 'deal_list.html', {'deals': enriched_deals})
+        # Обогащаем данные сделок
+        enriched_deals = []
+        for deal in page.deals if page else []:
+            enriched_deals.append({
+                'ID': deal.id,
+                'TITLE': deal.title,
+                'COMMENTS': deal.comments,
+                'STAGE_ID': deal.stage_id,
+                'STAGE_NAME': stages.get(deal.stage_id, deal.stage_id),
+                'TYPE_NAME': types.get(deal.type_id, deal.type_id),
+                'COMPANY_TITLE': company_index.get_title(deal.company_id) if deal.company_id else '',
+                'DATE_CREATE_FORMATTED': deal.date_create.strftime('%Y-%m-%d'),
+                'OPPORTUNITY_FORMATTED': f"{deal.opportunity:,.2f} {deal.currency_id or 'RUB'}"
+                if deal.opportunity else 'Не указана',
+            })
+
+        # Параметры фильтра без курсоров - для ссылок сортировки и страниц
+        query = request.GET.copy()
+        for key in ('after', 'before', 'sort', 'order'):
+            query.pop(key, None)
+
+        return render(request, 'deal_list.html', {
+            'deals': enriched_deals,
+            'form': form,
+            'page': page,
+            'filter_query': query.urlencode(),
+            'sort': filters.get('sort') or 'date',
+            'order': filters.get('order') or 'desc',
+        })
 
 @main_auth(on_cookies=True)
 def get_dashboard(request):
@@ -80,19 +140,27 @@ def get_dashboard(request):
 
         # Форма для создания сделки
         form = DealCreateForm()
-
-        # Последние 5 сделок для дашборда
-        recent_deals = bitrix_service.get_recent_deals(limit=5)
         stages = bitrix_service.get_deal_stages()
 
-        # Обогащаем данные
-        for deal in recent_deals:
-            deal['STAGE_NAME'] = stages.get(deal.get('STAGE_ID', ''), deal.get('STAGE_ID', ''))
-            if deal.get('OPPORTUNITY'):
-                deal['OPPORTUNITY_FORMATTED'] = f"{float(deal['OPPORTUNITY']):,.2f} {deal.get('CURRENCY_ID', 'RUB')}"
-
+        try:
+            ensure_deals_fresh()
+            # Последние 5 сделок и виджеты аналитики - из локальной копии и агрегатов
+            recent_deals = [
+                {
+                    'TITLE': deal.title,
+                    'STAGE_ID': deal.stage_id,
+                    'STAGE_NAME': stages.get(deal.stage_id, deal.stage_id),
+                    'DATE_CREATE': deal.date_create.strftime('%Y-%m-%d'),
+                    'OPPORTUNITY_FORMATTED': f"{deal.opportunity:,.2f} {deal.currency_id or 'RUB'}",
+                }
+                for deal in DealRecord.objects.order_by('-date_create', '-id')[:5]
+            ]
+            analytics = dashboard_widgets(stages)
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке дашборда: {e}")
+            recent_deals, analytics = [], None
 
-        return render(request, 'dashboard.html', {'recent_deals': recent_deals, 'form': form})
+        return render(request, 'dashboard.html', {'recent_deals': recent_deals, 'form': form, 'analytics': analytics})
 
 
 def deal_detail_redirect(request):
@@ -111,25 +179,39 @@ def deal_detail_redirect(request):
 
 @main_auth(on_cookies=True)
 def get_deal_view(request, pk):
-        # deal_id = self.kwargs.get('deal_id')
+        # Первая отрисовка ждет только crm.deal.get; остальные разделы браузер догружает параллельно
+        deal = Bitrix24Service().get_deal_details(pk)
+        if not deal:
+            raise Http404(f"Сделка с ID {pk} не найдена")
 
-        try:
-            bitrix_service = Bitrix24Service()
-            deal_details = bitrix_service.get_deal_details(pk)
-            deal_details['deal'] = deal_details['deal']['order0000000000']
+        return render(request, 'deal_detail.html', {'deal_data': {'deal': deal}})
 
-            stages = bitrix_service.get_deal_stages()
 
-            if not deal_details or 'deal' not in deal_details:
-                raise Http404(f"Сделка с ID {pk} не найдена")
+@main_auth(on_cookies=True)
+def deal_contacts_section(request, pk):
+        return _render_section(request, 'sections/deal_contacts.html', 'contacts',
+                               lambda service: service.get_deal_contacts(pk))
 
 
-            deal_details['deal']['STAGE_NAME'] = stages.get(deal_details['deal'].get('STAGE_ID', ''), deal_details['deal'].get('STAGE_ID', ''))
-            if deal_details['deal'].get('OPPORTUNITY'):
-                deal_details['deal']['OPPORTUNITY_FORMATTED'] = f"{float(deal_details['deal']['OPPORTUNITY']):,.2f} {deal_details['deal'].get('CURRENCY_ID', 'RUB')}"
+@main_auth(on_cookies=True)
+def deal_company_section(request, company_id):
+        return _render_section(request, 'sections/deal_company.html', 'company',
+                               lambda service: service.get_company(company_id))
 
-            return render(request, 'deal_detail.html', {'deal_data': deal_details})
 
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке сделки {pk}: {e}")
-            raise Http404(f"Не удалось загрузить сделку: {str(e)}")
+@main_auth(on_cookies=True)
+def deal_tasks_section(request, pk):
+        return _render_section(request, 'sections/deal_tasks.html', 'tasks',
+                               lambda service: service.get_deal_tasks(pk))
+
+
+def _render_section(request, template: str, name: str, loader):
+    """HTML-фрагмент раздела страницы сделки; пустой ответ - раздел не показывается"""
+    try:
+        data = loader(Bitrix24Service())
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке раздела {name} сделки: {e}")
+        return HttpResponse('Не удалось загрузить данные', status=502)
+    if not data:
+        return HttpResponse('')
+    return render(request, template, {name: data})
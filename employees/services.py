@@ -1,7 +1,7 @@
 import random
 import time
 
-from fast_bitrix24 import Bitrix
+from monitoring.bitrix import InstrumentedBitrix
 import logging
 from django.conf import settings
 from typing import List, Dict
@@ -15,7 +15,7 @@ class Bitrix24CompanyService:
 
     def __init__(self, webhook_url=None):
         self.webhook_url = webhook_url or settings.BITRIX24_WEBHOOK_URL
-        self.bx = Bitrix(self.webhook_url)
+        self.bx = InstrumentedBitrix(self.webhook_url)
 
     def get_all_users(self) -> List[Dict]:
         """Получить всех активных пользователей"""
@@ -153,7 +153,7 @@ class Bitrix24CompanyService:
 class BitrixCallGenerator:
     def __init__(self, webhook_url=None):
         self.webhook_url = webhook_url or settings.BITRIX24_CALL_WEBHOOK_URL
-        self.bx = Bitrix(self.webhook_url)
+        self.bx = InstrumentedBitrix(self.webhook_url)
         self.users = []
         self.contacts = []
 
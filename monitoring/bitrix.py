@@ -0,0 +1,186 @@
+import json
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from fast_bitrix24 import Bitrix
+
+PAGE_SIZE = 50
+
+
+@dataclass
+class BitrixCall:
+    """Один вызов метода Bitrix24 в рамках запроса"""
+    method: str
+    kind: str
+    params_size: int = 0
+    pages: int = 1
+    latency: float = 0.0
+    retries: int = 0
+    throttle_wait: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class RequestMetrics:
+    """Вызовы Bitrix24 и события кэшей одного HTTP-запроса"""
+    calls: List[BitrixCall] = field(default_factory=list)
+    cache_hits: Dict[str, int] = field(default_factory=dict)
+    cache_misses: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_time(self) -> float:
+        return sum(call.latency for call in self.calls)
+
+    def method_counts(self) -> Dict[str, int]:
+        counts = {}
+        for call in self.calls:
+            counts[call.method] = counts.get(call.method, 0) + 1
+        return counts
+
+    def summary(self) -> Dict:
+        return {
+            'bitrix_calls': len(self.calls),
+            'bitrix_pages': sum(call.pages for call in self.calls),
+            'bitrix_time_ms': round(self.total_time * 1000, 1),
+            'bitrix_retries': sum(call.retries for call in self.calls),
+            'bitrix_throttle_ms': round(sum(call.throttle_wait for call in self.calls) * 1000, 1),
+            'bitrix_errors': sum(1 for call in self.calls if call.error),
+            'methods': self.method_counts(),
+            'cache_hits': dict(self.cache_hits),
+            'cache_misses': dict(self.cache_misses),
+        }
+
+
+_current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar('bitrix_request_metrics', default=None)
+# Вызов, который выполняется прямо сейчас: к нему относятся повторы и ожидания внутри fast_bitrix24
+_current_call: ContextVar[Optional[BitrixCall]] = ContextVar('bitrix_current_call', default=None)
+
+
+def start_request_metrics() -> RequestMetrics:
+    """Начать сбор метрик для текущего запроса"""
+    metrics = RequestMetrics()
+    _current_metrics.set(metrics)
+    return metrics
+
+
+def get_request_metrics() -> Optional[RequestMetrics]:
+    return _current_metrics.get()
+
+
+def finish_request_metrics():
+    _current_metrics.set(None)
+
+
+def record_cache_event(name: str, hit: bool):
+    """Отметить попадание или промах кэша в метриках текущего запроса"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return
+    counter = metrics.cache_hits if hit else metrics.cache_misses
+    counter[name] = counter.get(name, 0) + 1
+
+
+def record_retry():
+    """Отметить повтор выполняемого (или последнего завершенного) вызова Bitrix24"""
+    call = _current_call.get()
+    if call is None:
+        metrics = _current_metrics.get()
+        call = metrics.calls[-1] if metrics is not None and metrics.calls else None
+    if call is not None:
+        call.retries += 1
+
+
+def _params_size(params) -> int:
+    try:
+        return len(json.dumps(params, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+@contextmanager
+def track_call(method: str, kind: str, params=None):
+    """Замерить вызов Bitrix24 и записать его в метрики запроса и общий реестр"""
+    from monitoring.metrics import registry
+
+    call = BitrixCall(method=method, kind=kind, params_size=_params_size(params))
+    token = _current_call.set(call)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call.error = type(e).__name__
+        raise
+    finally:
+        call.latency = time.perf_counter() - started
+        _current_call.reset(token)
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.calls.append(call)
+        registry.observe_bitrix_call(call)
+
+
+class InstrumentedBitrix(Bitrix):
+    """Клиент fast_bitrix24, записывающий каждый вызов в метрики запроса"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._instrument_request_handler()
+
+    def _instrument_request_handler(self):
+        """
+        Повторы и троттлинг fast_bitrix24 делает внутри ServerRequestHandler (fast_bitrix24 1.8):
+        failure() вызывается на каждую неудачную попытку перед повтором, а в acquire()
+        запрос ждет автотроттлинг и лимиты скорости. Оборачиваем их у экземпляра, чтобы
+        повторы и время ожидания попадали в текущий вызов
+        """
+        srh = getattr(self, 'srh', None)
+        if srh is None or not hasattr(srh, 'failure') or not hasattr(srh, 'acquire'):
+            return
+        failure, acquire = srh.failure, srh.acquire
+
+        def tracked_failure(err):
+            # Исчерпанные попытки failure() поднимает исключением - это уже не повтор
+            failure(err)
+            record_retry()
+
+        @asynccontextmanager
+        async def tracked_acquire(method):
+            started = time.perf_counter()
+            async with acquire(method):
+                call = _current_call.get()
+                if call is not None:
+                    # Параллельные запросы одного вызова ждут одновременно, время суммируется
+                    call.throttle_wait += time.perf_counter() - started
+                yield
+
+        srh.failure = tracked_failure
+        srh.acquire = tracked_acquire
+
+    def call(self, method, item_list=None, *args, **kwargs):
+        with track_call(method, 'call', item_list) as call:
+            result = super().call(method, item_list, *args, **kwargs)
+            if isinstance(item_list, (list, tuple)):
+                # Список параметров уходит batch-запросами по 50 команд
+                call.pages = max(1, math.ceil(len(item_list) / PAGE_SIZE))
+        return result
+
+    def get_all(self, method, params=None, *args, **kwargs):
+        with track_call(method, 'get_all', params) as call:
+            result = super().get_all(method, params, *args, **kwargs)
+            if isinstance(result, (list, tuple)):
+                call.pages = max(1, math.ceil(len(result) / PAGE_SIZE))
+        return result
+
+    def get_by_ID(self, method, ID_list, *args, **kwargs):
+        with track_call(method, 'get_by_ID', ID_list) as call:
+            result = super().get_by_ID(method, ID_list, *args, **kwargs)
+            call.pages = max(1, math.ceil(len(ID_list) / PAGE_SIZE))
+        return result
+
+    def call_batch(self, params, *args, **kwargs):
+        with track_call('batch', 'call_batch', params):
+            return super().call_batch(params, *args, **kwargs)
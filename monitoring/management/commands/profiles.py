@@ -0,0 +1,74 @@
+import json
+import pstats
+from collections import Counter, defaultdict
+from io import StringIO
+
+from django.core.management.base import BaseCommand
+
+from monitoring.profiling import list_profiles
+
+
+class Command(BaseCommand):
+    help = 'Список сохраненных профилей медленных запросов и самые тяжелые представления'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10, help='Сколько строк выводить')
+        parser.add_argument('--view', help='Показать только профили этого представления')
+        parser.add_argument('--show', help='Подробности профиля: путь к .json, .prof или .stacks')
+
+    def handle(self, *args, **options):
+        if options['show']:
+            return self._show(options['show'], options['top'])
+
+        profiles = list_profiles()
+        if options['view']:
+            profiles = [meta for meta in profiles if meta.get('view') == options['view']]
+        if not profiles:
+            self.stdout.write('Профилей нет')
+            return
+
+        by_view = defaultdict(list)
+        for meta in profiles:
+            by_view[meta.get('view')].append(meta)
+
+        self.stdout.write(f"{'view':<40} {'count':>6} {'max ms':>10} {'avg ms':>10} {'avg calls':>10}")
+        ranked = sorted(by_view.items(), key=lambda item: max(m['duration_ms'] for m in item[1]), reverse=True)
+        for view, items in ranked[:options['top']]:
+            durations = [meta['duration_ms'] for meta in items]
+            calls = [meta.get('bitrix', {}).get('bitrix_calls', 0) for meta in items]
+            self.stdout.write(
+                f"{view:<40} {len(items):>6} {max(durations):>10.1f} "
+                f"{sum(durations) / len(durations):>10.1f} {sum(calls) / len(calls):>10.1f}"
+            )
+
+        self.stdout.write('\nСамые медленные запросы:')
+        for meta in sorted(profiles, key=lambda m: m['duration_ms'], reverse=True)[:options['top']]:
+            methods = meta.get('bitrix', {}).get('methods', {})
+            top_methods = ', '.join(f"{m}={c}" for m, c in Counter(methods).most_common(3))
+            self.stdout.write(
+                f"{meta['duration_ms']:>10.1f} ms  {meta['view']}  {meta['path']}  "
+                f"[{top_methods}]  {meta['meta_path']}"
+            )
+
+    def _show(self, path: str, top: int):
+        if path.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as file:
+                path = json.load(file)['profile_path']
+
+        if path.endswith('.prof'):
+            output = StringIO()
+            stats = pstats.Stats(path, stream=output)
+            stats.sort_stats('cumulative').print_stats(top)
+            self.stdout.write(output.getvalue())
+            return
+
+        # Для сэмплов считаем «собственное» время по верхнему кадру стека
+        self_samples = Counter()
+        total = 0
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                self_samples[stack.rsplit(';', 1)[-1]] += int(count)
+                total += int(count)
+        for frame, count in self_samples.most_common(top):
+            self.stdout.write(f"{count / total:>7.1%}  {count:>6}  {frame}")
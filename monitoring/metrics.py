@@ -0,0 +1,110 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами, как в Prometheus"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        rows, total = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            rows.append((f"{bound:g}", total))
+        rows.append(('+Inf', self.count))
+        return rows
+
+
+class MetricsRegistry:
+    """Агрегированные метрики процесса по представлениям и методам Bitrix24"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.request_latency: Dict[str, Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.request_bitrix_calls: Dict[str, Histogram] = defaultdict(lambda: Histogram(COUNT_BUCKETS))
+            self.request_bitrix_time: Dict[str, Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.method_latency: Dict[str, Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.view_method_calls: Dict[Tuple[str, str], int] = defaultdict(int)
+            self.method_errors: Dict[str, int] = defaultdict(int)
+            self.method_retries: Dict[str, int] = defaultdict(int)
+            self.method_throttle: Dict[str, float] = defaultdict(float)
+            self.cache_events: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def observe_bitrix_call(self, call):
+        with self.lock:
+            self.method_latency[call.method].observe(call.latency)
+            if call.error:
+                self.method_errors[call.method] += 1
+            if call.retries:
+                self.method_retries[call.method] += call.retries
+            if call.throttle_wait:
+                self.method_throttle[call.method] += call.throttle_wait
+
+    def observe_request(self, view: str, latency: float, request_metrics):
+        with self.lock:
+            self.request_latency[view].observe(latency)
+            self.request_bitrix_calls[view].observe(len(request_metrics.calls))
+            self.request_bitrix_time[view].observe(request_metrics.total_time)
+            for method, count in request_metrics.method_counts().items():
+                self.view_method_calls[(view, method)] += count
+            for name, count in request_metrics.cache_hits.items():
+                self.cache_events[(name, 'hit')] += count
+            for name, count in request_metrics.cache_misses.items():
+                self.cache_events[(name, 'miss')] += count
+
+    def render(self) -> str:
+        """Метрики в текстовом формате экспозиции Prometheus"""
+        lines = []
+        with self.lock:
+            self._render_histograms(lines, 'http_request_duration_seconds', 'view', self.request_latency)
+            self._render_histograms(lines, 'http_request_bitrix_calls', 'view', self.request_bitrix_calls)
+            self._render_histograms(lines, 'http_request_bitrix_seconds', 'view', self.request_bitrix_time)
+            self._render_histograms(lines, 'bitrix_call_duration_seconds', 'method', self.method_latency)
+
+            lines.append('# TYPE bitrix_calls_total counter')
+            for (view, method), count in sorted(self.view_method_calls.items()):
+                lines.append(f'bitrix_calls_total{{view="{view}",method="{method}"}} {count}')
+            lines.append('# TYPE bitrix_call_errors_total counter')
+            for method, count in sorted(self.method_errors.items()):
+                lines.append(f'bitrix_call_errors_total{{method="{method}"}} {count}')
+            lines.append('# TYPE bitrix_call_retries_total counter')
+            for method, count in sorted(self.method_retries.items()):
+                lines.append(f'bitrix_call_retries_total{{method="{method}"}} {count}')
+            lines.append('# TYPE bitrix_call_throttle_seconds_total counter')
+            for method, seconds in sorted(self.method_throttle.items()):
+                lines.append(f'bitrix_call_throttle_seconds_total{{method="{method}"}} {seconds:.6f}')
+            lines.append('# TYPE cache_events_total counter')
+            for (name, result), count in sorted(self.cache_events.items()):
+                lines.append(f'cache_events_total{{cache="{name}",result="{result}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines: List[str], name: str, label: str, histograms: Dict[str, Histogram]):
+        lines.append(f'# TYPE {name} histogram')
+        for key, histogram in sorted(histograms.items()):
+            for bound, count in histogram.cumulative():
+                lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{{label}="{key}"}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{label}="{key}"}} {histogram.count}')
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,56 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+
+from monitoring.bitrix import finish_request_metrics, start_request_metrics
+from monitoring.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+def get_view_name(request) -> str:
+    """Имя представления для группировки метрик"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class BitrixMetricsMiddleware:
+    """Собирает вызовы Bitrix24 за запрос: заголовок, структурный лог и общий реестр метрик"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = start_request_metrics()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request_metrics()
+        latency = time.perf_counter() - started
+
+        view = get_view_name(request)
+        summary = request_metrics.summary()
+        registry.observe_request(view, latency, request_metrics)
+
+        if request_metrics.calls:
+            logger.info(json.dumps({
+                'event': 'bitrix_calls',
+                'view': view,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(latency * 1000, 1),
+                **summary,
+            }, ensure_ascii=False))
+
+        if getattr(settings, 'BITRIX_METRICS_HEADER', settings.DEBUG):
+            methods = ','.join(f"{method}={count}" for method, count in summary['methods'].items())
+            response['X-Bitrix-Calls'] = str(summary['bitrix_calls'])
+            response['X-Bitrix-Time-Ms'] = str(summary['bitrix_time_ms'])
+            response['X-Bitrix-Methods'] = methods
+
+        return response
@@ -0,0 +1,190 @@
+import cProfile
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List
+
+from django.conf import settings
+
+from monitoring.bitrix import get_request_metrics
+from monitoring.middleware import get_view_name
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 64
+
+
+def _collapse_stack(frame) -> str:
+    """Стек в формате collapsed stacks (корень первым), пригодном для flamegraph"""
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+class StackSampler(threading.Thread):
+    """Один фоновый поток, периодически снимающий стеки потоков, обрабатывающих запросы"""
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True, name='stack-sampler')
+        self.interval = interval
+        self.targets: Dict[int, Counter] = {}
+        self.lock = threading.Lock()
+
+    def register(self, thread_id: int) -> Counter:
+        samples = Counter()
+        with self.lock:
+            self.targets[thread_id] = samples
+        return samples
+
+    def unregister(self, thread_id: int):
+        with self.lock:
+            self.targets.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            with self.lock:
+                targets = list(self.targets.items())
+            if targets:
+                frames = sys._current_frames()
+                for thread_id, samples in targets:
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[_collapse_stack(frame)] += 1
+            time.sleep(self.interval)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> StackSampler:
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = StackSampler(getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005))
+            _sampler.start()
+        return _sampler
+
+
+def list_profiles(profile_dir: str = None) -> List[Dict]:
+    """Метаданные сохраненных профилей, новые первыми"""
+    profile_dir = profile_dir or settings.PROFILING_DIR
+    profiles = []
+    for meta_path in sorted(glob.glob(os.path.join(profile_dir, '*.json')), reverse=True):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            continue
+        meta['meta_path'] = meta_path
+        profiles.append(meta)
+    return profiles
+
+
+class SlowRequestProfilerMiddleware:
+    """
+    Профилирование медленных запросов. Доля запросов PROFILING_SAMPLE_RATE профилируется
+    cProfile целиком; остальные проходят под дешевым сэмплером стеков, и его результат
+    сохраняется, только если запрос оказался дольше PROFILING_SLOW_THRESHOLD_MS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', False)
+        self.threshold = getattr(settings, 'PROFILING_SLOW_THRESHOLD_MS', 1000) / 1000
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.profile_dir = getattr(settings, 'PROFILING_DIR', None)
+        self.max_files = getattr(settings, 'PROFILING_MAX_FILES', 500)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        if self.sample_rate and random.random() < self.sample_rate:
+            return self._profile_request(request)
+        return self._sample_request(request)
+
+    def _profile_request(self, request):
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - started
+
+        base_path = self._base_path(request, duration)
+        try:
+            profiler.dump_stats(f"{base_path}.prof")
+            self._save_meta(base_path, request, response, duration, 'cprofile', f"{base_path}.prof")
+        except OSError as e:
+            logger.error(f"Ошибка сохранения профиля: {e}")
+        return response
+
+    def _sample_request(self, request):
+        sampler = get_sampler()
+        thread_id = threading.get_ident()
+        samples = sampler.register(thread_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.unregister(thread_id)
+        duration = time.perf_counter() - started
+
+        if duration >= self.threshold and samples:
+            base_path = self._base_path(request, duration)
+            try:
+                with open(f"{base_path}.stacks", 'w', encoding='utf-8') as file:
+                    for stack, count in samples.most_common():
+                        file.write(f"{stack} {count}\n")
+                self._save_meta(base_path, request, response, duration, 'sampler', f"{base_path}.stacks")
+            except OSError as e:
+                logger.error(f"Ошибка сохранения профиля: {e}")
+        return response
+
+    def _base_path(self, request, duration: float) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        view = get_view_name(request).replace(':', '_').replace('/', '_')
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        return os.path.join(self.profile_dir, f"{timestamp}_{view}_{int(duration * 1000)}ms")
+
+    def _save_meta(self, base_path: str, request, response, duration: float, kind: str, profile_path: str):
+        request_metrics = get_request_metrics()
+        meta = {
+            'view': get_view_name(request),
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'kind': kind,
+            'profile_path': profile_path,
+            'created_at': datetime.now().isoformat(),
+            'bitrix': request_metrics.summary() if request_metrics else {},
+        }
+        with open(f"{base_path}.json", 'w', encoding='utf-8') as file:
+            json.dump(meta, file, ensure_ascii=False, indent=2)
+        logger.warning(f"Медленный запрос {meta['view']} {meta['duration_ms']} мс, профиль: {profile_path}")
+        self._prune()
+
+    def _prune(self):
+        """Удалить самые старые профили сверх PROFILING_MAX_FILES"""
+        profiles = list_profiles(self.profile_dir)
+        for meta in profiles[self.max_files:]:
+            for path in (meta.get('profile_path'), meta['meta_path']):
+                try:
+                    if path:
+                        os.remove(path)
+                except OSError:
+                    pass
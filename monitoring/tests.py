@@ -0,0 +1,50 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from monitoring.bitrix import (
+    InstrumentedBitrix, finish_request_metrics, record_retry, start_request_metrics, track_call,
+)
+from monitoring.metrics import registry
+
+
+class InstrumentedBitrixTests(SimpleTestCase):
+    def setUp(self):
+        registry.reset()
+        self.metrics = start_request_metrics()
+        self.addCleanup(finish_request_metrics)
+        self.bx = InstrumentedBitrix('https://example.bitrix24.ru/rest/1/token/')
+
+    def test_client_retries_count_on_call_in_progress(self):
+        with track_call('crm.deal.list', 'get_all'):
+            # Так ServerRequestHandler отмечает каждую неудачную попытку перед повтором
+            self.bx.srh.failure(RuntimeError('503'))
+            self.bx.srh.failure(RuntimeError('503'))
+        with track_call('crm.deal.get', 'call'):
+            pass
+
+        retries = {call.method: call.retries for call in self.metrics.calls}
+        self.assertEqual(retries, {'crm.deal.list': 2, 'crm.deal.get': 0})
+        self.assertEqual(self.metrics.summary()['bitrix_retries'], 2)
+        self.assertIn('bitrix_call_retries_total{method="crm.deal.list"} 2', registry.render())
+
+    def test_application_retry_counts_on_last_call(self):
+        with self.assertRaises(ConnectionError):
+            with track_call('crm.deal.add', 'call'):
+                raise ConnectionError
+        record_retry()
+        self.assertEqual(self.metrics.calls[-1].retries, 1)
+
+    def test_throttle_wait_is_recorded(self):
+        async def acquire():
+            async with self.bx.srh.acquire('crm.deal.get'):
+                pass
+
+        with track_call('crm.deal.get', 'call'):
+            # Несколько неудач подряд: автотроттлинг ждет перед следующим запросом
+            self.bx.srh.successive_results = -4
+            asyncio.run(acquire())
+
+        self.assertGreater(self.metrics.calls[-1].throttle_wait, 0)
+        self.assertGreater(self.metrics.summary()['bitrix_throttle_ms'], 0)
+        self.assertIn('bitrix_call_throttle_seconds_total{method="crm.deal.get"}', registry.render())
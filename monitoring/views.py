@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from monitoring.metrics import registry
+
+
+def metrics_view(request):
+    """Агрегированные метрики процесса в формате Prometheus"""
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1'])
+    if not settings.DEBUG and request.META.get('REMOTE_ADDR') not in allowed_ips:
+        return HttpResponseForbidden('Forbidden')
+
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -79,4 +79,52 @@ class QRGenerationForm(forms.Form):
             'placeholder': 'Дополнительные заметки для этого QR-кода...'
         }),
         label='Заметки'
-    )
\ No newline at end of file
+    )
+
+class BulkQRGenerationForm(forms.Form):
+    """Форма для массовой генерации QR-кодов"""
+    OUTPUT_FORMATS = [
+        ('png', 'ZIP-архив PNG'),
+        ('svg', 'ZIP-архив SVG'),
+        ('pdf', 'PDF для печати'),
+    ]
+
+    product_ids = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={
+            'class': 'form-control',
+            'rows': 5,
+            'placeholder': 'ID товаров через запятую, пробел или с новой строки...'
+        }),
+        label='ID товаров'
+    )
+
+    section_id = forms.IntegerField(
+        required=False,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'ID раздела каталога...',
+        }),
+        label='Раздел каталога'
+    )
+
+    output_format = forms.ChoiceField(
+        choices=OUTPUT_FORMATS,
+        initial='png',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Формат результата'
+    )
+
+    def clean_product_ids(self):
+        raw_ids = self.cleaned_data.get('product_ids', '')
+        tokens = raw_ids.replace(',', ' ').split()
+        try:
+            return [int(token) for token in tokens]
+        except ValueError:
+            raise forms.ValidationError("ID товаров должны быть числами")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('product_ids') and not cleaned_data.get('section_id'):
+            raise forms.ValidationError("Укажите ID товаров или раздел каталога")
+        return cleaned_data
@@ -0,0 +1,38 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductQRCode',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('product_id', models.IntegerField(verbose_name='ID товара в Bitrix24')),
+                ('product_name', models.CharField(max_length=255, verbose_name='Название товара')),
+                ('product_image_url', models.URLField(blank=True, max_length=500, null=True,
+                                                      verbose_name='URL изображения товара')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+            ],
+            options={
+                'verbose_name': 'QR-код товара',
+                'verbose_name_plural': 'QR-коды товаров',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='productqrcode',
+            index=models.Index(fields=['id', 'product_id', 'is_active'], name='qr_id_product_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productqrcode',
+            index=models.Index(fields=['product_id'], name='qr_product_idx'),
+        ),
+    ]
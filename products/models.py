@@ -1,9 +1,24 @@
+from functools import lru_cache
+
 from django.core.signing import Signer
 from django.db import models
 import uuid
 from django.urls import reverse
 
 
+@lru_cache(maxsize=1)
+def get_signer() -> Signer:
+    """Общий экземпляр Signer, создаваемый один раз на процесс"""
+    return Signer()
+
+
+@lru_cache(maxsize=4096)
+def _unsign_token(signed_token):
+    """Проверить подпись токена; успешные проверки запоминаются в LRU"""
+    product_id, qr_code_id = get_signer().unsign(signed_token).split(':')
+    return int(product_id), qr_code_id
+
+
 class ProductQRCode(models.Model):
     """Модель для хранения сгенерированных QR-кодов"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -22,6 +37,10 @@ class ProductQRCode(models.Model):
         verbose_name = "QR-код товара"
         verbose_name_plural = "QR-коды товаров"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['id', 'product_id', 'is_active'], name='qr_id_product_active_idx'),
+            models.Index(fields=['product_id'], name='qr_product_idx'),
+        ]
 
     def __str__(self):
         return f"QR для {self.product_name} ({self.product_id})"
@@ -29,9 +48,8 @@ class ProductQRCode(models.Model):
 
     def get_signed_token(self):
         """Генерация подписанного токена с использованием Signer"""
-        signer = Signer()
         # Подписываем комбинацию product_id и uuid
-        signed_value = signer.sign(f"{self.product_id}:{self.id}")
+        signed_value = get_signer().sign(f"{self.product_id}:{self.id}")
         return signed_value
 
     def get_absolute_url(self):
@@ -43,9 +61,8 @@ class ProductQRCode(models.Model):
     def verify_token(cls, signed_token):
         """Проверка и расшифровка подписанного токена"""
         try:
-            signer = Signer()
-            unsigned_value = signer.unsign(signed_token)
-            product_id, qr_code_id = unsigned_value.split(':')
+            # Невалидные токены бросают исключение и в LRU не попадают
+            product_id, qr_code_id = _unsign_token(signed_token)
 
             # Проверяем существование QR-кода
             qr_code = cls.objects.get(
@@ -0,0 +1,169 @@
+import logging
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+from products.models import ProductQRCode
+from products.qr_render import get_qr_image
+from products.services import Bitrix24ProductService
+
+logger = logging.getLogger(__name__)
+
+# Параметры печатной страницы: A4 при 150 DPI, сетка 3x4 наклейки
+PDF_PAGE_SIZE = (1240, 1754)
+PDF_GRID = (3, 4)
+PDF_QR_SIZE = 330
+PDF_PAGES_PER_CHUNK = 10
+
+
+def _render_task(args: Tuple[str, str]) -> bytes:
+    """Задача для пула процессов: взять QR-код из кэша или отрисовать его"""
+    url, fmt = args
+    return get_qr_image(url, fmt)
+
+
+class _ZipStreamBuffer:
+    """Несикабельный буфер, из которого zipfile пишет, а генератор забирает чанки"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class BulkQRGenerator:
+    """Массовая генерация QR-кодов для товаров каталога"""
+
+    def __init__(self, build_url: Callable[[str], str], fmt: str = 'png', workers: Optional[int] = None):
+        self.build_url = build_url
+        self.fmt = fmt
+        self.workers = workers or getattr(settings, 'QR_BULK_WORKERS', None)
+        self.bitrix_service = Bitrix24ProductService()
+
+    def collect_products(self, product_ids: List[int] = None, section_id: int = None) -> List[Dict]:
+        """Получить товары и их изображения пачками"""
+        products = []
+        if product_ids:
+            products.extend(self.bitrix_service.get_products_by_ids(product_ids))
+        if section_id:
+            products.extend(self.bitrix_service.get_products_by_section(section_id))
+
+        # Убираем дубликаты, сохраняя порядок
+        unique_products = {int(product['ID']): product for product in products}
+        image_urls = self.bitrix_service.get_product_image_urls(list(unique_products))
+
+        for product_id, product in unique_products.items():
+            product['image_url'] = image_urls.get(product_id)
+        return list(unique_products.values())
+
+    def create_qr_codes(self, products: List[Dict]) -> List[ProductQRCode]:
+        """Создать записи ProductQRCode одним bulk_create"""
+        qr_codes = [
+            ProductQRCode(
+                product_id=int(product['ID']),
+                product_name=(product.get('NAME') or '')[:255],
+                product_image_url=product.get('image_url'),
+            )
+            for product in products
+        ]
+        # UUID генерируется при создании объекта, поэтому ссылки доступны сразу
+        ProductQRCode.objects.bulk_create(qr_codes, batch_size=500)
+        logger.info(f"Создано {len(qr_codes)} QR-кодов")
+        return qr_codes
+
+    def render_all(self, qr_codes: List[ProductQRCode], fmt: str = None) -> Iterator[Tuple[ProductQRCode, bytes]]:
+        """Отрисовать QR-коды в пуле процессов, сохраняя порядок"""
+        fmt = fmt or self.fmt
+        tasks = [(self.build_url(qr_code.get_absolute_url()), fmt) for qr_code in qr_codes]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            images = executor.map(_render_task, tasks, chunksize=64)
+            yield from zip(qr_codes, images)
+
+    def stream_zip(self, qr_codes: List[ProductQRCode]) -> Iterator[bytes]:
+        """Потоково отдать ZIP-архив с изображениями QR-кодов"""
+        buffer = _ZipStreamBuffer()
+        # PNG и SVG-пути уже компактны, сжатие только тратит время
+        with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+            for qr_code, image in self.render_all(qr_codes):
+                archive.writestr(f"qr_{qr_code.product_id}_{qr_code.id}.{self.fmt}", image)
+                yield buffer.pop()
+        yield buffer.pop()
+
+    def build_pdf(self, qr_codes: List[ProductQRCode]):
+        """
+        Собрать многостраничный PDF для печати во временном файле на диске и вернуть
+        его открытым. В памяти одновременно не больше PDF_PAGES_PER_CHUNK страниц;
+        ответ отдается из файла чанками через FileResponse
+        """
+        output = tempfile.TemporaryFile(suffix='.pdf')
+        pages = []
+        appended = False
+
+        for page in self._iter_pdf_pages(qr_codes):
+            pages.append(page)
+            if len(pages) >= PDF_PAGES_PER_CHUNK:
+                self._save_pdf_pages(output, pages, appended)
+                appended = True
+                pages = []
+
+        if pages or not appended:
+            self._save_pdf_pages(output, pages or [Image.new('1', PDF_PAGE_SIZE, 1)], appended)
+
+        output.seek(0)
+        return output
+
+    def _save_pdf_pages(self, output, pages: List[Image.Image], append: bool):
+        """Дописать пачку страниц в PDF, не держа весь документ в памяти"""
+        output.seek(0)
+        pages[0].save(output, format='PDF', save_all=True, append_images=pages[1:], append=append, resolution=150)
+
+    def _iter_pdf_pages(self, qr_codes: List[ProductQRCode]) -> Iterator[Image.Image]:
+        """Разложить QR-коды с подписями по страницам сетки"""
+        columns, rows = PDF_GRID
+        cell_width = PDF_PAGE_SIZE[0] // columns
+        cell_height = PDF_PAGE_SIZE[1] // rows
+        font = self._get_label_font()
+
+        page, draw = None, None
+        for index, (qr_code, image) in enumerate(self.render_all(qr_codes, fmt='png')):
+            position = index % (columns * rows)
+            if position == 0:
+                if page is not None:
+                    yield page
+                page = Image.new('1', PDF_PAGE_SIZE, 1)
+                draw = ImageDraw.Draw(page)
+
+            left = (position % columns) * cell_width
+            top = (position // columns) * cell_height
+            qr_image = Image.open(BytesIO(image)).convert('1').resize((PDF_QR_SIZE, PDF_QR_SIZE), Image.NEAREST)
+            page.paste(qr_image, (left + (cell_width - PDF_QR_SIZE) // 2, top + 20))
+            draw.text((left + 20, top + PDF_QR_SIZE + 30), f"#{qr_code.product_id}", font=font, fill=0)
+            draw.text((left + 20, top + PDF_QR_SIZE + 60), qr_code.product_name[:40], font=font, fill=0)
+
+        if page is not None:
+            yield page
+
+    def _get_label_font(self):
+        """Шрифт подписей; для кириллицы задайте QR_LABEL_FONT_PATH в настройках"""
+        font_path = getattr(settings, 'QR_LABEL_FONT_PATH', None)
+        if font_path:
+            try:
+                return ImageFont.truetype(font_path, 24)
+            except OSError as e:
+                logger.error(f"Не удалось загрузить шрифт {font_path}: {e}")
+        return ImageFont.load_default()
@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from io import BytesIO
+from typing import Tuple
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+
+from monitoring.bitrix import record_cache_event
+
+logger = logging.getLogger(__name__)
+
+QR_FORMATS = ('png', 'svg')
+
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Допустимые параметры отрисовки (box_size, border): произвольные значения
+# из запроса множили бы файлы в кэше для одной ссылки
+QR_PRESETS = {
+    's': (4, 2),
+    'm': (10, 4),
+    'l': (20, 4),
+}
+QR_DEFAULT_PRESET = 'm'
+
+_evict_lock = threading.Lock()
+_last_eviction = 0.0
+
+
+def public_url(path: str) -> str:
+    """Абсолютная ссылка от канонического адреса QR_BASE_URL, а не от заголовка Host запроса"""
+    return f"{settings.QR_BASE_URL.rstrip('/')}{path}"
+
+
+def render_qr(data: str, fmt: str = 'png', box_size: int = 10, border: int = 4) -> bytes:
+    """Отрисовать QR-код в PNG или SVG и вернуть байты изображения"""
+    if fmt not in QR_FORMATS:
+        raise ValueError(f"Unsupported QR format: {fmt}")
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if fmt == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+        img.save(buffer)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def qr_cache_key(data: str, fmt: str = 'png', box_size: int = 10, border: int = 4) -> str:
+    """Контентный ключ изображения: хэш от данных и параметров отрисовки"""
+    raw = f"{data}|{fmt}|{box_size}|{border}".encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+def get_qr_image_path(data: str, fmt: str = 'png', box_size: int = 10, border: int = 4) -> Tuple[str, str]:
+    """Вернуть ключ и путь к закэшированному изображению, отрисовав его при промахе"""
+    key = qr_cache_key(data, fmt, box_size, border)
+    path = os.path.join(settings.QR_CACHE_DIR, key[:2], f"{key}.{fmt}")
+
+    hit = os.path.exists(path)
+    record_cache_event('qr_image', hit)
+    if not hit:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image = render_qr(data, fmt, box_size, border)
+        # Пишем во временный файл и атомарно переименовываем, чтобы параллельные
+        # воркеры не прочитали недописанное изображение
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(image)
+        os.replace(tmp_path, path)
+        evict_qr_cache()
+
+    return key, path
+
+
+def evict_qr_cache(force: bool = False):
+    """
+    Удалить изображения старше QR_CACHE_MAX_AGE и самые давно использованные сверх
+    QR_CACHE_MAX_BYTES. Обход каталога идет не чаще раза в QR_CACHE_EVICT_INTERVAL секунд
+    """
+    global _last_eviction
+    now = time.time()
+    if not force and now - _last_eviction < getattr(settings, 'QR_CACHE_EVICT_INTERVAL', 300):
+        return
+    if not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        _last_eviction = now
+        max_age = getattr(settings, 'QR_CACHE_MAX_AGE', 30 * 24 * 3600)
+        max_bytes = getattr(settings, 'QR_CACHE_MAX_BYTES', 200 * 2 ** 20)
+
+        entries = []
+        for root, _, names in os.walk(settings.QR_CACHE_DIR):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                # Недописанные временные файлы старше часа - мусор от упавших воркеров
+                if now - stat.st_mtime > max_age or (name.endswith('.tmp') and now - stat.st_mtime > 3600):
+                    _remove(path)
+                elif not name.endswith('.tmp'):
+                    entries.append((stat.st_atime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            _remove(path)
+            total -= size
+    finally:
+        _evict_lock.release()
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"Не удалось удалить {path}: {e}")
+
+
+def get_qr_image(data: str, fmt: str = 'png', box_size: int = 10, border: int = 4) -> bytes:
+    """Получить байты изображения QR-кода из кэша"""
+    _, path = get_qr_image_path(data, fmt, box_size, border)
+    with open(path, 'rb') as image_file:
+        return image_file.read()
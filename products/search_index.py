@@ -0,0 +1,42 @@
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from common.trigram_index import TrigramNameIndex
+from products.services import Bitrix24ProductService
+
+
+class ProductSearchIndex(TrigramNameIndex):
+    """Локальный триграммный индекс названий товаров для автодополнения"""
+    title_field = 'NAME'
+    modified_field = 'TIMESTAMP_X'
+    label = 'Индекс товаров'
+
+    def __init__(self, refresh_interval: int = None, rebuild_interval: int = None):
+        super().__init__(
+            refresh_interval or getattr(settings, 'PRODUCT_INDEX_REFRESH_SECONDS', 300),
+            rebuild_interval or getattr(settings, 'PRODUCT_INDEX_REBUILD_SECONDS', 6 * 3600),
+        )
+
+    def _reset(self):
+        super()._reset()
+        self._products: Dict[int, Dict] = {}
+
+    def _state_fields(self) -> List[str]:
+        return super()._state_fields() + ['_products']
+
+    def fetch(self, since: Optional[str]) -> List[Dict]:
+        return Bitrix24ProductService().get_products_modified_since(since)
+
+    def _store(self, item_id: int, item: Dict, name: str):
+        self._products[item_id] = {
+            'ID': item['ID'],
+            'NAME': item.get('NAME') or '',
+            'PRICE': item.get('PRICE', 0),
+        }
+
+    def _result(self, item_id: int) -> Dict:
+        return self._products[item_id]
+
+
+product_index = ProductSearchIndex()
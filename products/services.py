@@ -6,10 +6,13 @@ from django.conf import settings
 from typing import Dict, List, Optional
 import hashlib
 import hmac
-from fast_bitrix24 import Bitrix
+from monitoring.bitrix import InstrumentedBitrix
 
 logger = logging.getLogger(__name__)
 
+# Команд в одном batch-запросе Bitrix24
+IMAGE_BATCH_SIZE = 50
+
 
 class Bitrix24ProductService:
     """Сервис для работы с товарами в Bitrix24"""
@@ -17,7 +20,7 @@ class Bitrix24ProductService:
     def __init__(self):
         self.webhook_url = settings.BITRIX24_WEBHOOK_URL
         self.session = requests.Session()
-        self.bx = Bitrix(self.webhook_url)
+        self.bx = InstrumentedBitrix(self.webhook_url)
 
     def _make_request(self, method: str, params: Dict = None) -> Dict:
         """Универсальный метод для выполнения запросов к Bitrix24 API"""
@@ -62,6 +65,17 @@ class Bitrix24ProductService:
         })
         return result[:limit]
 
+    def get_products_modified_since(self, since: Optional[str] = None) -> List[Dict]:
+        """Получить товары, измененные начиная с отметки TIMESTAMP_X (все, если отметки нет)"""
+        params = {'select': ['ID', 'NAME', 'PRICE', 'TIMESTAMP_X']}
+        if since:
+            params['filter'] = {'>=TIMESTAMP_X': since}
+        result = self._make_request('crm.product.list', params)
+        if isinstance(result, dict) and 'error' in result:
+            # Пустой список здесь означал бы "товаров нет" и стер бы индекс
+            raise RuntimeError(f"crm.product.list failed: {result['error']}")
+        return result if isinstance(result, list) else []
+
     def get_product_image_url(self, product_id: int) -> Optional[str]:
         """Получить URL изображения товара"""
         image_url = self.bx.get_all('catalog.productImage.list', {"productId": product_id, "select": ['detailUrl']})
@@ -69,6 +83,67 @@ class Bitrix24ProductService:
             return image_url[0].get('detailUrl')
         return None
 
+    def get_products_by_ids(self, product_ids: List[int], chunk_size: int = 500) -> List[Dict]:
+        """Получить товары по списку ID пачками через crm.product.list"""
+        products = []
+        for start in range(0, len(product_ids), chunk_size):
+            chunk = product_ids[start:start + chunk_size]
+            result = self._make_request('crm.product.list', {
+                'filter': {'ID': chunk},
+                'select': ['ID', 'NAME'],
+            })
+            if isinstance(result, dict) and 'error' in result:
+                # Без этой пачки архив молча вышел бы неполным
+                raise RuntimeError(f"crm.product.list failed: {result['error']}")
+            if isinstance(result, list):
+                products.extend(result)
+        return products
+
+    def get_products_by_section(self, section_id: int) -> List[Dict]:
+        """Получить все товары раздела каталога"""
+        result = self._make_request('crm.product.list', {
+            'filter': {'SECTION_ID': section_id},
+            'select': ['ID', 'NAME'],
+        })
+        if isinstance(result, dict) and 'error' in result:
+            raise RuntimeError(f"crm.product.list failed: {result['error']}")
+        return result if isinstance(result, list) else []
+
+    def get_product_image_urls(self, product_ids: List[int]) -> Dict[int, Optional[str]]:
+        """
+        Получить URL изображений для списка товаров batch-запросами. Если список
+        целиком не прошел, он повторяется пачками по 50, а упавшая пачка - по одному
+        товару, чтобы ошибка одного запроса не оставила без картинок весь набор
+        """
+        if not product_ids:
+            return {}
+
+        try:
+            # fast_bitrix24 сам разбивает список параметров на batch по 50 команд
+            results = self.bx.call('catalog.productImage.list', [
+                {'productId': product_id, 'select': ['detailUrl']}
+                for product_id in product_ids
+            ])
+        except Exception as e:
+            logger.error(f"Error in catalog.productImage.list batch of {len(product_ids)}: {e}")
+            if len(product_ids) == 1:
+                return {product_ids[0]: None}
+            step = IMAGE_BATCH_SIZE if len(product_ids) > IMAGE_BATCH_SIZE else 1
+            image_urls = {}
+            for start in range(0, len(product_ids), step):
+                image_urls.update(self.get_product_image_urls(product_ids[start:start + step]))
+            return image_urls
+
+        if isinstance(results, dict):
+            results = [results]
+
+        image_urls = {}
+        for product_id, images in zip(product_ids, results):
+            if isinstance(images, dict):
+                images = images.get('productImages', [])
+            image_urls[product_id] = images[0].get('detailUrl') if images else None
+        return image_urls
+
 
 class URLSigner:
     """Класс для создания и проверки подписанных URL"""
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from products.search_index import ProductSearchIndex
+from products.services import Bitrix24ProductService
+
+
+class MemoryProductIndex(ProductSearchIndex):
+    """Индекс товаров с выгрузкой из списка в памяти вместо crm.product.list"""
+
+    def __init__(self, products):
+        super().__init__(refresh_interval=3600, rebuild_interval=3600)
+        self.products = products
+        self.requests = []
+        self.fail = False
+
+    def fetch(self, since):
+        self.requests.append(since)
+        if self.fail:
+            raise RuntimeError("crm.product.list failed")
+        return [product for product in self.products if not since or product['TIMESTAMP_X'] >= since]
+
+
+def product(product_id, name, modified='2024-03-01T10:00:00'):
+    return {'ID': product_id, 'NAME': name, 'PRICE': 100, 'TIMESTAMP_X': modified}
+
+
+class TrigramNameIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = MemoryProductIndex([
+            product(1, 'Набор для чайной церемонии'),
+            product(2, 'Чайник электрический'),
+            product(3, 'Иван-чай листовой'),
+            product(4, 'Ёлочная игрушка'),
+        ])
+
+    def names(self, query, limit=10):
+        return [item['NAME'] for item in self.index.search(query, limit)]
+
+    def test_ranking(self):
+        # Начало названия, затем начало слова, затем подстрока внутри слова
+        self.assertEqual(self.names('чай'), ['Чайник электрический', 'Набор для чайной церемонии', 'Иван-чай листовой'])
+        # Запрос короче триграммы ищется только по началу слов
+        self.assertEqual(self.names('ч'), ['Чайник электрический', 'Набор для чайной церемонии'])
+        self.assertEqual(self.names('ай'), [])
+        self.assertEqual(self.names('чай', limit=1), ['Чайник электрический'])
+
+    def test_normalization(self):
+        self.assertEqual(self.names('  ЕЛОЧНАЯ '), ['Ёлочная игрушка'])
+        self.assertEqual(self.names(''), [])
+
+    def test_incremental_refresh_renames(self):
+        self.assertEqual(self.names('иван'), ['Иван-чай листовой'])
+        self.index.products[2] = product(3, 'Стакан', modified='2024-03-02T10:00:00')
+        self.index.refresh()
+        self.assertEqual(self.index.requests[-1], '2024-03-01T10:00:00')
+        self.assertEqual(self.names('иван'), [])
+        self.assertEqual(self.names('стакан'), ['Стакан'])
+
+    def test_failed_rebuild_keeps_index(self):
+        self.names('чай')
+        self.index.fail = True
+        with self.assertRaises(RuntimeError):
+            self.index.refresh(full=True)
+        self.assertEqual(self.names('набор'), ['Набор для чайной церемонии'])
+
+    def test_clear(self):
+        self.names('чай')
+        self.index.clear()
+        self.names('чай')
+        self.assertEqual(self.index.requests, [None, None])
+
+
+class ProductServiceErrorTests(SimpleTestCase):
+    def setUp(self):
+        self.service = Bitrix24ProductService.__new__(Bitrix24ProductService)
+
+    def test_error_is_raised_not_empty(self):
+        with mock.patch.object(self.service, '_make_request', return_value={'error': 'QUERY_LIMIT_EXCEEDED'}):
+            with self.assertRaises(RuntimeError):
+                self.service.get_products_by_ids([1, 2])
+            with self.assertRaises(RuntimeError):
+                self.service.get_products_by_section(5)
+            with self.assertRaises(RuntimeError):
+                self.service.get_products_modified_since()
+
+    def test_products_by_ids_in_chunks(self):
+        responses = [[{'ID': '1'}, {'ID': '2'}], [{'ID': '3'}]]
+        with mock.patch.object(self.service, '_make_request', side_effect=responses) as request:
+            products = self.service.get_products_by_ids([1, 2, 3], chunk_size=2)
+        self.assertEqual([item['ID'] for item in products], ['1', '2', '3'])
+        self.assertEqual(request.call_args_list[1].args[1]['filter'], {'ID': [3]})
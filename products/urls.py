@@ -1,9 +1,12 @@
 from django.urls import path
-from products.views.views import product_search_view, generate_qr_view, product_qr_detail_view, product_autocomplete
+from products.views.views import product_search_view, generate_qr_view, product_qr_detail_view, product_autocomplete, \
+    bulk_qr_view, product_qr_image_view
 
 urlpatterns = [
     path('generate/', product_search_view, name='generate_qr'),
     path('generate/step2/', generate_qr_view, name='generate_qr_step2'),
+    path('generate/bulk/', bulk_qr_view, name='generate_qr_bulk'),
     path('qr/<str:signed_token>/', product_qr_detail_view, name='product_qr_detail'),
+    path('qr/<str:signed_token>/image.<str:fmt>', product_qr_image_view, name='product_qr_image'),
     path('autocomplete/', product_autocomplete, name='product_autocomplete'),
 ]
\ No newline at end of file
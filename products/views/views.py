@@ -1,21 +1,21 @@
 import requests
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, Http404, StreamingHttpResponse, FileResponse, HttpResponseNotModified
+from django.core.signing import BadSignature
 from django.views.generic import FormView, TemplateView, DetailView
 from django.contrib import messages
 from django.urls import reverse
 from django.conf import settings
-import qrcode
-import qrcode.image.svg
-from io import BytesIO
-import base64
 import uuid
 import hashlib
 
 from integration_utils.bitrix24.bitrix_user_auth.main_auth import main_auth
-from products.forms.forms import ProductSearchForm, QRGenerationForm
+from products.forms.forms import ProductSearchForm, QRGenerationForm, BulkQRGenerationForm
 from products.services import Bitrix24ProductService, URLSigner
-from products.models import ProductQRCode
+from products.models import ProductQRCode, get_signer
+from products.qr_bulk import BulkQRGenerator
+from products.search_index import product_index
+from products.qr_render import QR_CONTENT_TYPES, QR_DEFAULT_PRESET, QR_PRESETS, get_qr_image_path, public_url
 
 
 @main_auth(on_cookies=True)
@@ -73,30 +73,20 @@ def generate_qr_view(request):
                 )
 
                 # ГЕНЕРИРУЕМ ПОДПИСАННЫЙ URL С ИСПОЛЬЗОВАНИЕМ SIGNER
-                qr_url = request.build_absolute_uri(
-                    qr_code.get_absolute_url()
-                )
-
-                # Генерация QR-изображения
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.constants.ERROR_CORRECT_L,
-                    box_size=10,
-                    border=4,
-                )
-                qr.add_data(qr_url)
-                qr.make(fit=True)
+                qr_url = public_url(qr_code.get_absolute_url())
 
-                img = qr.make_image(fill_color="black", back_color="white")
-                buffer = BytesIO()
-                img.save(buffer, format='PNG')
-                qr_image_base64 = base64.b64encode(buffer.getvalue()).decode()
+                # Изображение рисуется один раз и дальше отдается из кэша
+                get_qr_image_path(qr_url)
+                if settings.QR_CACHE_PRERENDER_SVG:
+                    get_qr_image_path(qr_url, 'svg')
+                signed_token = qr_code.get_signed_token()
 
                 # Получаем данные продукта для контекста
                 product_data = request.session.get('selected_product', {})
 
                 context = {
-                    'qr_image': f"data:image/png;base64,{qr_image_base64}",
+                    'qr_image': reverse('product_qr_image', kwargs={'signed_token': signed_token, 'fmt': 'png'}),
+                    'qr_image_svg': reverse('product_qr_image', kwargs={'signed_token': signed_token, 'fmt': 'svg'}),
                     'qr_url': qr_url,
                     'product': product_data,
                     'qr_code': qr_code,
@@ -117,6 +107,72 @@ def generate_qr_view(request):
                 })
 
 
+@main_auth(on_cookies=True)
+def bulk_qr_view(request):
+    """Массовая генерация QR-кодов по списку ID или разделу каталога"""
+    if request.method == 'POST':
+        form = BulkQRGenerationForm(request.POST)
+        if form.is_valid():
+            output_format = form.cleaned_data['output_format']
+            generator = BulkQRGenerator(
+                build_url=public_url,
+                fmt='png' if output_format == 'pdf' else output_format,
+            )
+            try:
+                products = generator.collect_products(
+                    product_ids=form.cleaned_data['product_ids'],
+                    section_id=form.cleaned_data.get('section_id'),
+                )
+            except RuntimeError as e:
+                messages.error(request, f'Не удалось получить товары из Bitrix24: {str(e)}')
+                return render(request, 'bulk_qr.html', {'form': form})
+
+            if not products:
+                messages.error(request, 'Товары не найдены. Проверьте ID или раздел каталога.')
+                return render(request, 'bulk_qr.html', {'form': form})
+
+            qr_codes = generator.create_qr_codes(products)
+
+            if output_format == 'pdf':
+                return FileResponse(generator.build_pdf(qr_codes), as_attachment=True, filename='qr_codes.pdf')
+
+            response = StreamingHttpResponse(generator.stream_zip(qr_codes), content_type='application/zip')
+            response['Content-Disposition'] = 'attachment; filename="qr_codes.zip"'
+            return response
+    else:
+        form = BulkQRGenerationForm()
+
+    return render(request, 'bulk_qr.html', {'form': form})
+
+
+def product_qr_image_view(request, signed_token, fmt):
+    """Изображение QR-кода из контентно-адресуемого кэша"""
+    if fmt not in QR_CONTENT_TYPES:
+        raise Http404("Неподдерживаемый формат")
+
+    preset = request.GET.get('size', QR_DEFAULT_PRESET)
+    if preset not in QR_PRESETS:
+        raise Http404("Некорректные параметры изображения")
+
+    # Деактивированный QR-код больше не отдается
+    if ProductQRCode.verify_token(signed_token) is None:
+        raise Http404("QR-код не найден, неактивен или ссылка недействительна")
+
+    box_size, border = QR_PRESETS[preset]
+    qr_url = public_url(reverse('product_qr_detail', kwargs={'signed_token': signed_token}))
+    key, path = get_qr_image_path(qr_url, fmt, box_size, border)
+
+    etag = f'"{key}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=QR_CONTENT_TYPES[fmt])
+    response['ETag'] = etag
+    # Не immutable: после деактивации кода клиенты должны перепроверить ссылку
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
 def product_qr_detail_view(request, signed_token):
     """Страница товара по подписанной ссылке из QR-кода"""
     try:
@@ -170,8 +226,8 @@ def product_autocomplete(request):
     if len(query) < 2:
         return HttpResponse('[]', content_type='application/json')
 
-    bitrix_service = Bitrix24ProductService()
-    products = bitrix_service.search_products(query, limit=10)
+    # Ищем по локальному индексу, без обращения к Bitrix24 на каждое нажатие
+    products = product_index.search(query, limit=10)
 
     import json
     results = [
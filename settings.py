@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'employees',
     'companies_on_maps',
     'contact_import',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
@@ -66,6 +67,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.middleware.BitrixMetricsMiddleware',
+    'monitoring.profiling.SlowRequestProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'urls'
@@ -91,12 +94,39 @@ WSGI_APPLICATION = 'wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgresql включает PostgreSQL, по умолчанию используется SQLite в режиме WAL
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'bit_orders'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Постоянные соединения с проверкой перед повторным использованием
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Ждем освобождения блокировки вместо мгновенного "database is locked"
+                'timeout': int(os.getenv('DB_SQLITE_TIMEOUT', 20)),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -136,6 +166,48 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 ENTRY_FILE_UPLOADING_FOLDER = os.path.join(MEDIA_ROOT, 'uploaded_entrie_files')
+# Каталог локальных кэшей и снимков (индексы, карта, QR, выгрузки); бенчмарк подменяет его временным
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+QR_CACHE_DIR = os.path.join(CACHE_DIR, 'qr')
+QR_CACHE_PRERENDER_SVG = False
+QR_CACHE_MAX_BYTES = 200 * 2 ** 20
+QR_CACHE_MAX_AGE = 30 * 24 * 3600
+QR_CACHE_EVICT_INTERVAL = 300
+# Канонический адрес сайта для ссылок в QR-кодах (не зависит от заголовка Host)
+QR_BASE_URL = os.getenv('QR_BASE_URL', 'http://localhost:8000')
+MAP_DATASET_PATH = os.path.join(CACHE_DIR, 'map', 'dataset.json')
+MAP_COORDS_PATH = os.path.join(CACHE_DIR, 'map', 'coords.npy')
+MAP_CLUSTER_MAX_ZOOM = 15
+MAP_CLUSTER_RADIUS = 60
+# Обновление карты: manage.py rebuild_map по cron или планировщик внутри процесса
+# (включать только в одном процессе, остальные подхватят файл набора)
+MAP_SCHEDULER_ENABLED = os.getenv('MAP_SCHEDULER_ENABLED', '') == '1'
+MAP_REBUILD_INTERVAL = 600
+# Пауза между попытками фоновой сборки, пока файла набора еще нет
+MAP_REBUILD_RETRY_SECONDS = 60
+
+PRODUCT_INDEX_REFRESH_SECONDS = 300
+PRODUCT_INDEX_REBUILD_SECONDS = 6 * 3600
+
+COMPANY_INDEX_PATH = os.path.join(CACHE_DIR, 'company_index.json')
+COMPANY_INDEX_REFRESH_SECONDS = 300
+COMPANY_INDEX_REBUILD_SECONDS = 24 * 3600
+CONTACT_DEDUP_INDEX_TTL = 600
+
+DEAL_SYNC_INTERVAL = 60
+DEAL_FULL_SYNC_INTERVAL = 24 * 3600
+DEAL_DICTIONARY_TTL = 600
+DEAL_SECTION_TTL = 120
+DEAL_CREATE_RETRIES = 4
+DEAL_CREATE_BACKOFF = 0.5
+# Предел суммарного ожидания повторов в запросе пользователя, секунд
+DEAL_CREATE_MAX_WAIT = 3
+DEAL_IDEMPOTENCY_WINDOW = 600
+DEAL_IDEMPOTENCY_PENDING_TIMEOUT = 120
+
+EXPORT_CACHE_DIR = os.path.join(CACHE_DIR, 'exports')
+EXPORT_CACHE_MAX_BYTES = 500 * 2 ** 20
+EXPORT_CACHE_MAX_AGE = 24 * 3600
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 STATIC_URL = '/static/'
@@ -153,6 +225,17 @@ BITRIX24_CALL_WEBHOOK_URL = os.getenv('BITRIX24_CALL_WEBHOOK_URL')
 BITRIX24_DOMAIN = os.getenv('PORTAL_DOMAIN')
 BITRIX_BATCH_SIZE = 50
 
+# Заголовки X-Bitrix-* с числом и временем вызовов Bitrix24 за запрос
+BITRIX_METRICS_HEADER = DEBUG
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+# Профилирование медленных запросов (python manage.py profiles - сводка)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '') == '1'
+PROFILING_SLOW_THRESHOLD_MS = int(os.getenv('PROFILING_SLOW_THRESHOLD_MS', 1000))
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.path.join(CACHE_DIR, 'profiles')
+PROFILING_MAX_FILES = 500
+
 YANDEX_MAPS_API_KEY = os.getenv('YANDEX_MAPS_API_KEY')
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
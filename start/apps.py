@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class StartConfig(AppConfig):
+    name = 'start'
+
+    def ready(self):
+        from start import db  # noqa: F401 - подключает настройку соединений с БД
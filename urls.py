@@ -4,6 +4,7 @@ from django.conf import settings
 from django.urls import path, include
 
 from start.views.start import start
+from monitoring.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,4 +15,5 @@ urlpatterns = [
     path('employees/', include('employees.urls')),
     path('map/', include('companies_on_maps.urls')),
     path('contact/', include('contact_import.urls')),
+    path('metrics/', metrics_view, name='metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file